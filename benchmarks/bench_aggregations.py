@@ -0,0 +1,151 @@
+# %% 0. Libraries
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append('.')
+from src.ingest import SalesStore
+from src.aggregations import RegionAggregations, RANKING_DIMS
+
+IN_PATH = 'data/in/'
+
+
+# %% 1. Legacy per-region pivot approach (as in main.py before the aggregation module)
+def legacy_aggregations(data, data_orders):
+    tables = {}
+    for region_id in data_orders['region_id'].unique():
+        payment_type = pd.pivot_table(
+            data=data_orders[data_orders['region_id'] == region_id],
+            index='payment_type',
+            values=['order_id', 'total_discounted_price'],
+            aggfunc={
+                'order_id': pd.Series.nunique,
+                'total_discounted_price': np.sum
+            },
+            observed=True
+        )
+        payment_type.sort_values(by='total_discounted_price', ascending=False, inplace=True)
+        payment_type['orders_cum_prc'] = payment_type['order_id'].cumsum() / payment_type['order_id'].sum()
+        payment_type['revenue_cum_prc'] = payment_type['total_discounted_price'].cumsum() / payment_type['total_discounted_price'].sum()
+        tables[f'payment_type_{region_id}'] = payment_type.reset_index()
+
+        base_ts = pd.pivot_table(
+            data=data_orders[data_orders['region_id'] == region_id],
+            index='created_date',
+            values=[
+                'order_id', 'buyer_id', 'purchase_completed', 'quantity',
+                'total_discounted_price', 'total_full_price', 'total_discount',
+                'avg_full_price_per_product', 'avg_disc_per_product'
+            ],
+            aggfunc={
+                'order_id': pd.Series.nunique,
+                'buyer_id': pd.Series.nunique,
+                'purchase_completed': np.sum,
+                'quantity': np.mean,
+                'total_full_price': np.sum,
+                'total_discount': np.sum,
+                'total_discounted_price': np.sum,
+                'avg_full_price_per_product': np.mean,
+                'avg_disc_per_product': np.mean
+            },
+            observed=True
+        )
+        base_ts = base_ts.resample('D').sum()
+        base_ts.reset_index(inplace=True)
+        base_ts['day_name'] = base_ts['created_date'].dt.day_name()
+        tables[f'base_ts_{region_id}'] = base_ts
+
+        for dim in RANKING_DIMS:
+            rnk = pd.pivot_table(
+                data=data[data['region_id'] == region_id],
+                index=dim,
+                values=['order_number', 'quantity', 'total_discounted_price'],
+                aggfunc={
+                    'order_number': pd.Series.nunique,
+                    'quantity': np.sum,
+                    'total_discounted_price': np.sum
+                },
+                observed=True
+            ).sort_values(by='quantity', ascending=False)
+            rnk['qty_cumperc'] = rnk['quantity'].cumsum() / rnk['quantity'].sum(axis=0) * 100
+            tables[f'rnk_{dim}_{region_id}'] = rnk
+    return tables
+
+
+def build_orders(data):
+    data_orders = data.groupby(
+        ['created_date', 'effective_date_time', 'order_number', 'region_id', 'store_id', 'buyer_id', 'payment_type', 'purchase_completed'],
+        observed=True
+    ).agg(
+        total_discount=('discount', 'sum'),
+        quantity=('quantity', 'sum'),
+        total_discounted_price=('total_discounted_price', 'sum'),
+        total_full_price=('total_full_price', 'sum')
+    ).reset_index().rename(columns={'order_number': 'order_id'})
+    data_orders['avg_full_price_per_product'] = data_orders['total_full_price'] / data_orders['quantity']
+    data_orders['avg_disc_per_product'] = data_orders['total_discount'] / data_orders['quantity']
+    data_orders['purchase_completed'] = data_orders['purchase_completed'].map({'Yes': 1, 'No': 0})
+    return data_orders
+
+
+def replicate_regions(data, n_copies):
+    # Every copy becomes a new set of regions with the same order mix
+    frames = []
+    for i in range(n_copies):
+        _data = data.copy()
+        _data['region_id'] = _data['region_id'].astype(str) + f'_{i}'
+        _data['order_number'] = _data['order_number'].astype(str) + f'_{i}'
+        frames.append(_data)
+    return pd.concat(frames, ignore_index=True)
+
+
+def check_equal(legacy, tables, regions):
+    for region_id in regions:
+        new_ts = RegionAggregations.region(tables['base_ts'], region_id).reset_index()
+        pd.testing.assert_frame_equal(legacy[f'base_ts_{region_id}'], new_ts, check_dtype=False, check_freq=False)
+        old = legacy[f'payment_type_{region_id}'].set_index('payment_type').sort_index()
+        new = RegionAggregations.region(tables['payment_type'], region_id).sort_index()
+        pd.testing.assert_frame_equal(old[['order_id', 'total_discounted_price']], new[['order_id', 'total_discounted_price']], check_dtype=False, check_categorical=False, check_index_type=False)
+        for dim in RANKING_DIMS:
+            old = legacy[f'rnk_{dim}_{region_id}']
+            new = RegionAggregations.region(tables[f'rnk_{dim}'], region_id)
+            # Ties in quantity may be ordered differently, the Pareto curve may not
+            np.testing.assert_allclose(old['qty_cumperc'].values, new['qty_cumperc'].values)
+            cols = ['order_number', 'quantity', 'total_discounted_price']
+            pd.testing.assert_frame_equal(
+                old[cols].sort_index(), new[cols].sort_index(),
+                check_dtype=False, check_categorical=False, check_index_type=False
+            )
+
+
+def timeit(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+# %% 2. Benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-region pivots vs single-pass region aggregations')
+    parser.add_argument('--copies', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    store = SalesStore(IN_PATH + 'Estudio de caso - Base de ventas.xlsx')
+    base = store.load()
+
+    print(f"{'regions':>8} {'rows':>9} {'pivot (s)':>10} {'groupby (s)':>12} {'speedup':>8}")
+    for n_copies in args.copies:
+        data = replicate_regions(base, n_copies)
+        data_orders = build_orders(data)
+        regions = data_orders['region_id'].unique()
+
+        t_legacy, legacy = timeit(lambda: legacy_aggregations(data, data_orders), args.repeat)
+        t_new, tables = timeit(lambda: RegionAggregations(data, data_orders).run(), args.repeat)
+        check_equal(legacy, tables, regions)
+        print(f'{len(regions):>8} {len(data):>9} {t_legacy:>10.4f} {t_new:>12.4f} {t_legacy / t_new:>7.1f}x')
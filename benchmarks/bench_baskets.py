@@ -0,0 +1,55 @@
+# %% 0. Libraries
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append('.')
+from src.baskets import BasketBuilder
+
+
+# %% 1. Synthetic line items
+def synthetic_lines(n_orders, n_skus, items_per_order=7, seed=0):
+    rng = np.random.default_rng(seed)
+    sizes = rng.poisson(items_per_order - 1, n_orders) + 1
+    order_number = np.repeat(np.arange(n_orders), sizes).astype(str)
+    # Long-tail SKU popularity
+    sku = (rng.zipf(1.3, sizes.sum()) - 1) % n_skus
+    return pd.DataFrame({
+        'order_number': order_number,
+        'sku': pd.Categorical(sku.astype(str))
+    })
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+# %% 2. Benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Dense vs sparse basket matrix build')
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--skus', type=int, nargs='+', default=[1000, 5000, 20000, 50000])
+    parser.add_argument('--max-dense-cells', type=float, default=2e8)
+    args = parser.parse_args()
+
+    builder = BasketBuilder()
+    print(f"{'skus':>7} {'orders':>7} {'dense (s)':>10} {'dense MB':>10} {'sparse (s)':>11} {'sparse MB':>10}")
+    for n_skus in args.skus:
+        data = synthetic_lines(args.orders, n_skus)
+        t_sparse, basket = timed(lambda: builder.build(data))
+        mb_sparse = builder.memory_footprint(builder.to_csr(data)[0]) / 2**20
+
+        # The dense matrix is float64 orders x SKUs; skip it when it won't fit
+        n_cells = basket.shape[0] * basket.shape[1]
+        if n_cells <= args.max_dense_cells:
+            t_dense, dense = timed(lambda: builder.build_dense(data))
+            dense_cols = f'{t_dense:>10.3f} {builder.memory_footprint(dense) / 2**20:>10.1f}'
+            del dense
+        else:
+            dense_cols = f"{'skipped':>10} {n_cells * 8 / 2**20:>9.0f}*"
+        print(f'{n_skus:>7} {basket.shape[0]:>7} {dense_cols} {t_sparse:>11.3f} {mb_sparse:>10.2f}')
+    print('* estimated size of the dense float64 matrix')
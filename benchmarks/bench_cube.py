@@ -0,0 +1,98 @@
+# %% 0. Libraries
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append('.')
+from src.cube import DailyCube
+
+
+# %% 1. Synthetic line items
+def synthetic_lines(n_orders, n_regions=10, n_stores=500, n_buyers=50000, n_categories=30, n_days=180, items_per_order=5, seed=0):
+    rng = np.random.default_rng(seed)
+    sizes = rng.poisson(items_per_order - 1, n_orders) + 1
+    n_lines = sizes.sum()
+    created_date = pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, n_days, n_orders), unit='D')
+    stores = rng.integers(0, n_stores, n_orders)
+    quantity = rng.integers(1, 6, n_lines)
+    full_price = np.round(rng.gamma(2.0, 4.0, n_lines), 2)
+    discount = np.round(full_price * rng.choice([0, 0, 0, 0.1], n_lines), 2)
+    return pd.DataFrame({
+        'created_date': np.repeat(created_date, sizes),
+        'region_id': np.repeat(stores % n_regions, sizes).astype(str),
+        'store_id': np.repeat(stores, sizes).astype(str),
+        'payment_type': np.repeat(rng.choice(['CASH', 'YAPE', 'PLIN', 'CARD'], n_orders), sizes),
+        'category': rng.integers(0, n_categories, n_lines).astype(str),
+        'order_number': np.repeat(np.arange(n_orders), sizes).astype(str),
+        'buyer_id': np.repeat(rng.integers(0, n_buyers, n_orders), sizes).astype(str),
+        'sku': rng.integers(0, 5000, n_lines).astype(str),
+        'quantity': quantity,
+        'discount': discount,
+        'total_full_price': full_price * quantity,
+        'total_discounted_price': (full_price - discount) * quantity
+    })
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def raw_query(data, by, freq=None, region=None):
+    _data = data if region is None else data[data['region_id'] == region]
+    keys = [_data[dim].dt.to_period(freq).dt.start_time if dim == 'created_date' and freq else _data[dim] for dim in by]
+    return _data.groupby(keys, sort=True).agg(
+        revenue=('total_discounted_price', 'sum'),
+        orders=('order_number', 'nunique'),
+        buyers=('buyer_id', 'nunique')
+    )
+
+
+# %% 2. Benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Daily cube rollups vs groupby over line items')
+    parser.add_argument('--orders', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = synthetic_lines(args.orders)
+    t_build, cube = timed(lambda: DailyCube().build(data), 1)
+    t_view, view = timed(lambda: cube.rollup(['created_date', 'region_id', 'payment_type', 'category']), 1)
+    t_sketch, sketch_view = timed(lambda: cube.rollup(['created_date', 'region_id', 'category'], approx=True), 1)
+    pair_rows = sum(len(pairs) for pairs in cube.pairs.values())
+    sketch_rows = sum(len(sketch) for sketch in sketch_view.sketches.values())
+    print(f'{len(data):,} lines -> {len(cube.cells):,} cells ({pair_rows:,} distinct pairs), build {t_build:.2f}s')
+    print(f'store-free view -> {len(view.cells):,} cells, build {t_view:.2f}s')
+    print(f'approximate date x region x category view -> {len(sketch_view.cells):,} cells ({sketch_rows:,} sketch registers), build {t_sketch:.2f}s')
+
+    queries = [
+        ('total', [], None, None),
+        ('region', ['region_id'], None, None),
+        ('region x week', ['region_id', 'created_date'], 'W', None),
+        ('region x month x category', ['region_id', 'created_date', 'category'], 'M', None),
+        ('1 region, day x payment', ['created_date', 'payment_type'], None, '3'),
+        ('region x week x store', ['region_id', 'created_date', 'store_id'], 'W', None)
+    ]
+    # Cube and store-free view are exact; the sketch view, when it has the dimensions, reports its relative error
+    print(f"{'query':<28} {'raw (ms)':>9} {'cube (ms)':>10} {'view (ms)':>10} {'sketch (ms)':>12} {'groups':>7} {'equal':>6} {'max err':>8}")
+    for name, by, freq, region in queries:
+        filters = {'region_id': region} if region is not None else None
+        t_raw, raw = timed(lambda: raw_query(data, by, freq, region) if by else raw_query(data.assign(total='All'), ['total']), args.repeat)
+        t_cube, result = timed(lambda: cube.query(by=by, filters=filters, freq=freq), args.repeat)
+        cols = ['revenue', 'orders', 'buyers']
+        equal = np.allclose(raw.values, result[cols].values)
+        t_view, error, t_sketch = np.nan, np.nan, np.nan
+        if set(by) <= set(view.dimensions):
+            t_view, view_result = timed(lambda: view.query(by=by, filters=filters, freq=freq), args.repeat)
+            equal = equal and np.allclose(raw.values, view_result[cols].values)
+        if set(by) <= set(sketch_view.dimensions) and region is None:
+            t_sketch, sketch_result = timed(lambda: sketch_view.query(by=by, filters=filters, freq=freq), args.repeat)
+            error = np.abs(sketch_result[['orders', 'buyers']].values / raw[['orders', 'buyers']].values - 1).max()
+        print(f'{name:<28} {t_raw * 1000:>9.1f} {t_cube * 1000:>10.1f} {t_view * 1000:>10.1f} {t_sketch * 1000:>12.1f} {len(result):>7} {str(equal):>6} {error:>8.2%}')
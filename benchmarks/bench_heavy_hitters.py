@@ -0,0 +1,81 @@
+# %% 0. Libraries
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append('.')
+from src.heavy_hitters import StreamingRanking
+
+
+# %% 1. Synthetic line item chunks
+def synthetic_chunks(n_lines, n_skus, n_regions=4, chunk_size=100000, seed=0):
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_lines, chunk_size):
+        size = min(chunk_size, n_lines - start)
+        quantity = rng.integers(1, 6, size)
+        yield pd.DataFrame({
+            'region_id': rng.integers(0, n_regions, size).astype(str),
+            # Long-tail SKU popularity
+            'sku': ((rng.zipf(1.2, size) - 1) % n_skus).astype(str),
+            'quantity': quantity,
+            'total_discounted_price': quantity * rng.gamma(2.0, 5.0, size)
+        })
+
+
+def full_ranking(chunks, k):
+    data = pd.concat(chunks, ignore_index=True)
+    table = data.groupby(['region_id', 'sku'], sort=True)[['quantity', 'total_discounted_price']].sum()
+    tables = {}
+    for region_id, df in table.groupby(level=0):
+        df = df.droplevel(0)
+        order = np.lexsort((df.index.values, -df['quantity'].values))
+        df = df.iloc[order]
+        df['qty_cumperc'] = df['quantity'].cumsum() / df['quantity'].sum() * 100
+        tables[region_id] = df.head(k)
+    return tables
+
+
+# %% 2. Benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Streaming top-k Pareto tables vs a full pivot')
+    parser.add_argument('--lines', type=int, default=5000000)
+    parser.add_argument('--skus', type=int, default=50000)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--capacity', type=int, nargs='+', default=[100, 500, 2000])
+    args = parser.parse_args()
+
+    # Generating the chunks is part of every timing below
+    start = time.perf_counter()
+    for chunk in synthetic_chunks(args.lines, args.skus):
+        pass
+    t_read = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = full_ranking(synthetic_chunks(args.lines, args.skus), args.k)
+    t_full = time.perf_counter() - start
+    print(f'{args.lines:,} lines, {args.skus:,} SKUs, top {args.k}: reading the chunks {t_read:.2f}s, full pivot {t_full:.2f}s')
+
+    print(f"{'capacity':>9} {'pass 1 (s)':>11} {'refine (s)':>11} {'counters':>9} {'candidates':>11} {'certified':>10} {'equal':>6}")
+    for capacity in args.capacity:
+        ranking = StreamingRanking('sku', capacity=capacity)
+        start = time.perf_counter()
+        for chunk in synthetic_chunks(args.lines, args.skus):
+            ranking.consume(chunk)
+        t_pass = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exact = ranking.refine(synthetic_chunks(args.lines, args.skus), args.k)
+        t_refine = time.perf_counter() - start
+
+        counters = sum(len(s.counts) for s in ranking.summaries.values())
+        # Keys refined exactly: the candidates, or every key of a region the summary could not bound
+        candidates = len(exact)
+        tables = {r: ranking.pareto(r, args.k, exact=exact) for r in ranking.summaries}
+        certified = all(t.attrs['certified'] for t in tables.values())
+        equal = all(
+            list(tables[r].index) == list(expected[r].index) and np.allclose(tables[r]['qty_cumperc'], expected[r]['qty_cumperc'])
+            for r in expected
+        )
+        print(f'{capacity:>9} {t_pass:>11.2f} {t_refine:>11.2f} {counters:>9} {candidates:>11} {str(certified):>10} {str(equal):>6}')
@@ -0,0 +1,62 @@
+# %% 0. Libraries
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append('.')
+from src.mining import RuleMiner
+from src.itemsets import ItemsetEncoder, itemset_ids
+
+
+# %% 1. Synthetic rules
+def synthetic_rules(n_rules, n_skus, max_len=3, seed=0):
+    rng = np.random.default_rng(seed)
+    skus = ((rng.zipf(1.2, (n_rules, max_len + 1)) - 1) % n_skus).astype(str)
+    sizes = rng.integers(1, max_len + 1, n_rules)
+    antecedents = [frozenset(row[:size]) for row, size in zip(skus, sizes)]
+    consequents = [frozenset(row[-1:]) for row in skus]
+    return pd.DataFrame({
+        'antecedents': antecedents,
+        'consequents': consequents,
+        # Few distinct supports, so ties exercise the stable ordering
+        'antecedent support': np.round(rng.uniform(0.01, 0.1, n_rules), 3),
+        'support': rng.uniform(0.001, 0.01, n_rules),
+        'confidence': rng.uniform(0.05, 1, n_rules),
+        'lift': np.round(rng.uniform(1, 20, n_rules), 2)
+    })
+
+
+def legacy_filter_top(rules, top_n):
+    _rules = rules.sort_values(by=['antecedent support', 'lift'], ascending=False)
+    _rules['qty_antecedents'] = _rules['antecedents'].apply(lambda x: len(x))
+    _rules['rn'] = _rules.groupby(['antecedents'])['qty_antecedents'].rank(method='first')
+    return _rules.loc[_rules['rn'] <= top_n, :].copy()
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+# %% 2. Benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rule post-processing: frozensets vs item code arrays')
+    parser.add_argument('--rules', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--skus', type=int, default=2000)
+    parser.add_argument('--top-n', type=int, default=3)
+    args = parser.parse_args()
+
+    miner = RuleMiner(top_n=args.top_n)
+    print(f"{'rules':>9} {'frozenset (s)':>14} {'codes (s)':>10} {'equal':>6} {'encode (s)':>11} {'group (s)':>10}")
+    for n_rules in args.rules:
+        rules = synthetic_rules(n_rules, args.skus)
+        t_legacy, legacy = timed(lambda: legacy_filter_top(rules, args.top_n))
+        t_codes, result = timed(lambda: miner.filter_top(rules))
+
+        # The one pass over the frozensets, then grouping on the code matrix alone
+        t_encode, codes = timed(lambda: ItemsetEncoder().encode_codes(rules['antecedents'], fit=True))
+        t_group, _ = timed(lambda: itemset_ids(codes))
+        print(f'{n_rules:>9,} {t_legacy:>14.3f} {t_codes:>10.3f} {str(legacy.equals(result)):>6} {t_encode:>11.3f} {t_group:>10.3f}')
@@ -0,0 +1,100 @@
+# %% 0. Libraries
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.append('.')
+from src.order_dataset import OrderDataset
+
+
+# %% 1. Synthetic orders
+def synthetic_orders(n_orders, n_regions=10, n_buyers=50000, n_stores=500, n_days=365, seed=0):
+    rng = np.random.default_rng(seed)
+    created_date = pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, n_days, n_orders), unit='D')
+    quantity = rng.integers(1, 20, n_orders)
+    total_full_price = np.round(quantity * rng.gamma(2.0, 8.0, n_orders), 2)
+    total_discount = np.round(total_full_price * rng.choice([0, 0, 0, 0.1, 0.2], n_orders), 2)
+    total_discounted_price = total_full_price - total_discount
+    return pd.DataFrame({
+        'created_date': created_date,
+        'effective_date_time': created_date + pd.to_timedelta(rng.integers(0, 86400, n_orders), unit='s'),
+        'order_id': np.arange(n_orders).astype(str),
+        'region_id': rng.integers(1, n_regions + 1, n_orders),
+        'store_id': rng.integers(0, n_stores, n_orders),
+        'buyer_id': rng.integers(0, n_buyers, n_orders),
+        'payment_type': rng.choice(['CASH', 'YAPE', 'PLIN', 'CARD'], n_orders),
+        'purchase_completed': rng.choice([1, 0], n_orders, p=[0.96, 0.04]),
+        'total_discount': total_discount,
+        'quantity': quantity,
+        'total_discounted_price': total_discounted_price,
+        'total_full_price': total_full_price,
+        'avg_full_price_per_product': total_full_price / quantity,
+        'avg_disc_price_per_product': total_discounted_price / quantity,
+        'avg_disc_per_product': total_discount / quantity
+    })
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def disk_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+# %% 2. Benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Order level load time: CSV vs typed Feather / Parquet dataset')
+    parser.add_argument('--orders', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tmp_path = tempfile.mkdtemp()
+    try:
+        for n_orders in args.orders:
+            orders = synthetic_orders(n_orders)
+            csv_path = os.path.join(tmp_path, 'data_orders.csv')
+            orders.to_csv(csv_path, index=False)
+            datasets = {fmt: OrderDataset(os.path.join(tmp_path, fmt), format=fmt) for fmt in ['feather', 'parquet']}
+            for dataset in datasets.values():
+                dataset.write(orders)
+            region = orders['region_id'].iloc[0]
+            start, end = '2022-03-01', '2022-03-31'
+
+            cases = [
+                ('csv: read_csv', csv_path, lambda: pd.read_csv(csv_path)),
+                ('csv: read_csv + typed', csv_path, lambda: OrderDataset.typed(pd.read_csv(csv_path))),
+            ]
+            for fmt, dataset in datasets.items():
+                cases += [
+                    (f'{fmt}: full', dataset.path, lambda d=dataset: d.read(memory_map=False)),
+                    (f'{fmt}: full, mmap', dataset.path, lambda d=dataset: d.read(memory_map=True)),
+                    (f'{fmt}: 1 region', dataset.path, lambda d=dataset: d.read(regions=[region])),
+                    (f'{fmt}: 1 month', dataset.path, lambda d=dataset: d.read(start=start, end=end)),
+                    (f'{fmt}: 3 columns', dataset.path, lambda d=dataset: d.read(columns=['buyer_id', 'effective_date_time', 'total_discounted_price']))
+                ]
+
+            print(f'{n_orders:,} orders')
+            print(f"{'case':<26} {'load (s)':>9} {'rows':>9} {'disk MB':>8} {'RAM MB':>8}")
+            baseline = None
+            for name, path, func in cases:
+                seconds, df = timed(func, args.repeat)
+                baseline = baseline or seconds
+                ram = df.memory_usage(deep=True).sum() / 2**20
+                print(f'{name:<26} {seconds:>9.3f} {len(df):>9,} {disk_size(path) / 2**20:>8.1f} {ram:>8.1f}  x{baseline / seconds:.1f}')
+            print()
+    finally:
+        shutil.rmtree(tmp_path)
@@ -0,0 +1,162 @@
+# %% 0. Libraries
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import warnings
+import tracemalloc
+import subprocess
+import numpy as np
+import pandas as pd
+import psutil
+
+sys.path.append('.')
+from src.synthetic import SalesGenerator
+from src.ingest import SalesStore
+from src.streaming import OrderStreamer
+from src.aggregations import RegionAggregations
+from src.kpis import KPIEngine
+from src.cube import DailyCube
+from src.mining import RuleMiner, mine_regions
+from src.models import RFM
+from src.selection import KSelector
+
+RESULTS_PATH = 'benchmarks/results/'
+warnings.filterwarnings('ignore')
+
+
+# %% 1. Measurement
+def _measure(stage, size, func, results, trace=False):
+    # Wall and CPU time, RSS after the stage and, when traced, peak allocations (numpy and pandas buffers included)
+    # tracemalloc slows down allocation-heavy Python code several times, so traced timings only compare among themselves
+    process = psutil.Process()
+    if trace:
+        tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    output = func()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    rss = process.memory_info().rss / 2**20
+    rows = len(output) if hasattr(output, '__len__') else None
+    results.append({
+        'size': size,
+        'stage': stage,
+        'wall': wall,
+        'cpu': cpu,
+        'peak_mb': peak,
+        'rss_mb': rss,
+        'rows': rows
+    })
+    memory = f'{peak:>9.1f}MB' if trace else f'{rss:>9.1f}MB'
+    print(f'{size:>11,} {stage:<14} {wall:>8.3f}s {cpu:>8.3f}s {memory} {rows if rows is not None else "":>10}')
+    return output
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# %% 2. Pipeline stages
+def run_size(size, tmp_path, args, results):
+    def measure(stage, size, func, results):
+        return _measure(stage, size, func, results, trace=args.trace_memory)
+
+    generator = SalesGenerator(size, seed=args.seed, n_days=args.days)
+    source = os.path.join(tmp_path, f'sales_{size}.parquet')
+
+    def generate():
+        generator.write_parquet(source)
+        return range(size)
+    measure('generate', size, generate, results)
+
+    store = SalesStore(source, store_path=os.path.join(tmp_path, f'store_{size}'))
+    measure('ingest', size, lambda: [store.build()], results)
+    data = measure('load', size, lambda: store.load(), results)
+    data_orders = measure('build_orders', size, lambda: pd.concat(OrderStreamer(store).iter_orders(), ignore_index=True), results)
+
+    measure('aggregations', size, lambda: RegionAggregations(data=data, data_orders=data_orders).run(), results)
+    measure('kpis', size, lambda: KPIEngine(data_orders).rollups(), results)
+    measure('cube', size, lambda: DailyCube().build(data).cells, results)
+
+    miner = RuleMiner(algorithm=args.algorithm, min_support=args.min_support, max_len=3)
+    measure('mine_rules', size, lambda: mine_regions(data, miner, n_jobs=1), results)
+
+    rfm_vars = measure('rfm', size, lambda: {
+        region_id: RFM().get_vars(data=df, user_col='buyer_id', date_col='effective_date_time', order_col='order_id', ticket_col='total_discounted_price')
+        for region_id, df in data_orders.groupby('region_id', observed=True)
+    }, results)
+
+    def segment():
+        labels = {}
+        for region_id, df in rfm_vars.items():
+            X = df[['frequency', 'monetary', 'recency']].values
+            X = (X - X.min(axis=0)) / np.where(np.ptp(X, axis=0) > 0, np.ptp(X, axis=0), 1)
+            labels[region_id] = KSelector(k_values=range(2, 7), k=3, n_jobs=1, random_state=0).fit(X).labels_
+        return labels
+    measure('segment', size, segment, results)
+
+
+# %% 3. Comparison
+def compare(current, baseline_path):
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    base = {(r['size'], r['stage']): r for r in baseline['results']}
+    print(f"\nvs {baseline.get('commit')} ({baseline_path})")
+    memory = 'peak_mb' if current['args']['trace_memory'] and baseline['args'].get('trace_memory') else 'rss_mb'
+    print(f"{'size':>11} {'stage':<14} {'wall':>8} {memory:>8}")
+    for r in current['results']:
+        other = base.get((r['size'], r['stage']))
+        if other is None:
+            continue
+        print(f"{r['size']:>11,} {r['stage']:<14} {r['wall'] / max(other['wall'], 1e-9):>7.2f}x {r[memory] / max(other[memory], 1e-9):>7.2f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time and memory of every pipeline stage on synthetic sales bases')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**4, 10**5, 10**6], help='Line items, up to 10**8 given enough memory')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--algorithm', default='fpgrowth')
+    parser.add_argument('--min-support', type=float, default=0.01)
+    parser.add_argument('--trace-memory', action='store_true', help='Peak allocations per stage with tracemalloc, at a cost in speed')
+    parser.add_argument('--output', default=None, help='JSON file, defaults to benchmarks/results/<commit>.json')
+    parser.add_argument('--compare', default=None, help='Previous results JSON to compare against')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created_at': pd.Timestamp.now().isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'args': vars(args),
+        'results': []
+    }
+    print(f"{'size':>11} {'stage':<14} {'wall':>9} {'cpu':>9} {'peak' if args.trace_memory else 'rss':>11} {'rows':>10}")
+    tmp_path = tempfile.mkdtemp()
+    try:
+        for size in args.sizes:
+            run_size(size, tmp_path, args, report['results'])
+    finally:
+        shutil.rmtree(tmp_path)
+
+    output = args.output or os.path.join(RESULTS_PATH, f"{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nSaved {output}')
+    if args.compare:
+        compare(report, args.compare)
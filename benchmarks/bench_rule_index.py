@@ -0,0 +1,80 @@
+# %% 0. Libraries
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append('.')
+from src.recommend import RuleIndex
+
+
+# %% 1. Synthetic rules and carts
+def synthetic_rules(n_rules, n_skus, max_len=3, seed=0):
+    rng = np.random.default_rng(seed)
+    # Popular SKUs appear in more rules, as with mined rules
+    skus = ((rng.zipf(1.3, n_rules * (2 * max_len)) - 1) % n_skus).astype(str).reshape(n_rules, -1)
+    sizes = rng.integers(1, max_len + 1, n_rules)
+    antecedents = [frozenset(row[:size]) for row, size in zip(skus, sizes)]
+    consequents = [frozenset(row[max_len:max_len + 1]) - a or frozenset([str(n_skus + i)]) for i, (row, a) in enumerate(zip(skus, antecedents))]
+    confidence = rng.uniform(0.05, 1, n_rules)
+    return pd.DataFrame({
+        'antecedents': antecedents,
+        'consequents': consequents,
+        'support': rng.uniform(0.001, 0.05, n_rules),
+        'confidence': confidence,
+        'lift': confidence / rng.uniform(0.01, 0.2, n_rules)
+    })
+
+
+def synthetic_carts(n_carts, n_skus, mean_size=7, seed=1):
+    rng = np.random.default_rng(seed)
+    sizes = rng.poisson(mean_size - 1, n_carts) + 1
+    return [list(((rng.zipf(1.3, size) - 1) % n_skus).astype(str)) for size in sizes]
+
+
+def scan_recommend(rules, cart, n=5):
+    # Baseline: filter the rules table for antecedents contained in the cart
+    cart = frozenset(cart)
+    matched = rules[rules['antecedents'].map(cart.issuperset)]
+    matched = matched.explode('consequents')
+    matched = matched[~matched['consequents'].isin(cart)]
+    return matched.sort_values(['lift', 'confidence'], ascending=False).drop_duplicates('consequents').head(n)
+
+
+def latencies(func, carts):
+    times = np.empty(len(carts))
+    for i, cart in enumerate(carts):
+        start = time.perf_counter()
+        func(cart)
+        times[i] = time.perf_counter() - start
+    return times * 1e6
+
+
+# %% 2. Benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cart lookup latency: rule index vs scanning the rules table')
+    parser.add_argument('--rules', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--skus', type=int, default=5000)
+    parser.add_argument('--carts', type=int, default=5000)
+    parser.add_argument('--scan-carts', type=int, default=200)
+    args = parser.parse_args()
+
+    carts = synthetic_carts(args.carts, args.skus)
+    print(f"{'rules':>7} {'fit (s)':>8} {'p50 (us)':>9} {'p99 (us)':>9} {'scan p50 (us)':>14} {'same top':>9}")
+    for n_rules in args.rules:
+        rules = synthetic_rules(n_rules, args.skus)
+        start = time.perf_counter()
+        index = RuleIndex(top_k=5).fit(rules)
+        t_fit = time.perf_counter() - start
+
+        t_index = latencies(lambda cart: index.recommend(cart), carts)
+        scan_carts = carts[:args.scan_carts]
+        t_scan = latencies(lambda cart: scan_recommend(rules, cart), scan_carts)
+
+        # The top suggestion should match whenever the cart triggers any rule
+        same = [
+            index.recommend(cart, n=1)[0]['lift'] == scan_recommend(rules, cart, n=1)['lift'].iloc[0]
+            for cart in scan_carts if index.recommend(cart, n=1)
+        ]
+        print(f'{n_rules:>7} {t_fit:>8.2f} {np.percentile(t_index, 50):>9.1f} {np.percentile(t_index, 99):>9.1f} {np.percentile(t_scan, 50):>14.0f} {np.mean(same):>9.0%}')
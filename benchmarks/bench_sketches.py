@@ -0,0 +1,81 @@
+# %% 0. Libraries
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append('.')
+from src.sketches import HyperLogLog, grouped_nunique, grouped_registers, merge_registers, estimate
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+# %% 1. Error bounds
+def validate_error(p, cardinalities, trials, tolerance):
+    # Relative error should be unbiased and its spread close to 1.04 / sqrt(m) at every cardinality
+    expected = 1.04 / np.sqrt(1 << p)
+    print(f'p={p}: expected relative standard error {expected:.2%}')
+    print(f"{'n':>9} {'bias':>8} {'std':>8} {'max':>8}")
+    ok = True
+    for n in cardinalities:
+        errors = np.array([HyperLogLog(p).add(np.arange(n) + trial * 10**9).count() / n - 1 for trial in range(trials)])
+        bias, std, worst = errors.mean(), errors.std(), np.abs(errors).max()
+        # Bias within 3 standard errors of the mean, spread within the tolerance factor
+        passed = abs(bias) <= 3 * expected / np.sqrt(trials) + 1e-3 and std <= tolerance * expected
+        ok &= passed
+        print(f'{n:>9,} {bias:>8.2%} {std:>8.2%} {worst:>8.2%} {"" if passed else "FAIL"}')
+    return ok
+
+
+def validate_merge(p):
+    # Union of sketches must equal the sketch of the union, register by register
+    a, b = np.arange(0, 60000), np.arange(40000, 100000)
+    merged = HyperLogLog(p).add(a) | HyperLogLog(p).add(b)
+    union = HyperLogLog(p).add(np.union1d(a, b))
+    restored = HyperLogLog.from_bytes(merged.to_bytes())
+    return np.array_equal(merged.registers, union.registers) and np.array_equal(restored.registers, union.registers)
+
+
+# %% 2. Benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='HyperLogLog error bounds and groupby distinct counts vs nunique')
+    parser.add_argument('--p', type=int, default=12)
+    parser.add_argument('--trials', type=int, default=30)
+    parser.add_argument('--tolerance', type=float, default=1.3)
+    parser.add_argument('--rows', type=int, default=5000000)
+    args = parser.parse_args()
+
+    ok = validate_error(args.p, [10, 100, 1000, 5000, 10000, 50000, 100000, 1000000], args.trials, args.tolerance)
+    merge_ok = validate_merge(args.p)
+    print(f'merge == union: {merge_ok}')
+
+    # Distinct buyers per (region, day), then per region by merging the daily sketches
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'region_id': rng.integers(0, 10, args.rows).astype(str),
+        'day': rng.integers(0, 90, args.rows),
+        'buyer_id': pd.Categorical(rng.integers(0, 500000, args.rows).astype(str))
+    })
+    grouped = data.groupby(['region_id', 'day'], sort=True)
+    t_exact, exact = timed(lambda: grouped['buyer_id'].nunique())
+    t_approx, approx = timed(lambda: grouped_nunique(grouped, 'buyer_id', approx=True, p=args.p, exact_max_rows=0))
+    print(f'\n{args.rows:,} rows, {grouped.ngroups} (region, day) groups')
+    print(f'nunique {t_exact:.3f}s, HyperLogLog {t_approx:.3f}s, max error {(approx / exact - 1).abs().max():.2%}')
+
+    registers = grouped_registers(grouped.ngroup().values, data['buyer_id'], grouped.ngroups, args.p)
+    region_codes, regions = pd.factorize(exact.index.get_level_values('region_id'), sort=True)
+    t_rollup_exact, rollup_exact = timed(lambda: data.groupby('region_id', sort=True)['buyer_id'].nunique())
+    t_rollup, rollup = timed(lambda: estimate(merge_registers(registers, region_codes, len(regions))))
+    print(f'region rollup: rescan with nunique {t_rollup_exact:.3f}s, merge daily sketches {t_rollup:.3f}s, max error {np.abs(rollup / rollup_exact.values - 1).max():.2%}')
+
+    if not (ok and merge_ok):
+        sys.exit(1)
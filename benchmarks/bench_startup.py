@@ -0,0 +1,75 @@
+# %% 0. Libraries
+import re
+import sys
+import time
+import argparse
+import subprocess
+import numpy as np
+
+# Modules each entry point loads before doing any work (the scripts' headers, favo's per-subcommand imports)
+ENTRY_IMPORTS = {
+    'favo --help': ['favo'],
+    'favo build-orders': ['favo', 'pandas', 'src.ingest', 'src.streaming', 'src.order_dataset', 'src.snapshots', 'src.instrument'],
+    'favo report': ['favo', 'pandas', 'src.ingest', 'src.order_dataset', 'src.aggregations', 'src.kpis', 'src.heavy_hitters', 'src.instrument'],
+    'favo report --plots': ['favo', 'pandas', 'src.ingest', 'src.order_dataset', 'src.aggregations', 'src.kpis', 'src.heavy_hitters', 'src.instrument', 'src.plots'],
+    'favo mine-rules': ['favo', 'get_association_rules'],
+    'favo segment': ['favo', 'get_clusters'],
+    # main.py as a whole, for comparison
+    'main.py header': [
+        'dtale', 'numpy', 'pandas', 'seaborn', 'matplotlib.pyplot', 'src.plots', 'src.ingest', 'src.aggregations', 'src.snapshots', 'src.streaming',
+        'src.order_dataset', 'src.kpis', 'src.cube', 'src.heavy_hitters', 'src.utils', 'src.instrument'
+    ]
+}
+HEAVY = ['pandas', 'pyarrow', 'scipy', 'sklearn', 'mlxtend', 'matplotlib', 'seaborn', 'plotly', 'dtale']
+
+
+# %% 1. Measurement
+def installed(modules):
+    return [m for m in modules if subprocess.run([sys.executable, '-c', f'import {m}'], capture_output=True).returncode == 0]
+
+
+def import_run(modules):
+    # Fresh interpreter per run; -X importtime lists every module imported, with cumulative microseconds
+    code = '; '.join(f'import {m}' for m in modules) or 'pass'
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    loaded = set(re.findall(r'\|\s+([\w.]+)\s*$', result.stderr, flags=re.M))
+    return wall, loaded
+
+
+def import_breakdown(modules, top=10):
+    code = '; '.join(f'import {m}' for m in modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    rows = re.findall(r'import time:\s+\d+\s+\|\s+(\d+)\s+\|( *)([\w.]+)', result.stderr)
+    # Top-level packages only (one space of indentation), by cumulative time
+    top_level = [(int(us), name) for us, indent, name in rows if len(indent) == 1]
+    return sorted(top_level, reverse=True)[:top]
+
+
+# %% 2. Benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Interpreter start plus imports of every entry point')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--breakdown', default='main.py header', choices=sorted(ENTRY_IMPORTS))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'])
+    print(f'Bare interpreter: {time.perf_counter() - start:.3f}s')
+
+    print(f"{'entry point':<22} {'median (s)':>11} {'min (s)':>8}  heavy modules loaded")
+    for entry, modules in ENTRY_IMPORTS.items():
+        available = installed(modules)
+        walls = []
+        for _ in range(args.repeat):
+            wall, loaded = import_run(available)
+            walls.append(wall)
+        heavy = [m for m in HEAVY if m in loaded]
+        missing = sorted(set(modules) - set(available))
+        note = f" (not installed: {', '.join(missing)})" if missing else ''
+        print(f"{entry:<22} {np.median(walls):>11.3f} {min(walls):>8.3f}  {', '.join(heavy) or '-'}{note}")
+
+    print(f'\nSlowest top-level imports of {args.breakdown}:')
+    for us, name in import_breakdown(installed(ENTRY_IMPORTS[args.breakdown])):
+        print(f'{name:<30} {us / 1e6:>7.3f}s')
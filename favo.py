@@ -0,0 +1,265 @@
+# %% 0. Libraries
+# Only the standard library at module level: every subcommand imports what it needs, so
+# build-orders never loads sklearn or plotting and `--help` answers immediately
+import os
+import sys
+import runpy
+import argparse
+
+# %% 1. Settings
+IN_PATH = 'data/in/'
+OUT_PATH = 'data/out/'
+CACHE_PATH = 'data/cache/'
+FIGURES_PATH = 'reports/figures/'
+SALES_FILE = 'Estudio de caso - Base de ventas.xlsx'
+
+# Subcommands backed by the existing scripts, which parse their own options
+SCRIPTS = {
+    'mine-rules': 'get_association_rules.py',
+    'segment': 'get_clusters.py'
+}
+REPORT_TABLES = ['payment_type', 'base_ts', 'rnk_category', 'rnk_subcategory', 'rnk_brand']
+
+# Entry points of each stage, a file or a (file, function); the code a stage depends on is these plus everything
+# they import (src.dag.code_files), so editing any of it invalidates the stage like a new sales base does
+STAGE_ENTRIES = {
+    'ingest': ['src/ingest.py'],
+    'build-orders': [('favo.py', 'build_orders')],
+    'mine-rules': ['get_association_rules.py'],
+    'segment': ['get_clusters.py'],
+    'report': [('favo.py', 'report'), ('favo.py', 'save_plots')]
+}
+
+
+# %% 2. Subcommands
+def build_orders(args):
+    import pandas as pd
+    from src.ingest import SalesStore
+    from src.streaming import OrderStreamer
+    from src.order_dataset import OrderDataset
+    from src.snapshots import RFMSnapshotStore
+    from src.instrument import configure
+
+    instrument = configure(args.metrics or OUT_PATH + 'metrics/build_orders.jsonl')
+    store = SalesStore(args.source)
+    with instrument.stage('ingest'):
+        store.refresh()
+
+    # Order level csv for notebooks, typed region partitions for get_clusters.py, and the RFM state
+    with instrument.stage('build_orders') as record:
+        data_orders = pd.concat(OrderStreamer(store).write_csv(OUT_PATH + 'data_orders.csv'), ignore_index=True)
+        record['rows'] = len(data_orders)
+    with instrument.stage('write_orders'):
+        OrderDataset(OUT_PATH + 'data_orders/').write(data_orders)
+    if not args.no_snapshots:
+        with instrument.stage('rfm_snapshots'):
+            RFMSnapshotStore(CACHE_PATH + 'rfm_snapshots/').sync(data_orders)
+    print(f'{len(data_orders):,} orders written to {OUT_PATH}')
+
+
+def report(args):
+    import warnings
+    import pandas as pd
+    from src.ingest import SalesStore
+    from src.order_dataset import OrderDataset
+    from src.aggregations import RegionAggregations
+    from src.kpis import KPIEngine
+    from src.heavy_hitters import StreamingRanking
+    from src.instrument import configure
+
+    warnings.filterwarnings('ignore')
+    instrument = configure(args.metrics or OUT_PATH + 'metrics/report.jsonl')
+    if not os.path.exists(OUT_PATH + 'data_orders/'):
+        sys.exit(f'{OUT_PATH}data_orders/ not found, run `favo build-orders` first')
+
+    # Every region of the order partitions unless given; the comparison figures put two regions side by side
+    dataset = OrderDataset(OUT_PATH + 'data_orders/')
+    regions = args.regions or dataset.regions()
+    unknown = sorted(set(regions) - set(dataset.regions()))
+    if unknown:
+        sys.exit(f"Regions {', '.join(unknown)} not found in {OUT_PATH}data_orders/")
+    if args.plots and len(regions) != 2:
+        sys.exit(f'--plots compares two regions, got {len(regions)}: pass two with --regions')
+
+    store = SalesStore(args.source)
+    with instrument.stage('load') as record:
+        data = store.load()
+        data_orders = dataset.read()
+        record['rows'] = len(data)
+
+    with instrument.stage('aggregations'):
+        aggregations = RegionAggregations(data=data, data_orders=data_orders).run()
+        ranking_cols = ['region_id', 'sku', 'quantity', 'total_discounted_price']
+        sku_ranking = StreamingRanking('sku', capacity=200)
+        for chunk in store.iter_batches(columns=ranking_cols):
+            sku_ranking.consume(chunk)
+        sku_exact = sku_ranking.refine(store.iter_batches(columns=ranking_cols), k=20)
+
+    with instrument.stage('kpis'):
+        kpi_engine = KPIEngine(data_orders)
+        kpis = kpi_engine.compute()
+        kpis_rollups = kpi_engine.rollups()
+
+    # One workbook per region with the notebook's tables, plus the KPIs of every region
+    report_path = OUT_PATH + 'report/'
+    os.makedirs(report_path, exist_ok=True)
+    with instrument.stage('export'):
+        for region_id in regions:
+            with pd.ExcelWriter(report_path + f'report_R{region_id}.xlsx', engine='openpyxl') as writer:
+                for name in REPORT_TABLES:
+                    RegionAggregations.region(aggregations[name], region_id).to_excel(writer, sheet_name=name)
+                sku_ranking.pareto(region_id, k=20, exact=sku_exact).to_excel(writer, sheet_name='rnk_sku')
+        with pd.ExcelWriter(report_path + 'kpis.xlsx', engine='openpyxl') as writer:
+            kpis.to_excel(writer, sheet_name='kpis')
+            for freq, table in kpis_rollups.items():
+                table.to_excel(writer, sheet_name=freq)
+    print(f'Report tables written to {report_path}')
+
+    if args.plots:
+        with instrument.stage('plots'):
+            save_plots(aggregations, data_orders, regions)
+        print(f'Figures written to {FIGURES_PATH}')
+    if args.explore:
+        import dtale
+        # Blocks while the D-Tale session is served
+        dtale.show(data, subprocess=False)
+
+
+def save_plots(aggregations, data_orders, regions):
+    import matplotlib
+    matplotlib.use('Agg')
+    import seaborn as sns
+    import matplotlib.pyplot as plt
+    from src import plots
+    from src.aggregations import RegionAggregations
+
+    plt.rcParams['figure.autolayout'] = True
+    sns.set_theme(style='darkgrid')
+    os.makedirs(FIGURES_PATH, exist_ok=True)
+
+    region_a, region_b = regions
+    table = lambda name, region_id: RegionAggregations.region(aggregations[name], region_id)
+    figures = {
+        '01. Ordenes por tipo de pago y region': plots.payment_type_counts(data_orders, regions=(region_a, region_b)),
+        '02. Revenue por tipo de pago y region': plots.payment_type_revenue(table('payment_type', region_a).reset_index(), table('payment_type', region_b).reset_index(), regions=(region_a, region_b)),
+        '03. Evolucion de trx por region': plots.orders_evolution(table('base_ts', region_a).reset_index(), table('base_ts', region_b).reset_index(), regions=(region_a, region_b)),
+        '04. Promedio de ordenes por dia de la semana': plots.orders_by_weekday(table('base_ts', region_a).reset_index(), table('base_ts', region_b).reset_index(), regions=(region_a, region_b))
+    }
+    for i, region_id in enumerate(regions):
+        figures[f'{i + 5:02d}. Pareto de unidades vendidas por categorias en R{region_id}'] = plots.category_pareto(table('rnk_category', region_id), region_id)
+    for name, fig in figures.items():
+        fig.savefig(os.path.join(FIGURES_PATH, f'{name}.png'), bbox_inches='tight')
+        plt.close(fig)
+
+
+def pipeline_graph(args):
+    from src.dag import Task, TaskGraph, code_files
+    from src.ingest import SalesStore
+    from src.order_dataset import OrderDataset
+
+    # ingest -> build-orders -> segment (per region), report
+    #        -> mine-rules (per region)
+    favo = os.path.abspath(__file__)
+    store = SalesStore(args.source)
+    graph = TaskGraph(CACHE_PATH + 'dag/')
+    regions = lambda found: [r for r in found if args.regions is None or r in args.regions]
+    root = os.path.dirname(os.path.abspath(__file__))
+    stage_code = {stage: [os.path.join(root, f) for f in code_files(entries, root)] for stage, entries in STAGE_ENTRIES.items()}
+
+    graph.add(Task('ingest', func=store.refresh, inputs=[args.source] + stage_code['ingest'], outputs=[store.store_path]))
+    graph.add(Task(
+        'build-orders', command=[favo, 'build-orders', '--source', args.source], deps=['ingest'],
+        inputs=[args.source] + stage_code['build-orders'], outputs=[OUT_PATH + 'data_orders.csv', OUT_PATH + 'data_orders/']
+    ))
+    graph.fan_out('mine-rules', after='ingest', values=lambda: regions(store.regions()), make=lambda region_id: Task(
+        f'mine-rules_R{region_id}', command=[favo, 'mine-rules', '--regions', region_id, '--n-jobs', '1'] + args.rules_args,
+        inputs=[args.source] + stage_code['mine-rules'],
+        outputs=[OUT_PATH + f'association_rules_R{region_id}.xlsx', OUT_PATH + f'rule_index_R{region_id}.json']
+    ))
+    graph.fan_out('segment', after='build-orders', values=lambda: regions(OrderDataset(OUT_PATH + 'data_orders/').regions()), make=lambda region_id: Task(
+        f'segment_R{region_id}', command=[favo, 'segment', '--regions', region_id, '--n-jobs', '1'],
+        inputs=[OUT_PATH + f'data_orders/region_id={region_id}/'] + stage_code['segment'],
+        outputs=[OUT_PATH + f'segments/rfm_R{region_id}.parquet']
+    ))
+    # Without --regions the report covers every region of the order partitions, known once build-orders ran
+    report_args = ['--regions'] + args.regions if args.regions else []
+    graph.add(Task(
+        'report', command=[favo, 'report', '--source', args.source] + report_args + (['--plots'] if args.plots else []), deps=['build-orders'],
+        inputs=[args.source, OUT_PATH + 'data_orders/'] + stage_code['report'],
+        outputs=[OUT_PATH + 'report/kpis.xlsx'] + [OUT_PATH + f'report/report_R{region_id}.xlsx' for region_id in args.regions or []]
+    ))
+    return graph
+
+
+def run(args):
+    import time
+    from src.instrument import configure
+
+    configure(args.metrics or OUT_PATH + 'metrics/run.jsonl')
+    start = time.perf_counter()
+    status = pipeline_graph(args).run(targets=args.targets or None, jobs=args.jobs, force=args.force)
+    counts = {s: list(status.values()).count(s) for s in ['done', 'skipped', 'failed', 'blocked']}
+    print(f"{', '.join(f'{n} {s}' for s, n in counts.items() if n)} in {time.perf_counter() - start:.1f}s (logs in {CACHE_PATH}dag/logs/)")
+    if counts['failed'] or counts['blocked']:
+        sys.exit(1)
+
+
+def run_script(script, argv):
+    # Same behaviour as `python <script> <options>`, imports included, so they stay the single source of truth
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script)
+    sys.argv = [path] + argv
+    runpy.run_path(path, run_name='__main__')
+
+
+# %% 3. CLI
+def parser():
+    main_parser = argparse.ArgumentParser(prog='favo', description='Favo sales pipeline')
+    subparsers = main_parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build-orders', help='Order level tables, typed order partitions and RFM snapshots from the sales base')
+    build_parser.add_argument('--source', default=IN_PATH + SALES_FILE)
+    build_parser.add_argument('--no-snapshots', action='store_true', help='Skip the RFM snapshot sync')
+    build_parser.add_argument('--metrics', default=None)
+    build_parser.set_defaults(func=build_orders)
+
+    report_parser = subparsers.add_parser('report', help='Region tables, SKU rankings and KPIs as Excel workbooks')
+    report_parser.add_argument('--source', default=IN_PATH + SALES_FILE)
+    report_parser.add_argument('--regions', nargs='+', default=None, help='Regions to report; every region of the order partitions by default')
+    report_parser.add_argument('--plots', action='store_true', help='Also save the report figures (matplotlib, seaborn)')
+    report_parser.add_argument('--explore', action='store_true', help='Open the sales lines in D-Tale')
+    report_parser.add_argument('--metrics', default=None)
+    report_parser.set_defaults(func=report)
+
+    run_parser = subparsers.add_parser('run', help='Every stage in dependency order, skipping those whose inputs are unchanged')
+    run_parser.add_argument('targets', nargs='*', help='Stages to bring up to date with their dependencies (ingest, build-orders, mine-rules, segment, report); all by default')
+    run_parser.add_argument('--source', default=IN_PATH + SALES_FILE)
+    run_parser.add_argument('--regions', nargs='+', default=None, help='Regions to fan out to; all by default')
+    run_parser.add_argument('--jobs', type=int, default=None, help='Stages running at the same time')
+    run_parser.add_argument('--force', action='store_true', help='Run the selected stages even if unchanged')
+    run_parser.add_argument('--plots', action='store_true', help='Report figures too, for the two regions given with --regions')
+    run_parser.add_argument('--rules-args', nargs=argparse.REMAINDER, default=[], help='Options passed to every mine-rules job, e.g. --rules-args --algorithm fpgrowth')
+    run_parser.add_argument('--metrics', default=None)
+    run_parser.set_defaults(func=run)
+
+    for command, script in SCRIPTS.items():
+        # Options are parsed by the script itself: `favo mine-rules --help` shows them
+        script_parser = subparsers.add_parser(command, help=f'Run {script}', add_help=False)
+        script_parser.set_defaults(func=lambda args, argv, script=script: run_script(script, argv))
+    return main_parser
+
+
+def main(argv=None):
+    main_parser = parser()
+    args, extra = main_parser.parse_known_args(argv)
+    if args.command in SCRIPTS:
+        args.func(args, extra)
+        return
+    if extra:
+        main_parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    if args.command == 'run' and args.plots and len(args.regions or []) != 2:
+        main_parser.error('run --plots compares two regions: pass two with --regions')
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
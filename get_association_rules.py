@@ -1,15 +1,13 @@
 # %% 0. Libraries
-import time
+import argparse
 import warnings
-import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 
-from mlxtend.frequent_patterns import (
-    apriori,
-    association_rules
-)
+from src.ingest import SalesStore
+from src.mining import MINERS, RuleMiner, mine_regions
+from src.incremental import IncrementalRules
+from src.recommend import RuleIndex
+from src.instrument import configure
 
 # %% 1. Settings
 warnings.filterwarnings('ignore')
@@ -23,48 +21,68 @@ option_settings = {
 
 IN_PATH = 'data/in/'
 OUT_PATH = 'data/out/'
+CACHE_PATH = 'data/cache/'
 
-# %% 2. Import data
-dtypes_dict = {
-    'store_id': 'str',
-    'buyer_id': 'str',
-    'sku': 'str',
-    'order_number': 'str',
-    'region_id': 'str'
-}
-filename = 'Estudio de caso - Base de ventas.xlsx'
-data_ = pd.read_excel(IN_PATH + filename, engine='openpyxl', dtype=dtypes_dict)
+parser = argparse.ArgumentParser(description='Mine association rules per region')
+parser.add_argument('--algorithm', choices=sorted(MINERS), default='apriori')
+parser.add_argument('--min-support', type=float, default=0.01)
+parser.add_argument('--max-len', type=int, default=None)
+parser.add_argument('--top-n', type=int, default=3)
+parser.add_argument('--regions', nargs='+', default=None)
+parser.add_argument('--n-jobs', type=int, default=None)
+parser.add_argument('--incremental', action='store_true', help='Update persisted itemset counts with new days only')
+parser.add_argument('--metrics', default=OUT_PATH + 'metrics/association_rules.jsonl', help='JSON lines file with wall, CPU, memory and rows per stage')
+parser.add_argument('--profile', default=None, help='Comma-separated stages to run under cProfile (load, basket, mine, export)')
+parser.add_argument('--trace-memory', action='store_true', help='Peak allocations of the top-level stages with tracemalloc')
+args, _ = parser.parse_known_args()
 
-# %% 3. Processing
-data = data_.copy()
+if __name__ == '__main__':
+    instrument = configure(args.metrics, profile=args.profile, trace_memory=args.trace_memory)
 
-cols_to_drop = {
-    'leader_status',
-    'offer'
-}
-data.drop(columns=cols_to_drop, inplace=True)
+    # %% 2. Import data
+    filename = 'Estudio de caso - Base de ventas.xlsx'
+    store = SalesStore(IN_PATH + filename)
+    with instrument.stage('load') as record:
+        data_ = store.load(columns=['order_number', 'sku', 'region_id', 'created_date'], regions=args.regions)
+        record['rows'] = len(data_)
+
+    # %% 3. Processing
+    data = data_.copy()
 
-# %% 4. Algorithm
-basket_per_order_2 = data[data['region_id'] == '2'].groupby(['order_number', 'sku'])['order_number'].nunique().unstack().reset_index().fillna(0).set_index('order_number')
-frequent_itemsets_2 = apriori(basket_per_order_2, min_support=0.01, use_colnames=True)
-rules_2 = association_rules(frequent_itemsets_2, metric='lift', min_threshold=1)
-rules_2.sort_values(by=['antecedent support', 'lift'], ascending=False, inplace=True)
-rules_2['qty_antecedents'] = rules_2['antecedents'].apply(lambda x: len(x))
-rules_2['rn'] = rules_2.groupby(['antecedents'])['qty_antecedents'].rank(method='first')
-filt_rules_2 = rules_2.loc[rules['rn'] <= 3,:].copy()
+    # %% 4. Algorithm
+    miner = RuleMiner(
+        algorithm=args.algorithm,
+        min_support=args.min_support,
+        metric='lift',
+        min_threshold=1,
+        top_n=args.top_n,
+        max_len=args.max_len
+    )
+    if args.incremental:
+        # Counts are tracked below min_support, so itemset length is bounded by default
+        if miner.max_len is None:
+            miner.max_len = 3
+        maintainer = IncrementalRules(path=CACHE_PATH + 'rule_counts/', miner=miner)
+        filt_rules = {}
+        for region_id, df in data.groupby('region_id', observed=True):
+            with instrument.stage('incremental', region_id=region_id) as record:
+                print(f'REGION {region_id}: {maintainer.sync(region_id, df)}')
+                filt_rules[region_id] = maintainer.top_rules(region_id)
+                record['rows_in'], record['rows'] = len(df), len(filt_rules[region_id])
+    else:
+        # Basket and mining stages are recorded per region by the workers
+        with instrument.stage('mine_regions') as record:
+            filt_rules = mine_regions(data, miner, regions=args.regions, n_jobs=args.n_jobs)
+            record['rows'] = sum(len(rules) for rules in filt_rules.values())
 
-basket_per_order_6 = data[data['region_id'] == '6'].groupby(['order_number', 'sku'])['order_number'].nunique().unstack().reset_index().fillna(0).set_index('order_number')
-frequent_itemsets_6 = apriori(basket_per_order_6, min_support=0.01, use_colnames=True)
-rules_6 = association_rules(frequent_itemsets_6, metric='lift', min_threshold=1)
-rules_6.sort_values(by=['antecedent support', 'lift'], ascending=False, inplace=True)
-rules_6['qty_antecedents'] = rules_6['antecedents'].apply(lambda x: len(x))
-rules_6['rn'] = rules_6.groupby(['antecedents'])['qty_antecedents'].rank(method='first')
-filt_rules_6 = rules_6.loc[rules['rn'] <= 3,:].copy()
+    # %% 5. Export
+    for region_id, rules in filt_rules.items():
+        with instrument.stage('export', region_id=region_id) as record:
+            filename = f'association_rules_R{region_id}.xlsx'
+            rules.to_excel(OUT_PATH + filename, index=False, engine='openpyxl')
 
-# %% 5. Export
-filename = 'association_rules_R2.xlsx'
-filt_rules_2.to_excel(OUT_PATH + filename, index=False, engine='openpyxl')
-filename = 'association_rules_R6.xlsx'
-filt_rules_6.to_excel(OUT_PATH + filename, index=False, engine='openpyxl')
+            # Cart lookup index for get_recommendations.py
+            RuleIndex(top_k=args.top_n).fit(rules).save(OUT_PATH + f'rule_index_R{region_id}.json')
+            record['rows'] = len(rules)
 
 # %%
@@ -1,18 +1,12 @@
 # %% 0. Libraries
+import argparse
 import warnings
-import numpy as np
 import pandas as pd
-import seaborn as sns 
-import matplotlib.pyplot as plt
 
-from datetime import datetime
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
-from sklearn.preprocessing import MinMaxScaler
-
-from yellowbrick.cluster import silhouette_visualizer
-
-from src.models import RFM
+from src.snapshots import RFMSnapshotStore
+from src.order_dataset import OrderDataset
+from src.segmentation import SegmentationPipeline
+from src.instrument import configure
 
 # %% 1. Settings
 warnings.filterwarnings('ignore')
@@ -26,76 +20,64 @@ option_settings = {
 
 IN_PATH = 'data/in/'
 OUT_PATH = 'data/out/'
-
-# %% 2. Import data
-filename = 'data_orders.csv'
-data_trx = pd.read_csv(OUT_PATH + filename)
-data_trx.head()
-
-# %% 3. Model per region
-results = {}
-for region_id in data_trx['region_id'].unique():
-    print(f'REGION {region_id}')
-    df_ = data_trx[data_trx['region_id'] == region_id].copy() 
-
-    # Get RFM variables and scores
-    model = RFM()
-    rfm_vars = model.get_vars(data=df_, user_col='buyer_id', date_col='effective_date_time', order_col='order_id', ticket_col='total_discounted_price')
-
-    # Standardize
-    raw_cols = ['frequency', 'monetary', 'recency']
-    X = rfm_vars[raw_cols].copy()
-
-    scaler = MinMaxScaler()
-    norm_cols = ['norm_frequency', 'norm_monetary', 'norm_recency']
-    rfm_vars[norm_cols] = scaler.fit_transform(X)
-    print(rfm_vars.describe())
-
-    # Get Elbow Method plot
-    WCSS = []
-    for i in range(1,11):
-        model = KMeans(n_clusters = i, init = 'k-means++')
-        model.fit(rfm_vars[norm_cols])
-        WCSS.append(model.inertia_)
-    fig = plt.figure(figsize = (8, 5))
-    plt.plot(range(1,11), WCSS, linewidth=4, markersize=7, marker='o', color = 'green')
-    plt.xticks(np.arange(11))
-    plt.xlabel("Number of clusters")
-    plt.ylabel("WCSS")
-    plt.title('Elbow Method')
-    plt.show()
-
-    # Get Silhouette score plot for k-values
-    print('Silhouette score for:')
-    for i in range(3, 11):
-        labels=KMeans(n_clusters=i, init='k-means++', random_state=0).fit(rfm_vars[norm_cols]).labels_
-        score=silhouette_score(rfm_vars[norm_cols], labels, metric='euclidean', random_state=0)
-        print(f'{i} clusters: {score}')
-    silhouette_visualizer(KMeans(n_clusters=3, random_state=0), rfm_vars[norm_cols], colors='yellowbrick')
-    plt.show()
-
-    # KMeans
-    kmeans = KMeans(n_clusters=3, random_state=0).fit(rfm_vars[norm_cols])
-    rfm_vars['cluster'] = kmeans.predict(rfm_vars[norm_cols])
-
-    # Mapping values
-    new_values = {
-        2: '1. High',
-        1: '2. Mid',
-        0: '3. Low'
-    }
-    rfm_vars['_cluster'] = rfm_vars['cluster'].map(new_values)
-    results[f'region_{region_id}'] = rfm_vars
-
-    # Boxplots
-    fig, axes = plt.subplots(nrows=1, ncols=3, figsize=(16, 7))
-    sns.boxplot(x=rfm_vars['_cluster'], y=rfm_vars['recency'], ax=axes[0])
-    sns.boxplot(x=rfm_vars['_cluster'], y=rfm_vars['frequency'], ax=axes[1])
-    sns.boxplot(x=rfm_vars['_cluster'], y=rfm_vars['monetary'], ax=axes[2])
-    fig.suptitle(f'Variables por cluster en Region {region_id}')
-    axes[0].set(xlabel='Cluster', ylabel='Días desde la última compra', title='Recencia')
-    axes[1].set(xlabel='Cluster', ylabel='Número de ordenes', title='Frecuencia')
-    axes[2].set(xlabel='Cluster', ylabel='Ticket promedio', title='Valor monetario')
-    plt.show()
+CACHE_PATH = 'data/cache/'
+FIGURES_PATH = 'reports/figures/'
+
+parser = argparse.ArgumentParser(description='RFM segmentation per region')
+parser.add_argument('--source', choices=['orders', 'csv', 'snapshots'], default='orders')
+parser.add_argument('--as-of', default=None, help='RFM as of this date (snapshots source only)')
+parser.add_argument('--regions', nargs='+', default=None)
+parser.add_argument('--n-jobs', type=int, default=None)
+parser.add_argument('--no-cache', action='store_true', help='Recompute every region even if its orders are unchanged')
+parser.add_argument('--metrics', default=OUT_PATH + 'metrics/clusters.jsonl', help='JSON lines file with wall, CPU, memory and rows per stage')
+parser.add_argument('--profile', default=None, help='Comma-separated stages to run under cProfile (load, segment, rfm, RFM.get_vars, scaling, k_selection, labeling, persist, plots)')
+parser.add_argument('--trace-memory', action='store_true', help='Peak allocations of the top-level stages with tracemalloc')
+args, _ = parser.parse_known_args()
+
+if __name__ == '__main__':
+    instrument = configure(args.metrics, profile=args.profile, trace_memory=args.trace_memory)
+
+    # %% 2. Import data
+    with instrument.stage('load', source=args.source) as record:
+        if args.source == 'snapshots':
+            rfm_snapshots = RFMSnapshotStore(CACHE_PATH + 'rfm_snapshots/')
+            rfm_tables = {region_id: df.drop(columns='region_id').reset_index(drop=True) for region_id, df in rfm_snapshots.rfm(as_of=args.as_of).groupby('region_id')}
+            if args.regions is not None:
+                rfm_tables = {region_id: df for region_id, df in rfm_tables.items() if str(region_id) in args.regions}
+            data_trx = None
+        elif args.source == 'csv':
+            filename = 'data_orders.csv'
+            data_trx = OrderDataset.typed(pd.read_csv(OUT_PATH + filename))
+            if args.regions is not None:
+                data_trx = data_trx[data_trx['region_id'].isin(args.regions)]
+            rfm_tables = None
+        else:
+            data_trx = OrderDataset(OUT_PATH + 'data_orders/').read(regions=args.regions)
+            rfm_tables = None
+        record['rows'] = len(data_trx) if data_trx is not None else sum(len(df) for df in rfm_tables.values())
+
+    # %% 3. Model per region
+    pipeline = SegmentationPipeline(
+        out_path=OUT_PATH + 'segments/',
+        figures_path=FIGURES_PATH,
+        cache_path=None if args.no_cache else CACHE_PATH + 'segmentation/',
+        cache_max_bytes=512 * 2**20,
+        n_clusters=3,
+        k_values=range(1, 11),
+        n_jobs=args.n_jobs,
+        random_state=0
+    )
+    # Per-region stages (rfm, k_selection, plots, ...) are recorded by the workers
+    with instrument.stage('segment') as record:
+        # Region subsets (one job per region) keep their own summary
+        summary_name = 'run_summary.json' if args.regions is None else f"run_summary_R{'_'.join(args.regions)}.json"
+        summary = pipeline.run(orders=data_trx, rfm_tables=rfm_tables, summary_path=OUT_PATH + 'segments/' + summary_name)
+        record['rows'] = sum(region['n_buyers'] for region in summary['regions'])
+
+    for region in summary['regions']:
+        timings = ', '.join(f'{stage}: {seconds:.3f}s' for stage, seconds in region['timings'].items())
+        status = 'cached' if region['cached'] else timings
+        print(f"REGION {region['region_id']}: {region['n_buyers']} buyers, clusters {region['clusters']} ({status})")
+    print(f"Total: {summary['wall_time']:.3f}s")
 
 # %%
@@ -0,0 +1,72 @@
+# %% 0. Libraries
+import json
+import argparse
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.recommend import load_indexes
+
+# %% 1. Settings
+OUT_PATH = 'data/out/'
+
+parser = argparse.ArgumentParser(description='Cross-sell suggestions for a cart from the mined association rules')
+parser.add_argument('--region', default=None, help='Region of the cart (CLI mode)')
+parser.add_argument('--cart', nargs='+', default=None, help='SKUs in the cart (CLI mode)')
+parser.add_argument('--n', type=int, default=5)
+parser.add_argument('--serve', action='store_true', help='Serve GET /recommend?region=2&cart=sku1,sku2&n=5')
+parser.add_argument('--host', default='127.0.0.1')
+parser.add_argument('--port', type=int, default=8000)
+args, _ = parser.parse_known_args()
+
+
+# %% 2. HTTP front end
+def make_handler(indexes):
+    class RecommendHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/recommend':
+                return self._reply(404, {'error': 'not found'})
+            query = parse_qs(url.query)
+            region = query.get('region', [None])[0]
+            if region not in indexes:
+                return self._reply(400, {'error': f'unknown region {region}', 'regions': sorted(indexes)})
+            cart = [sku for value in query.get('cart', []) for sku in value.split(',') if sku]
+            try:
+                n = int(query.get('n', [5])[0])
+            except ValueError:
+                n = -1
+            if n < 0:
+                return self._reply(400, {'error': 'n must be a non-negative integer'})
+            self._reply(200, {'region': region, 'cart': cart, 'recommendations': indexes[region].recommend(cart, n=n)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return RecommendHandler
+
+
+if __name__ == '__main__':
+    # %% 3. Load rule indexes
+    indexes = load_indexes(OUT_PATH)
+
+    # %% 4. Serve or answer a single cart
+    if args.serve:
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(indexes))
+        print(f'Serving {sorted(indexes)} on http://{args.host}:{args.port}/recommend')
+        server.serve_forever()
+    else:
+        if args.n < 0:
+            parser.error('--n must be non-negative')
+        if args.region not in indexes or not args.cart:
+            parser.error(f'--region (one of {sorted(indexes)}) and --cart are required without --serve')
+        print(json.dumps(indexes[args.region].recommend(args.cart, n=args.n), indent=2))
+
+# %%
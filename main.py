@@ -1,14 +1,19 @@
 # %% 0. Libraries
-import dtale
 import warnings
-import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 
-from matplotlib.ticker import PercentFormatter
-
-from src.utils import Plotly_Plots
+from src import plots
+from src.ingest import SalesStore
+from src.aggregations import RegionAggregations
+from src.snapshots import RFMSnapshotStore
+from src.streaming import OrderStreamer
+from src.order_dataset import OrderDataset
+from src.kpis import KPIEngine
+from src.cube import DailyCube
+from src.heavy_hitters import StreamingRanking
+from src.instrument import configure
 
 # %% 1. Settings
 warnings.filterwarnings('ignore')
@@ -20,27 +25,38 @@ option_settings = {
 }
 [pd.set_option(setting, option) for setting, option in option_settings.items()]
 
-%matplotlib inline
 plt.rcParams["figure.autolayout"] = True
 sns.set_theme(style='darkgrid')
 
 IN_PATH = 'data/in/'
 OUT_PATH = 'data/out/'
+CACHE_PATH = 'data/cache/'
+
+# Wall, CPU, memory and rows per stage, appended as JSON lines
+instrument = configure(OUT_PATH + 'metrics/main.jsonl')
 
 # %% 2. Load data
-dtypes_dict = {
-    'store_id': 'str',
-    'buyer_id': 'str',
-    'sku': 'str',
-    'order_number': 'str',
-    'region_id': 'str'
-}
 filename = 'Estudio de caso - Base de ventas.xlsx'
-data_ = pd.read_excel(IN_PATH + filename, engine='openpyxl', dtype=dtypes_dict)
+store = SalesStore(IN_PATH + filename)
+cols_to_load = [
+    'store_id', 'store_first_day', 'buyer_id', 'sku', 'order_number', 'payment_type',
+    'purchase_completed', 'canceled', 'full_price', 'discounted_price', 'discount',
+    'quantity', 'order_quantity', 'order_subtotal', 'coupon_discount', 'total_full_price',
+    'total_discounted_price', 'region_id', 'created_date', 'payment_confirmed_at',
+    'effective_date_time', 'brand', 'category', 'subcategory'
+]
+with instrument.stage('load') as record:
+    data_ = store.load(columns=cols_to_load)
+    record['rows'] = len(data_)
 
 # %% 3. Exploratory data analysis
-d = dtale.show(data)
-dtale.instances()
+# D-Tale is only used here, so a missing install skips the session instead of failing the script
+try:
+    import dtale
+    d = dtale.show(data_)
+    dtale.instances()
+except ImportError:
+    print('dtale not installed, skipping the D-Tale session')
 
 ## Features description
 # 1. store_id: Id from store
@@ -73,344 +89,100 @@ dtale.instances()
 # %% 4. Processing
 data = data_.copy()
 
-cols_to_drop = {
-    'leader_status',
-    'offer'
-}
-data.drop(columns=cols_to_drop, inplace=True)
-
-# Order level
-data_orders = pd.pivot_table(
-    data=data,
-    index=['created_date', 'effective_date_time', 'order_number', 'region_id', 'store_id', 'buyer_id', 'payment_type', 'purchase_completed'],
-    values=[
-        'full_price', 'discount', 'discounted_price', 'quantity', 'coupon_discount', 
-        'total_full_price', 'total_discounted_price'
-    ],
-    aggfunc={
-        #'full_price': np.mean, # AVG full price per product => sum(total_full_price) / sum(quantity)
-        # 'discount_per_product': np.mean, # AVG discount per product => (sum(total_full_price) - sum(total_discounted_price)) / sum(quantity)
-        # 'discounted_price': np.mean, # AVG discounted price per product => sum(total_discounted_price) / sum(quantity) 
-        'quantity': np.sum, # Total qty per trx
-        'discount': np.sum, # sum(discount) == distinct(coupon_discount) 
-        'total_full_price': np.sum, # Total FP per trx 
-        'total_discounted_price': np.sum # Total revenue per trx
-    }
-)
-data_orders.reset_index(inplace=True)
-rename_cols = {
-    'order_number': 'order_id',
-    'discount': 'total_discount'
-}
-data_orders.rename(columns=rename_cols, inplace=True)
-data_orders['avg_full_price_per_product'] = data_orders['total_full_price'] / data_orders['quantity']
-data_orders['avg_disc_price_per_product'] = data_orders['total_discounted_price'] / data_orders['quantity']
-data_orders['avg_disc_per_product'] = data_orders['total_discount'] / data_orders['quantity']
-to_map = {
-    'Yes': 1,
-    'No': 0
-}
-data_orders['purchase_completed'] = data_orders['purchase_completed'].map(to_map)
+# Order level, streamed month by month from the columnar store and written as it goes
 filename = 'data_orders.csv'
-data_orders.to_csv(OUT_PATH + filename, sep=',', index=False)
-
-# Payment method level
-payment_type_2 = pd.pivot_table(
-    data=data_orders[data_orders['region_id'] == '2'],
-    index='payment_type',
-    values=['order_id', 'total_discounted_price'],
-    aggfunc={
-        'order_id': pd.Series.nunique,
-        'total_discounted_price': np.sum
-    }
-)
-payment_type_6 = pd.pivot_table(
-    data=data_orders[data_orders['region_id'] == '6'],
-    index='payment_type',
-    values=['order_id', 'total_discounted_price'],
-    aggfunc={
-        'order_id': pd.Series.nunique,
-        'total_discounted_price': np.sum
-    }
-)
-payment_type_2.sort_values(by='total_discounted_price', ascending=False, inplace=True)
-payment_type_6.sort_values(by='total_discounted_price', ascending=False, inplace=True)
-payment_type_2['orders_cum_prc'] = payment_type_2['order_id'].cumsum() / payment_type_2['order_id'].sum() 
-payment_type_6['orders_cum_prc'] = payment_type_6['order_id'].cumsum() / payment_type_6['order_id'].sum() 
-payment_type_2['revenue_cum_prc'] = payment_type_2['total_discounted_price'].cumsum() / payment_type_2['total_discounted_price'].sum() 
-payment_type_6['revenue_cum_prc'] = payment_type_6['total_discounted_price'].cumsum() / payment_type_6['total_discounted_price'].sum() 
-payment_type_2.reset_index(inplace=True)
-payment_type_6.reset_index(inplace=True)
+order_streamer = OrderStreamer(store)
+with instrument.stage('build_orders') as record:
+    data_orders = pd.concat(order_streamer.write_csv(OUT_PATH + filename), ignore_index=True)
+    record['rows'] = len(data_orders)
+
+# Typed copy for downstream scripts (categoricals, datetimes, float32 money), partitioned by region
+order_dataset = OrderDataset(OUT_PATH + 'data_orders/')
+with instrument.stage('write_orders'):
+    order_dataset.write(data_orders)
+
+# Per-buyer RFM state, only days not yet seen are applied
+rfm_snapshots = RFMSnapshotStore(CACHE_PATH + 'rfm_snapshots/')
+with instrument.stage('rfm_snapshots'):
+    rfm_snapshots.sync(data_orders)
+
+# Region level aggregations (all regions in one grouped pass per table)
+with instrument.stage('aggregations') as record:
+    aggregations = RegionAggregations(data=data, data_orders=data_orders).run()
+    record['rows'] = sum(len(table) for table in aggregations.values())
+region_table = RegionAggregations.region
+
+# Daily cube (date x region x store x payment type x category) with additive measures and exact distinct counts,
+# plus an approximate date x region x category rollup for dashboard queries
+with instrument.stage('cube') as record:
+    daily_cube = DailyCube().build(data)
+    daily_cube.save(OUT_PATH + 'daily_cube/')
+    category_cube = daily_cube.rollup(['created_date', 'region_id', 'category'], approx=True)
+    category_cube.save(OUT_PATH + 'category_cube/')
+    record['rows'] = len(daily_cube.cells) + len(category_cube.cells)
+
+payment_type_2 = region_table(aggregations['payment_type'], '2').reset_index()
+payment_type_6 = region_table(aggregations['payment_type'], '6').reset_index()
 
 # Daily time series
-base_ts_2 = pd.pivot_table(
-    data=data_orders[data_orders['region_id']=='2'],
-    index='created_date',
-    values=[
-        'order_id', 'buyer_id', 'purchase_completed', 'quantity', 
-        'total_discounted_price', 'total_full_price', 'total_discount', 
-        'avg_full_price_per_product', 'avg_disc_per_product'
-    ],
-    aggfunc={
-        'order_id': pd.Series.nunique,
-        'buyer_id': pd.Series.nunique,
-        'purchase_completed': np.sum,
-        'quantity': np.mean,
-        'total_full_price': np.sum,
-        'total_discount': np.sum,
-        'total_discounted_price': np.sum,
-        'avg_full_price_per_product': np.mean,
-        'avg_disc_per_product': np.mean
-    }
-).reset_index()
-base_ts_2.set_index('created_date', inplace=True)
-base_ts_2 = base_ts_2.resample('D').sum()
-base_ts_2.reset_index(inplace=True)
-base_ts_2['day_name'] = base_ts_2['created_date'].dt.day_name()
-
-base_ts_6 = pd.pivot_table(
-    data=data_orders[data_orders['region_id']=='6'],
-    index='created_date',
-    values=[
-        'order_id', 'buyer_id', 'purchase_completed', 'quantity', 
-        'total_discounted_price', 'total_full_price', 'total_discount', 
-        'avg_full_price_per_product', 'avg_disc_per_product'
-    ],
-    aggfunc={
-        'order_id': pd.Series.nunique,
-        'buyer_id': pd.Series.nunique,
-        'purchase_completed': np.sum,
-        'quantity': np.mean,
-        'total_full_price': np.sum,
-        'total_discount': np.sum,
-        'total_discounted_price': np.sum,
-        'avg_full_price_per_product': np.mean,
-        'avg_disc_per_product': np.mean
-    }
-).reset_index()
-base_ts_6.set_index('created_date', inplace=True)
-base_ts_6 = base_ts_6.resample('D').sum()
-base_ts_6.reset_index(inplace=True)
-base_ts_6['day_name'] = base_ts_6['created_date'].dt.day_name()
-
-# Categories ranking
-rnk_category_2 = pd.pivot_table(
-    data=data[data['region_id'] == '2'],
-    index='category',
-    values=['order_number', 'quantity', 'total_discounted_price'],
-    aggfunc={
-        'order_number': pd.Series.nunique,
-        'quantity': np.sum,
-        'total_discounted_price': np.sum
-    }
-).sort_values(by='quantity', ascending=False)
-rnk_category_6 = pd.pivot_table(
-    data=data[data['region_id'] == '6'],
-    index='category',
-    values=['order_number', 'quantity', 'total_discounted_price'],
-    aggfunc={
-        'order_number': pd.Series.nunique,
-        'quantity': np.sum,
-        'total_discounted_price': np.sum
-    }
-).sort_values(by='quantity', ascending=False)
-rnk_category_2['qty_cumperc'] = rnk_category_2['quantity'].cumsum() / rnk_category_2['quantity'].sum(axis=0) * 100
-rnk_category_6['qty_cumperc'] = rnk_category_6['quantity'].cumsum() / rnk_category_6['quantity'].sum(axis=0) * 100
-
-# Subcategories ranking
-rnk_subcategory_2 = pd.pivot_table(
-    data=data[data['region_id'] == '2'],
-    index='subcategory',
-    values=['order_number', 'quantity', 'total_discounted_price'],
-    aggfunc={
-        'order_number': pd.Series.nunique,
-        'quantity': np.sum,
-        'total_discounted_price': np.sum
-    }
-).sort_values(by='quantity', ascending=False)
-rnk_subcategory_6 = pd.pivot_table(
-    data=data[data['region_id'] == '6'],
-    index='subcategory',
-    values=['order_number', 'quantity', 'total_discounted_price'],
-    aggfunc={
-        'order_number': pd.Series.nunique,
-        'quantity': np.sum,
-        'total_discounted_price': np.sum
-    }
-).sort_values(by='quantity', ascending=False)
-rnk_subcategory_2['qty_cumperc'] = rnk_subcategory_2['quantity'].cumsum() / rnk_subcategory_2['quantity'].sum(axis=0) * 100
-rnk_subcategory_6['qty_cumperc'] = rnk_subcategory_6['quantity'].cumsum() / rnk_subcategory_6['quantity'].sum(axis=0) * 100
-
-# Brands ranking
-rnk_brand_2 = pd.pivot_table(
-    data=data[data['region_id'] == '2'],
-    index='brand',
-    values=['order_number', 'quantity', 'total_discounted_price'],
-    aggfunc={
-        'order_number': pd.Series.nunique,
-        'quantity': np.sum,
-        'total_discounted_price': np.sum
-    }
-).sort_values(by='quantity', ascending=False)
-rnk_brand_6 = pd.pivot_table(
-    data=data[data['region_id'] == '6'],
-    index='brand',
-    values=['order_number', 'quantity', 'total_discounted_price'],
-    aggfunc={
-        'order_number': pd.Series.nunique,
-        'quantity': np.sum,
-        'total_discounted_price': np.sum
-    }
-).sort_values(by='quantity', ascending=False)
-rnk_brand_2['qty_cumperc'] = rnk_brand_2['quantity'].cumsum() / rnk_brand_2['quantity'].sum(axis=0) * 100
-rnk_brand_6['qty_cumperc'] = rnk_brand_6['quantity'].cumsum() / rnk_brand_6['quantity'].sum(axis=0) * 100
+base_ts_2 = region_table(aggregations['base_ts'], '2').reset_index()
+base_ts_6 = region_table(aggregations['base_ts'], '6').reset_index()
+
+# Categories, subcategories and brands ranking
+rnk_category_2 = region_table(aggregations['rnk_category'], '2')
+rnk_category_6 = region_table(aggregations['rnk_category'], '6')
+rnk_subcategory_2 = region_table(aggregations['rnk_subcategory'], '2')
+rnk_subcategory_6 = region_table(aggregations['rnk_subcategory'], '6')
+rnk_brand_2 = region_table(aggregations['rnk_brand'], '2')
+rnk_brand_6 = region_table(aggregations['rnk_brand'], '6')
+
+# Top SKUs per region, streamed from the store with bounded memory (heavy hitters + exact refinement)
+ranking_cols = ['region_id', 'sku', 'quantity', 'total_discounted_price']
+sku_ranking = StreamingRanking('sku', capacity=200)
+with instrument.stage('sku_ranking'):
+    for chunk in store.iter_batches(columns=ranking_cols):
+        sku_ranking.consume(chunk)
+    sku_exact = sku_ranking.refine(store.iter_batches(columns=ranking_cols), k=20)
+rnk_sku_2 = sku_ranking.pareto('2', k=20, exact=sku_exact)
+rnk_sku_6 = sku_ranking.pareto('6', k=20, exact=sku_exact)
 
 # %% 5. Plots
-mask_region_2 = data_orders['region_id'] == '2'
-mask_region_6 = data_orders['region_id'] == '6'
-
-# Lineplot: Trx evolution
-fig, ax1 = plt.subplots(1, 1, figsize=(10, 4))
-ax2 = ax1.twinx()
-ax1.plot(base_ts_2[['created_date', 'order_id']].set_index('created_date'), color='g')
-ax2.plot(base_ts_6[['created_date', 'order_id']].set_index('created_date'), color='b')
-ax1.set_xlabel('Día')
-ax1.set_ylabel('Ordenes (Region 2)')
-ax2.set_ylabel('Ordenes (Region 6)')
-fig.legend(['Region 2', 'Region 6'])
-fig.suptitle('Evolución de ordenes diarias por region')
-fig.autofmt_xdate(rotation=45)
+plots.orders_evolution(base_ts_2, base_ts_6, regions=('2', '6'))
 plt.show()
 
-# Barplot: Avg trx per day
-fig, axes = plt.subplots(1, 2, figsize=(12, 4))
-sns.barplot(
-    x='day_name', 
-    y='order_id',
-    data=base_ts_2.groupby(['day_name'])['order_id'].mean().sort_values(ascending=False).reset_index(),
-    ax=axes[0]
-)
-sns.barplot(
-    x='day_name', 
-    y='order_id',
-    data=base_ts_6.groupby(['day_name'])['order_id'].mean().sort_values(ascending=False).reset_index(),
-    ax=axes[1]
-)
-axes[0].set(xlabel='Dia de la semana', ylabel='Ordenes promedio', title='Region 2')
-axes[1].set(xlabel='Dia de la semana', ylabel='Ordenes promedio', title='Region 6')
-fig.suptitle('Promedio de ordenes por dia de la semana', fontsize=15)
+plots.orders_by_weekday(base_ts_2, base_ts_6, regions=('2', '6'))
 plt.show()
 
-# Countplot: Qty of trx
-fig, axes = plt.subplots(2, 1, figsize=(10, 10))
-sns.countplot(
-    y='payment_type', 
-    data=data_orders[mask_region_2],
-    order=data_orders.loc[mask_region_2, 'payment_type'].value_counts().index,
-    ax=axes[0]
-)
-sns.countplot(
-    y='payment_type', 
-    data=data_orders[mask_region_6],
-    order=data_orders.loc[mask_region_6, 'payment_type'].value_counts().index,
-    ax=axes[1]
-)
-fig.suptitle('Número de ordenes por tipo de pago y región', fontsize=20)
-axes[0].set(xlabel='Numero de ordenes', ylabel='Tipo de pago', title='Region 2')
-axes[1].set(xlabel='Numero de ordenes', ylabel='Tipo de pago', title='Region 6')
+plots.payment_type_counts(data_orders, regions=('2', '6'))
 plt.show()
 
-# Barplot: Total discounted price
-fig, axes = plt.subplots(2, 1, figsize=(10, 10))
-sns.barplot(
-    y='payment_type', 
-    x='total_discounted_price',
-    data=payment_type_2,
-    ax=axes[0]
-)
-sns.barplot(
-    y='payment_type',
-    x='total_discounted_price',
-    data=payment_type_6,
-    ax=axes[1]
-)
-fig.suptitle('Revenue por tipo de pago y región', fontsize=20)
-axes[0].set(xlabel='Revenue', ylabel='Tipo de pago', title='Region 2')
-axes[1].set(xlabel='Revenue', ylabel='Tipo de pago', title='Region 6')
+plots.payment_type_revenue(payment_type_2, payment_type_6, regions=('2', '6'))
 plt.show()
 
-# Pareto plot - Categories ranking in Region 2
-fig, ax = plt.subplots(1, 1, figsize=(8, 4))
-ax.bar(
-    x=rnk_category_2.index, 
-    height=rnk_category_2['quantity'], 
-    color='darkcyan'
-)
-ax2 = ax.twinx()
-ax2.plot(
-    rnk_category_2.index, 
-    rnk_category_2['qty_cumperc'], 
-    color='chocolate', 
-    marker='D', 
-    ms=6
-)
-ax2.yaxis.set_major_formatter(PercentFormatter())
-ax2.axhline(y=60, xmin=0.05, xmax=0.95, linestyle='--', color='red')
-ax.tick_params(axis='x', rotation=70, labelsize=8)
-ax.set(xlabel='Categorias', ylabel='Unidades vendidas')
-ax2.set(xlabel='Categorias', ylabel='Unidades vendidas (%)')
-plt.title('Pareto de unidades vendidas por categoria en Región 2', fontsize=15)
+plots.category_pareto(rnk_category_2, '2', rotation=70)
 plt.show()
 
-# Pareto plot - Categories ranking in Region 6
-fig, ax = plt.subplots(1, 1, figsize=(8, 4))
-ax.bar(
-    x=rnk_category_6.index, 
-    height=rnk_category_6['quantity'], 
-    color='darkcyan'
-)
-ax2 = ax.twinx()
-ax2.plot(
-    rnk_category_6.index, 
-    rnk_category_6['qty_cumperc'], 
-    color='chocolate', 
-    marker='D', 
-    ms=6
-)
-ax2.yaxis.set_major_formatter(PercentFormatter())
-ax2.axhline(y=60, xmin=0.05, xmax=0.95, linestyle='--', color='red')
-ax.tick_params(axis='x', rotation=90, labelsize=8)
-ax.set(xlabel='Categorias', ylabel='Unidades vendidas')
-ax2.set(xlabel='Categorias', ylabel='Unidades vendidas (%)')
-plt.title('Pareto de unidades vendidas por categoria en Región 6', fontsize=15)
+plots.category_pareto(rnk_category_6, '6', rotation=90)
 plt.show()
 
-# Frequency
-data_orders.order_id.nunique() / data_orders.buyer_id.nunique()
-
-# MAUs
-data_orders.buyer_id.nunique()
-
-# MRPU
-data_orders.total_discounted_price.sum() / data_orders.buyer_id.nunique()
-
-# Trx
-data_orders.order_id.nunique()
+# %% 6. KPIs
+# Frequency, MAUs, MRPU, trx, tickets, discount effect and units per order per region (and All)
+kpi_engine = KPIEngine(data_orders)
+with instrument.stage('kpis'):
+    kpis = kpi_engine.compute()
+    kpis_rollups = kpi_engine.rollups()
+kpis
 
-# Ticket full price
-base_ts_2.iloc[:, 1:].sum()[7] / base_ts_2.iloc[:, 1:].sum()[2]
-base_ts_6.iloc[:, 1:].sum()[7] / base_ts_6.iloc[:, 1:].sum()[2]
+# Daily, weekly and monthly rollups
+kpis_rollups['monthly']
 
-# Ticket discounted price
-base_ts_2.iloc[:, 1:].sum()[6] / base_ts_2.iloc[:, 1:].sum()[2]
-base_ts_6.iloc[:, 1:].sum()[6] / base_ts_6.iloc[:, 1:].sum()[2]
+# Weekly revenue, tickets and buyers per region and category from the approximate rollup
+category_cube.query(by=['region_id', 'created_date', 'category'], freq='weekly')
 
-# Discount effect
-base_ts_2.iloc[:, 1:].sum()[5] / base_ts_2.iloc[:, 1:].sum()[2]
-base_ts_6.iloc[:, 1:].sum()[5] / base_ts_6.iloc[:, 1:].sum()[2]
+# Weekly revenue and exact buyers per store from the daily cube
+daily_cube.query(by=['region_id', 'store_id', 'created_date'], freq='weekly')
 
-# Average units per order
-base_ts_2.iloc[:, 1:].mean()[4]
-base_ts_6.iloc[:, 1:].mean()[4]
+# Stage timings of this run
+instrument.summary()
 
 # %%
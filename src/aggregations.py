@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+REGION_COL = 'region_id'
+RANKING_DIMS = ['category', 'subcategory', 'brand']
+
+
+class RegionAggregations():
+    def __init__(self, data, data_orders, region_col=REGION_COL):
+        self.data = data
+        self.data_orders = data_orders
+        self.region_col = region_col
+
+    def _cum_share(self, df, col):
+        return df.groupby(level=self.region_col)[col].cumsum() / df.groupby(level=self.region_col)[col].transform('sum')
+
+    def _sort_within_region(self, df, col):
+        # Stable sort keeps regions grouped and ties in dimension order
+        order = np.lexsort((-df[col].values, df.index.get_level_values(self.region_col).astype(str)))
+        return df.iloc[order]
+
+    def payment_type(self):
+        _table = self.data_orders.groupby([self.region_col, 'payment_type'], observed=True, sort=True).agg(
+            order_id=('order_id', 'nunique'),
+            total_discounted_price=('total_discounted_price', 'sum')
+        )
+        _table = self._sort_within_region(_table, 'total_discounted_price')
+        _table['orders_cum_prc'] = self._cum_share(_table, 'order_id')
+        _table['revenue_cum_prc'] = self._cum_share(_table, 'total_discounted_price')
+        return _table
+
+    def daily_series(self):
+        # Columns follow the alphabetical order pd.pivot_table produced
+        _table = self.data_orders.groupby([self.region_col, 'created_date'], observed=True, sort=True).agg(
+            avg_disc_per_product=('avg_disc_per_product', 'mean'),
+            avg_full_price_per_product=('avg_full_price_per_product', 'mean'),
+            buyer_id=('buyer_id', 'nunique'),
+            order_id=('order_id', 'nunique'),
+            purchase_completed=('purchase_completed', 'sum'),
+            quantity=('quantity', 'mean'),
+            total_discount=('total_discount', 'sum'),
+            total_discounted_price=('total_discounted_price', 'sum'),
+            total_full_price=('total_full_price', 'sum')
+        )
+
+        # Fill missing days within each region's own date range
+        dates = _table.index.get_level_values('created_date')
+        bounds = pd.Series(dates, index=_table.index.get_level_values(self.region_col)).groupby(level=0).agg(['min', 'max'])
+        full_index = pd.MultiIndex.from_tuples(
+            [(region, day) for region, row in bounds.iterrows() for day in pd.date_range(row['min'], row['max'], freq='D')],
+            names=[self.region_col, 'created_date']
+        )
+        _table = _table.reindex(full_index, fill_value=0)
+        _table['day_name'] = _table.index.get_level_values('created_date').day_name()
+        return _table
+
+    def ranking(self, dim):
+        _table = self.data.groupby([self.region_col, dim], observed=True, sort=True).agg(
+            order_number=('order_number', 'nunique'),
+            quantity=('quantity', 'sum'),
+            total_discounted_price=('total_discounted_price', 'sum')
+        )
+        _table = self._sort_within_region(_table, 'quantity')
+        _table['qty_cumperc'] = self._cum_share(_table, 'quantity') * 100
+        return _table
+
+    def run(self, dims=RANKING_DIMS):
+        tables = {
+            'payment_type': self.payment_type(),
+            'base_ts': self.daily_series()
+        }
+        for dim in dims:
+            tables[f'rnk_{dim}'] = self.ranking(dim)
+        return tables
+
+    @staticmethod
+    def region(table, region_id):
+        return table.xs(region_id, level=REGION_COL)
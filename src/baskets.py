@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class BasketBuilder():
+    def __init__(self, order_col='order_number', item_col='sku'):
+        self.order_col = order_col
+        self.item_col = item_col
+
+    def _codes(self, values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.cat.remove_unused_categories()
+            return values.cat.codes.values, values.cat.categories
+        codes, uniques = pd.factorize(values, sort=True)
+        return codes, pd.Index(uniques)
+
+    def to_csr(self, data):
+        rows, orders = self._codes(data[self.order_col])
+        cols, items = self._codes(data[self.item_col])
+
+        # Duplicated (order, item) pairs collapse to a single True entry
+        basket = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=bool), (rows, cols)),
+            shape=(len(orders), len(items)),
+            dtype=bool
+        )
+        basket.sum_duplicates()
+        basket.data[:] = True
+        return basket, orders, items
+
+    def build(self, data):
+        basket, orders, items = self.to_csr(data)
+        _basket = pd.DataFrame.sparse.from_spmatrix(basket, index=orders, columns=items)
+        _basket.index.name = self.order_col
+        return _basket
+
+    def build_dense(self, data):
+        return data.groupby([self.order_col, self.item_col], observed=True)[self.order_col].nunique().unstack().reset_index().fillna(0).set_index(self.order_col)
+
+    @staticmethod
+    def memory_footprint(basket):
+        if sparse.issparse(basket):
+            return basket.data.nbytes + basket.indices.nbytes + basket.indptr.nbytes
+        return int(basket.memory_usage(index=False, deep=True).sum())
@@ -0,0 +1,108 @@
+import os
+import json
+import inspect
+import hashlib
+import pandas as pd
+
+
+def frame_fingerprint(df):
+    # Content hash of values, column names and dtypes, independent of the index
+    sha = hashlib.sha256()
+    sha.update(json.dumps([str(c) for c in df.columns]).encode())
+    sha.update(json.dumps([str(t) for t in df.dtypes]).encode())
+    sha.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return sha.hexdigest()
+
+
+def file_fingerprint(path, chunk_size=2**20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def code_version(*objects):
+    sha = hashlib.sha256()
+    for obj in objects:
+        sha.update(inspect.getsource(obj).encode())
+    return sha.hexdigest()[:16]
+
+
+class DiskCache():
+    def __init__(self, path, max_bytes=512 * 2**20):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256('|'.join(str(p) for p in parts).encode()).hexdigest()
+
+    def _file(self, key, ext):
+        return os.path.join(self.path, f'{key}.{ext}')
+
+    def _touch(self, path):
+        # Access time drives eviction; mtime is used since atime is often disabled
+        os.utime(path, None)
+
+    def get_frame(self, key):
+        path = self._file(key, 'parquet')
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return pd.read_parquet(path)
+
+    def put_frame(self, key, df):
+        path = self._file(key, 'parquet')
+        tmp_path = path + '.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def get_json(self, key):
+        path = self._file(key, 'json')
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def put_json(self, key, obj):
+        path = self._file(key, 'json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(obj, f)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def _entries(self):
+        # Other workers may evict the same files between listdir and stat
+        entries = []
+        for f in os.listdir(self.path):
+            if f.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path, f))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, f))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+
+        # Least recently used first
+        for _, size, f in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.path, f))
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
@@ -0,0 +1,225 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from src.sketches import DEFAULT_P, merge_sparse, sparse_estimate, sparse_registers
+
+DATE_COL = 'created_date'
+DIMENSIONS = ['created_date', 'region_id', 'store_id', 'payment_type', 'category']
+# Additive measures: name -> (line column, aggregation)
+MEASURES = {
+    'lines': ('sku', 'count'),
+    'units': ('quantity', 'sum'),
+    'revenue': ('total_discounted_price', 'sum'),
+    'full_price': ('total_full_price', 'sum'),
+    'discount': ('discount', 'sum')
+}
+# Distinct counts are kept as exact (cell, value code) pairs, or as sparse HyperLogLog registers per cell in
+# approximate rollups; both are merged at query time
+DISTINCT = {
+    'orders': 'order_number',
+    'buyers': 'buyer_id'
+}
+# Derived metrics: name -> (numerator, denominator), evaluated after the rollup
+DERIVED = {
+    'ticket': ('revenue', 'orders'),
+    'units_per_order': ('units', 'orders'),
+    'avg_unit_price': ('revenue', 'units'),
+    'discount_rate': ('discount', 'full_price'),
+    'frequency': ('orders', 'buyers'),
+    'revenue_per_buyer': ('revenue', 'buyers')
+}
+BITMAP_MAX_BITS = 2**27
+FREQS = {
+    'daily': 'D',
+    'weekly': 'W',
+    'monthly': 'M'
+}
+
+
+class DailyCube():
+    def __init__(self, dimensions=DIMENSIONS, measures=MEASURES, distinct=DISTINCT, derived=DERIVED, approx=False, p=DEFAULT_P):
+        # approx=True keeps sketches instead of pairs: only worth it for coarse views, where cells have many members
+        self.dimensions = list(dimensions)
+        self.measures = measures
+        self.distinct = distinct
+        self.derived = derived
+        self.approx = approx
+        self.p = p
+        self.cells = None
+        self.pairs = {}
+        self.values = {}
+        self.sketches = {}
+
+    def _encode(self, name, values):
+        # Codes are stable across updates: unseen values are appended to the dictionary
+        known = self.values.get(name, pd.Index([], dtype=object))
+        values = pd.Index(values.astype(str))
+        new = values.unique().difference(known)
+        if len(new):
+            known = known.append(new)
+            self.values[name] = known
+        return known.get_indexer(values)
+
+    @staticmethod
+    def _pair_frame(keys):
+        return pd.DataFrame({'cell_id': (keys >> 32).astype(np.int32), 'code': (keys & 0xFFFFFFFF).astype(np.int32)})
+
+    @staticmethod
+    def _sketch_frame(cell_ids, index, rank):
+        return pd.DataFrame({'cell_id': cell_ids.astype(np.int32), 'index': index, 'rank': rank})
+
+    def _build_cells(self, data, first_id):
+        named_aggs = {name: pd.NamedAgg(column=col, aggfunc=func) for name, (col, func) in self.measures.items()}
+        keys = [data[dim].astype(str) if dim != DATE_COL else data[dim].dt.normalize() for dim in self.dimensions]
+        grouped = data.groupby(keys, sort=True)
+        cells = grouped.agg(**named_aggs).reset_index()
+        cell_ids = grouped.ngroup().values + first_id
+        cells.insert(0, 'cell_id', np.arange(first_id, first_id + len(cells)))
+
+        members = {}
+        for name, col in self.distinct.items():
+            if self.approx:
+                members[name] = self._sketch_frame(*sparse_registers(cell_ids, data[col], self.p))
+            else:
+                codes = self._encode(name, data[col])
+                members[name] = self._pair_frame(np.unique(cell_ids.astype(np.int64) << 32 | codes.astype(np.int64)))
+        return cells, members
+
+    @property
+    def _members(self):
+        return self.sketches if self.approx else self.pairs
+
+    def build(self, data):
+        self.values = {}
+        self.cells, members = self._build_cells(data, 0)
+        self._members.update(members)
+        return self
+
+    def update(self, data):
+        # New or restated days replace their cells; other days are left untouched
+        if self.cells is None:
+            return self.build(data)
+        dates = data[DATE_COL].dt.normalize().unique()
+        stale = self.cells[DATE_COL].isin(dates)
+        stale_ids = self.cells.loc[stale, 'cell_id'].values
+        cells, members = self._build_cells(data, int(self.cells['cell_id'].max()) + 1)
+        self.cells = pd.concat([self.cells[~stale], cells], ignore_index=True)
+        for name in self.distinct:
+            kept = self._members[name][~self._members[name]['cell_id'].isin(stale_ids)]
+            self._members[name] = pd.concat([kept, members[name]], ignore_index=True)
+        return self
+
+    def rollup(self, dimensions, approx=None):
+        # Coarser materialized view: fewer cells, same measures; approx=True turns the exact members into
+        # sketches, bounded to 2**p registers per cell however many members the coarse cells merge
+        approx = self.approx if approx is None else approx
+        if self.approx and not approx:
+            raise ValueError('An approximate cube cannot be rolled up into an exact one')
+        dimensions = [dim for dim in self.dimensions if dim in dimensions]
+        grouped = self.cells.groupby([self.cells[dim] for dim in dimensions], sort=True)
+        view = DailyCube(dimensions, self.measures, self.distinct, self.derived, approx, self.p)
+        view.cells = grouped[list(self.measures)].sum().reset_index()
+        view.cells.insert(0, 'cell_id', np.arange(len(view.cells)))
+        new_ids = np.full(int(self.cells['cell_id'].max()) + 1, -1, dtype=np.int64)
+        new_ids[self.cells['cell_id'].values] = grouped.ngroup().values
+        view.values = {} if approx else self.values
+        for name in self.distinct:
+            if self.approx:
+                sketch = self.sketches[name]
+                view.sketches[name] = self._sketch_frame(*merge_sparse(new_ids[sketch['cell_id'].values], sketch['index'].values, sketch['rank'].values, self.p))
+                continue
+            pairs = self.pairs[name]
+            if approx:
+                # Codes as a categorical: each distinct value is hashed once
+                values = pd.Categorical.from_codes(pairs['code'].values, categories=self.values[name])
+                view.sketches[name] = self._sketch_frame(*sparse_registers(new_ids[pairs['cell_id'].values], values, self.p))
+            else:
+                keys = pd.unique(new_ids[pairs['cell_id'].values] << 32 | pairs['code'].values.astype(np.int64))
+                keys.sort()
+                view.pairs[name] = self._pair_frame(keys)
+        return view
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.cells.to_parquet(os.path.join(path, 'cells.parquet'), index=False)
+        prefix = 'sketch' if self.approx else 'distinct'
+        for name in self.distinct:
+            self._members[name].to_parquet(os.path.join(path, f'{prefix}_{name}.parquet'), index=False)
+        with open(os.path.join(path, 'values.json'), 'w') as f:
+            json.dump({name: list(values) for name, values in self.values.items()}, f)
+        with open(os.path.join(path, 'cube.json'), 'w') as f:
+            json.dump({'dimensions': self.dimensions, 'approx': self.approx, 'p': self.p}, f)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(os.path.join(path, 'cube.json'), 'r') as f:
+            meta = json.load(f)
+        cube = cls(dimensions=meta['dimensions'], approx=meta['approx'], p=meta['p'], **kwargs)
+        cube.cells = pd.read_parquet(os.path.join(path, 'cells.parquet'))
+        prefix = 'sketch' if cube.approx else 'distinct'
+        for name in cube.distinct:
+            cube._members[name] = pd.read_parquet(os.path.join(path, f'{prefix}_{name}.parquet'))
+        with open(os.path.join(path, 'values.json'), 'r') as f:
+            cube.values = {name: pd.Index(values, dtype=object) for name, values in json.load(f).items()}
+        return cube
+
+    def _mask(self, filters):
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, values in (filters or {}).items():
+            col = self.cells[dim]
+            if isinstance(values, tuple):
+                # (start, end) range, either side may be None
+                start, end = values
+                if start is not None:
+                    mask &= (col >= pd.Timestamp(start)).values
+                if end is not None:
+                    mask &= (col <= pd.Timestamp(end)).values
+            else:
+                values = values if isinstance(values, (list, set)) else [values]
+                mask &= col.isin([str(v) for v in values]).values
+        return mask
+
+    def _distinct_counts(self, name, group_of_cell, n_groups):
+        if self.approx:
+            # ~1.04 / sqrt(2**p) relative error
+            sketch = self.sketches[name]
+            return sparse_estimate(group_of_cell[sketch['cell_id'].values], sketch['index'].values, sketch['rank'].values, n_groups, self.p)
+
+        # Union of the members of every cell in the group, as one vectorized unique
+        pairs = self.pairs[name]
+        groups = group_of_cell[pairs['cell_id'].values]
+        valid = groups >= 0
+        n_codes = len(self.values[name])
+        keys = groups[valid].astype(np.int64) * n_codes + pairs['code'].values[valid]
+        if n_groups * n_codes <= BITMAP_MAX_BITS:
+            # Few groups: scatter into a groups x values bitmap, linear in the number of pairs
+            seen = np.zeros(n_groups * n_codes, dtype=bool)
+            seen[keys] = True
+            return seen.reshape(n_groups, n_codes).sum(axis=1)
+        return np.bincount(pd.unique(keys) // n_codes, minlength=n_groups)
+
+    def query(self, by=(), filters=None, freq=None):
+        by = list(by)
+        cells = self.cells[self._mask(filters)]
+        keys = []
+        for dim in by:
+            if dim == DATE_COL and freq is not None:
+                keys.append(cells[dim].dt.to_period(FREQS.get(freq, freq)).dt.start_time)
+            else:
+                keys.append(cells[dim])
+        if not keys:
+            keys = [pd.Series('All', index=cells.index, name='total')]
+
+        grouped = cells.groupby(keys, sort=True)
+        result = grouped[list(self.measures)].sum()
+        group_of_cell = np.full(int(self.cells['cell_id'].max()) + 1, -1, dtype=np.int64)
+        group_of_cell[cells['cell_id'].values] = grouped.ngroup().values
+        for name in self.distinct:
+            result[name] = self._distinct_counts(name, group_of_cell, len(result))
+
+        # Non-additive metrics only after the rollup, never summed
+        for name, (numerator, denominator) in self.derived.items():
+            result[name] = result[numerator] / result[denominator].replace(0, np.nan)
+        return result
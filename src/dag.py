@@ -0,0 +1,242 @@
+import os
+import ast
+import sys
+import json
+import hashlib
+import threading
+import subprocess
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.instrument import get_instrument
+
+STATE_FILE = 'state.json'
+OK = ('done', 'skipped')
+
+
+def _imported_files(tree, root):
+    # Repository files behind the import statements of a syntax tree (third-party modules have none)
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.append(node.module)
+            names.extend(f'{node.module}.{alias.name}' for alias in node.names)
+    files = [name.replace('.', '/') + '.py' for name in names]
+    return {f for f in files if os.path.isfile(os.path.join(root, f))}
+
+
+def code_files(entries, root='.'):
+    # Every repository file a stage runs: its entry files (or single functions, as (path, name)) and what they
+    # import, followed through the imported modules
+    found = set()
+    pending = []
+    for entry in entries:
+        path, function = entry if isinstance(entry, tuple) else (entry, None)
+        with open(os.path.join(root, path), 'r') as f:
+            tree = ast.parse(f.read())
+        if function is not None:
+            tree = next(node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == function)
+        found.add(path)
+        pending.extend(_imported_files(tree, root))
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        with open(os.path.join(root, path), 'r') as f:
+            pending.extend(_imported_files(ast.parse(f.read()), root))
+    return sorted(found)
+
+
+class Task():
+    def __init__(self, name, command=None, func=None, inputs=(), outputs=(), deps=()):
+        # command: arguments after the Python executable, run as a subprocess; func: callable run in the runner
+        if (command is None) == (func is None):
+            raise ValueError(f'Task {name} needs exactly one of command or func')
+        self.name = name
+        self.command = list(command) if command is not None else None
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+
+    def outputs_exist(self):
+        return all(os.path.exists(path) for path in self.outputs)
+
+
+class FanOut():
+    def __init__(self, name, after, values, make):
+        # Tasks created once `after` has run: make(value) for each value returned by values()
+        self.name = name
+        self.after = after
+        self.values = values
+        self.make = make
+        self.members = None
+
+
+class TaskGraph():
+    def __init__(self, state_path, chunk_size=2**20):
+        self.state_path = state_path
+        self.chunk_size = chunk_size
+        self.tasks = {}
+        self.fan_outs = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.state_path, 'logs'), exist_ok=True)
+        self.state = self._read_state()
+
+    def add(self, task):
+        if task.name in self.tasks or task.name in self.fan_outs:
+            raise ValueError(f'Duplicated task {task.name}')
+        self.tasks[task.name] = task
+        return task
+
+    def fan_out(self, name, after, values, make):
+        # One task per value (region, ...); other tasks can depend on `name` to wait for all of them
+        self.fan_outs[name] = FanOut(name, after, values, make)
+        return self.fan_outs[name]
+
+    def _read_state(self):
+        path = os.path.join(self.state_path, STATE_FILE)
+        if not os.path.exists(path):
+            return {'tasks': {}, 'files': {}}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _write_state(self):
+        path = os.path.join(self.state_path, STATE_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def _file_hash(self, path):
+        # Content hash, re-read only when mtime or size changed (same rule as SalesStore)
+        stat = os.stat(path)
+        with self._lock:
+            known = self.state['files'].get(path)
+        if known is not None and known['mtime'] == stat.st_mtime and known['size'] == stat.st_size:
+            return known['sha256']
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                sha.update(chunk)
+        with self._lock:
+            self.state['files'][path] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'sha256': sha.hexdigest()}
+        return sha.hexdigest()
+
+    def path_hash(self, path):
+        # Files, or every file under a directory with its relative name; missing paths hash as such
+        if os.path.isdir(path):
+            sha = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    sha.update(os.path.relpath(file_path, path).replace(os.sep, '/').encode())
+                    sha.update(self._file_hash(file_path).encode())
+            return sha.hexdigest()
+        if os.path.exists(path):
+            return self._file_hash(path)
+        return 'missing'
+
+    def task_key(self, task):
+        sha = hashlib.sha256()
+        sha.update(json.dumps(task.command if task.command is not None else task.func.__qualname__).encode())
+        for path in task.inputs:
+            sha.update(f'{path}:{self.path_hash(path)}'.encode())
+        return sha.hexdigest()
+
+    def _execute(self, task, force):
+        with get_instrument().stage('task', task=task.name) as record:
+            key = self.task_key(task)
+            with self._lock:
+                unchanged = self.state['tasks'].get(task.name) == key
+            if unchanged and not force and task.outputs_exist():
+                record['status'] = 'skipped'
+                return 'skipped'
+
+            if task.command is not None:
+                log_path = os.path.join(self.state_path, 'logs', f'{task.name}.log')
+                with open(log_path, 'w') as log:
+                    returncode = subprocess.run([sys.executable] + task.command, stdout=log, stderr=subprocess.STDOUT).returncode
+                status = 'done' if returncode == 0 else 'failed'
+            else:
+                task.func()
+                status = 'done'
+
+            record['status'] = status
+            if status == 'done':
+                with self._lock:
+                    self.state['tasks'][task.name] = key
+                    self._write_state()
+            return status
+
+    def _select(self, targets):
+        # Targets and everything they depend on; fan-out members are added once expanded
+        selected = set()
+        stack = list(targets if targets is not None else list(self.tasks) + list(self.fan_outs))
+        while stack:
+            name = stack.pop()
+            if name in selected:
+                continue
+            if name not in self.tasks and name not in self.fan_outs:
+                raise KeyError(f'Unknown task {name}')
+            selected.add(name)
+            stack.extend(self.tasks[name].deps if name in self.tasks else [self.fan_outs[name].after])
+        return selected
+
+    def _dep_status(self, name, status):
+        if name in self.fan_outs:
+            fan_out = self.fan_outs[name]
+            if fan_out.members is None:
+                return 'blocked' if status.get(fan_out.after) in ('failed', 'blocked') else None
+            member_status = [status.get(member) for member in fan_out.members]
+            if any(s in ('failed', 'blocked') for s in member_status):
+                return 'blocked'
+            return 'done' if all(s in OK for s in member_status) else None
+        return status.get(name)
+
+    def run(self, targets=None, jobs=None, force=False, verbose=True):
+        selected = self._select(targets)
+        pending = {name for name in selected if name in self.tasks}
+        status = {}
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            running = {}
+            while pending or running:
+                for name in sorted(pending):
+                    deps = [self._dep_status(dep, status) for dep in self.tasks[name].deps]
+                    if any(dep in ('failed', 'blocked') for dep in deps):
+                        status[name] = 'blocked'
+                        pending.discard(name)
+                        if verbose:
+                            print(f'{name}: blocked')
+                    elif all(dep in OK for dep in deps):
+                        running[executor.submit(self._execute, self.tasks[name], force)] = name
+                        pending.discard(name)
+                if not running:
+                    if pending:
+                        raise RuntimeError(f'Tasks waiting on each other: {sorted(pending)}')
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        status[name] = future.result()
+                    except Exception as ex:
+                        print(f'Exception in {name}: {ex}')
+                        status[name] = 'failed'
+                    if verbose:
+                        print(f'{name}: {status[name]}')
+
+                    # Expand the fan-outs waiting on this task
+                    for fan_out in self.fan_outs.values():
+                        if fan_out.after != name or fan_out.name not in selected or status[name] not in OK:
+                            continue
+                        fan_out.members = []
+                        for value in fan_out.values():
+                            task = self.add(fan_out.make(value))
+                            task.deps = list(dict.fromkeys(task.deps + [name]))
+                            fan_out.members.append(task.name)
+                            pending.add(task.name)
+        return status
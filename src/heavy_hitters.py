@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+REGION_COL = 'region_id'
+
+
+class MisraGries():
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=float)
+        # Exact total weight, and the most any count can be below its true value
+        self.total = 0.0
+        self.error = 0.0
+
+    def _reduce(self, counts):
+        # Keep at most `capacity` counters: subtract the (capacity + 1)-th largest from every counter
+        if len(counts) > self.capacity:
+            threshold = counts.nlargest(self.capacity + 1).iloc[-1]
+            counts = counts - threshold
+            counts = counts[counts > 0]
+            self.error += threshold
+        return counts
+
+    def update(self, counts):
+        # counts: exact weights per key for one chunk
+        self.total += float(counts.sum())
+        self.counts = self._reduce(self.counts.add(counts, fill_value=0))
+        return self
+
+    def merge(self, other):
+        merged = MisraGries(max(self.capacity, other.capacity))
+        merged.total = self.total + other.total
+        merged.error = self.error + other.error
+        merged.counts = merged._reduce(self.counts.add(other.counts, fill_value=0))
+        return merged
+
+    def is_exact(self):
+        return self.error == 0
+
+    def top(self, k):
+        # Ties in key order, as in the full rankings
+        counts = self.counts
+        order = np.lexsort((counts.index.astype(str), -counts.values))
+        return counts.iloc[order[:k]]
+
+    def to_dict(self):
+        return {
+            'capacity': self.capacity,
+            'total': self.total,
+            'error': self.error,
+            'counts': {str(k): float(v) for k, v in self.counts.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        summary = cls(d['capacity'])
+        summary.total = d['total']
+        summary.error = d['error']
+        summary.counts = pd.Series(d['counts'], dtype=float)
+        return summary
+
+
+class StreamingRanking():
+    def __init__(self, dim, capacity=200, weight_col='quantity', measures=('total_discounted_price',), region_col=REGION_COL):
+        self.dim = dim
+        self.capacity = capacity
+        self.weight_col = weight_col
+        self.measures = list(measures)
+        self.region_col = region_col
+        self.summaries = {}
+
+    def consume(self, chunk):
+        # One grouped pass per chunk, then every region's summary absorbs its exact chunk counts
+        counts = chunk.groupby([chunk[self.region_col].astype(str), chunk[self.dim].astype(str)], sort=False)[self.weight_col].sum()
+        for region_id, region_counts in counts.groupby(level=0, sort=False):
+            if region_id not in self.summaries:
+                self.summaries[region_id] = MisraGries(self.capacity)
+            self.summaries[region_id].update(region_counts.droplevel(0))
+        return self
+
+    def merge(self, other):
+        # Regions or days summarized separately combine into one ranking with the same guarantees
+        merged = StreamingRanking(self.dim, max(self.capacity, other.capacity), self.weight_col, self.measures, self.region_col)
+        for region_id in set(self.summaries) | set(other.summaries):
+            summaries = [s.summaries[region_id] for s in (self, other) if region_id in s.summaries]
+            merged.summaries[region_id] = summaries[0] if len(summaries) == 1 else summaries[0].merge(summaries[1])
+        return merged
+
+    def candidates(self, region_id, k):
+        # Every key that could be in the true top k: its upper bound (count + error) reaches the k-th lower bound.
+        # Untracked keys weigh up to `error`, so None when they could reach it too: every key is a candidate
+        summary = self.summaries[str(region_id)]
+        top = summary.top(len(summary.counts))
+        if summary.is_exact():
+            return list(top.index[:k])
+        kth = top.iloc[k - 1] if len(top) >= k else 0
+        if summary.error >= kth:
+            return None
+        return list(top.index[top.values + summary.error >= kth])
+
+    def refine(self, chunks, k):
+        # Second pass: exact weights and measures for the candidate keys only, memory bounded per region
+        region_candidates = {region_id: self.candidates(region_id, k) for region_id in self.summaries}
+        candidates = pd.MultiIndex.from_tuples(
+            [(region_id, key) for region_id, keys in region_candidates.items() if keys is not None for key in keys],
+            names=[self.region_col, self.dim]
+        )
+        # Regions whose summary cannot bound the top k are refined on every key
+        full = [region_id for region_id, keys in region_candidates.items() if keys is None]
+        exact = None
+        for chunk in chunks:
+            regions, keys = chunk[self.region_col].astype(str), chunk[self.dim].astype(str)
+            mask = pd.MultiIndex.from_arrays([regions, keys]).isin(candidates) | regions.isin(full)
+            if not mask.any():
+                continue
+            sums = chunk[mask].groupby([regions[mask].rename(self.region_col), keys[mask].rename(self.dim)], sort=False)[[self.weight_col] + self.measures].sum()
+            exact = sums if exact is None else exact.add(sums, fill_value=0)
+        return exact
+
+    def pareto(self, region_id, k=20, exact=None):
+        # Same layout as RegionAggregations.ranking: weight, measures and cumulative share of the weight in %
+        region_id = str(region_id)
+        summary = self.summaries[region_id]
+        if exact is not None:
+            table = exact[exact.index.get_level_values(0) == region_id].droplevel(0)
+            table.index.name = self.dim
+        else:
+            top = summary.top(len(summary.counts))
+            table = pd.DataFrame({self.weight_col: top.values}, index=pd.Index(top.index, name=self.dim))
+        order = np.lexsort((table.index.astype(str), -table[self.weight_col].values))
+        table = table.iloc[order[:k]].copy()
+        table['qty_cumperc'] = table[self.weight_col].cumsum() / summary.total * 100
+        # Upper bound of the error of the cumulative share, zero once refined or when no counter was dropped
+        table.attrs['max_error'] = 0.0 if exact is not None else summary.error / summary.total * 100
+        # Keys missing from the summary weigh at most `error`, so a k-th weight above it proves the top k is complete
+        kth = table[self.weight_col].iloc[-1] if len(table) else 0
+        # A fully refined region is exact on every key
+        table.attrs['certified'] = bool(summary.is_exact() or (exact is not None and (self.candidates(region_id, k) is None or (len(table) == k and kth > summary.error))))
+        return table
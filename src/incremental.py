@@ -0,0 +1,219 @@
+import os
+import math
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from mlxtend.frequent_patterns import fpgrowth, association_rules
+
+RULE_COLS = ['antecedents', 'consequents', 'antecedent support', 'consequent support', 'support', 'confidence', 'lift', 'leverage']
+
+
+class RegionCounts():
+    def __init__(self, min_support, watch_support, params=None):
+        self.min_support = min_support
+        self.watch_support = watch_support
+        # Mining parameters the counts were built with, any change needs a refit
+        self.params = params
+        self.n_orders = 0
+        self.sku_codes = {}
+        self.counts = {}
+        # Upper bound on the count of any itemset that is not in self.counts
+        self.untracked_bound = 0
+        self.frequent = frozenset()
+        self.rules = None
+        self.dates = set()
+        # Content fingerprint of every counted day, to detect days whose source changed
+        self.day_fingerprints = {}
+
+    def min_count(self, n_orders=None):
+        return math.ceil(self.min_support * (self.n_orders if n_orders is None else n_orders))
+
+    def encode(self, skus):
+        for sku in pd.unique(skus):
+            if sku not in self.sku_codes:
+                self.sku_codes[sku] = len(self.sku_codes)
+        return pd.Series(skus).map(self.sku_codes).values.astype(np.int64)
+
+    def skus(self):
+        skus = np.empty(len(self.sku_codes), dtype=object)
+        for sku, code in self.sku_codes.items():
+            skus[code] = sku
+        return skus
+
+
+class IncrementalRules():
+    def __init__(self, path, miner, watch_factor=0.5, order_col='order_number', item_col='sku', date_col='created_date'):
+        self.path = path
+        self.miner = miner
+        self.watch_factor = watch_factor
+        self.order_col = order_col
+        self.item_col = item_col
+        self.date_col = date_col
+        os.makedirs(self.path, exist_ok=True)
+
+    def _params(self):
+        return {'min_support': self.miner.min_support, 'max_len': self.miner.max_len, 'watch_factor': self.watch_factor}
+
+    def _day_fingerprints(self, data):
+        # Order-independent hash of the (order, item) pairs of each day
+        days = pd.to_datetime(data[self.date_col]).dt.normalize()
+        pairs = pd.util.hash_pandas_object(data[[self.order_col, self.item_col]].astype(str), index=False).values
+        fingerprints = {}
+        for day, hashes in pd.Series(pairs).groupby(days.values):
+            fingerprints[pd.Timestamp(day)] = hashlib.sha256(np.sort(hashes.values).tobytes()).hexdigest()
+        return fingerprints
+
+    def _state_path(self, region_id):
+        return os.path.join(self.path, f'region_{region_id}.pkl')
+
+    def load(self, region_id):
+        path = self._state_path(region_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def save(self, region_id, state):
+        tmp_path = self._state_path(region_id) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._state_path(region_id))
+
+    def _basket(self, state, data):
+        rows, orders = pd.factorize(data[self.order_col])
+        cols = state.encode(data[self.item_col].astype(str).values)
+        # Columns are the persisted SKU codes over the full vocabulary
+        basket = sparse.csc_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+            shape=(len(orders), len(state.sku_codes))
+        )
+        basket.sum_duplicates()
+        basket.data[:] = 1
+        return basket
+
+    def _mine_codes(self, basket, min_support):
+        _basket = pd.DataFrame.sparse.from_spmatrix(basket.astype(bool), columns=np.arange(basket.shape[1]))
+        itemsets = fpgrowth(_basket, min_support=min_support, use_colnames=True, max_len=self.miner.max_len)
+        counts = np.rint(itemsets['support'].values * basket.shape[0]).astype(np.int64)
+        return dict(zip(itemsets['itemsets'], counts))
+
+    def _count_tracked(self, basket, itemsets):
+        # Singletons and pairs come from column sums and the co-occurrence matrix
+        counts = {}
+        col_sums = np.asarray(basket.sum(axis=0)).ravel()
+        pairs = (basket.T @ basket).tocsr() if any(len(i) == 2 for i in itemsets) else None
+        for itemset in itemsets:
+            codes = sorted(itemset)
+            if len(codes) == 1:
+                counts[itemset] = int(col_sums[codes[0]])
+            elif len(codes) == 2:
+                counts[itemset] = int(pairs[codes[0], codes[1]])
+            else:
+                hits = np.asarray(basket[:, codes].sum(axis=1)).ravel() == len(codes)
+                counts[itemset] = int(hits.sum())
+        return counts
+
+    def fit(self, region_id, data):
+        state = RegionCounts(self.miner.min_support, self.miner.min_support * self.watch_factor, params=self._params())
+        basket = self._basket(state, data)
+        state.n_orders = basket.shape[0]
+        state.counts = self._mine_codes(basket, state.watch_support)
+        state.untracked_bound = max(math.ceil(state.watch_support * state.n_orders) - 1, 0)
+        state.day_fingerprints = self._day_fingerprints(data)
+        state.dates = set(state.day_fingerprints)
+        self._refresh_rules(state, force=True)
+        self.save(region_id, state)
+        return state
+
+    def update(self, region_id, batch):
+        state = self.load(region_id)
+        if state is None:
+            raise ValueError(f'No persisted counts for region {region_id}, run fit first')
+        batch_fingerprints = self._day_fingerprints(batch)
+        batch_dates = set(batch_fingerprints)
+        if batch_dates & state.dates:
+            raise ValueError(f'Region {region_id} already contains orders for {sorted(batch_dates & state.dates)}')
+
+        basket = self._basket(state, batch)
+        n_batch = basket.shape[0]
+        n_orders = state.n_orders + n_batch
+        batch_counts = self._count_tracked(basket, list(state.counts))
+        for itemset, count in batch_counts.items():
+            state.counts[itemset] += count
+
+        # Untracked itemsets can only become frequent if they are frequent in the batch (FUP)
+        local = self._mine_codes(basket, state.min_support) if n_batch else {}
+        untracked_max = max([count for itemset, count in local.items() if itemset not in state.counts], default=0)
+        batch_bound = max(math.ceil(state.min_support * n_batch) - 1, untracked_max)
+        state.untracked_bound += batch_bound
+        state.n_orders = n_orders
+        state.dates |= batch_dates
+        state.day_fingerprints.update(batch_fingerprints)
+
+        needs_remine = state.untracked_bound >= state.min_count()
+        if not needs_remine:
+            self._refresh_rules(state)
+        self.save(region_id, state)
+        return not needs_remine
+
+    def sync(self, region_id, data):
+        # Apply every day of data not yet counted, falling back to a full mine when needed
+        state = self.load(region_id)
+        if state is None or getattr(state, 'params', None) != self._params():
+            self.fit(region_id, data)
+            return 'fit'
+
+        # Counts cannot be taken back, so a counted day that changed or disappeared means a full mine
+        fingerprints = self._day_fingerprints(data)
+        known = getattr(state, 'day_fingerprints', {})
+        changed = [day for day in state.dates if fingerprints.get(day) != known.get(day)]
+        if changed:
+            self.fit(region_id, data)
+            return f'refit ({len(changed)} days changed)'
+
+        days = pd.to_datetime(data[self.date_col]).dt.normalize()
+        pending = sorted(set(fingerprints) - state.dates)
+        for day in pending:
+            if not self.update(region_id, data[days == day]):
+                self.fit(region_id, data)
+                return 'refit'
+        return f'updated {len(pending)} days'
+
+    def _itemsets_frame(self, state, itemsets):
+        skus = state.skus()
+        return pd.DataFrame({
+            'support': [state.counts[i] / state.n_orders for i in itemsets],
+            'itemsets': [frozenset(skus[code] for code in i) for i in itemsets]
+        })
+
+    def _refresh_rules(self, state, force=False):
+        min_count = state.min_count()
+        frequent = frozenset(i for i, count in state.counts.items() if count >= min_count)
+        if force or frequent != state.frequent or state.rules is None:
+            # Frequent set changed: regenerate the rules, unfiltered so later counts can move them across the threshold
+            state.frequent = frequent
+            itemsets = self._itemsets_frame(state, list(frequent))
+            if itemsets.empty:
+                state.rules = pd.DataFrame(columns=RULE_COLS)
+            else:
+                state.rules = association_rules(itemsets, metric='support', min_threshold=0)[RULE_COLS]
+            return
+
+        # Same frequent set: only the metrics move with the new counts
+        codes = state.sku_codes
+        support = lambda items: np.array([state.counts[frozenset(codes[s] for s in i)] for i in items]) / state.n_orders
+        rules = state.rules
+        rules['antecedent support'] = support(rules['antecedents'])
+        rules['consequent support'] = support(rules['consequents'])
+        rules['support'] = support([a | c for a, c in zip(rules['antecedents'], rules['consequents'])])
+        rules['confidence'] = rules['support'] / rules['antecedent support']
+        rules['lift'] = rules['confidence'] / rules['consequent support']
+        rules['leverage'] = rules['support'] - rules['antecedent support'] * rules['consequent support']
+        state.rules = rules
+
+    def top_rules(self, region_id):
+        state = self.load(region_id)
+        rules = state.rules[state.rules[self.miner.metric] >= self.miner.min_threshold]
+        return self.miner.filter_top(rules)
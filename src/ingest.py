@@ -0,0 +1,150 @@
+import os
+import json
+import shutil
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+SOURCE_DTYPES = {
+    'store_id': 'str',
+    'buyer_id': 'str',
+    'sku': 'str',
+    'order_number': 'str',
+    'region_id': 'str'
+}
+CATEGORICAL_COLS = ['store_id', 'buyer_id', 'sku', 'payment_type', 'brand', 'category']
+PARTITION_COLS = ['region_id', 'month']
+# Rows are stored sorted by order key so each order is contiguous within its partition
+ORDER_KEY = ['created_date', 'effective_date_time', 'order_number', 'region_id', 'store_id', 'buyer_id', 'payment_type', 'purchase_completed']
+LAYOUT_VERSION = 2
+MANIFEST = '_manifest.json'
+
+
+class SalesStore():
+    def __init__(self, source, store_path=None, chunk_size=2**20):
+        self.source = source
+        if store_path is None:
+            name = os.path.splitext(os.path.basename(source))[0]
+            store_path = os.path.join('data', 'cache', name.replace(' ', '_'))
+        self.store_path = store_path
+        self.chunk_size = chunk_size
+
+    def _file_hash(self):
+        sha = hashlib.sha256()
+        with open(self.source, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def _read_manifest(self):
+        path = os.path.join(self.store_path, MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        with open(os.path.join(self.store_path, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    def is_fresh(self):
+        manifest = self._read_manifest()
+        if manifest is None or manifest.get('layout_version') != LAYOUT_VERSION:
+            return False
+        stat = os.stat(self.source)
+        if manifest['mtime'] == stat.st_mtime and manifest['size'] == stat.st_size:
+            return True
+
+        # mtime changed: only a different content hash invalidates the store
+        if manifest['sha256'] != self._file_hash():
+            return False
+        manifest['mtime'] = stat.st_mtime
+        self._write_manifest(manifest)
+        return True
+
+    def build(self):
+        stat = os.stat(self.source)
+        sha256 = self._file_hash()
+        if self.source.endswith('.parquet'):
+            # Generated or exported bases skip the workbook parser
+            data = pd.read_parquet(self.source).astype(SOURCE_DTYPES)
+        else:
+            data = pd.read_excel(self.source, engine='openpyxl', dtype=SOURCE_DTYPES)
+        for col in CATEGORICAL_COLS:
+            data[col] = data[col].astype('category')
+        data['month'] = data['created_date'].dt.strftime('%Y-%m')
+        data.sort_values(ORDER_KEY, kind='mergesort', inplace=True)
+
+        if os.path.exists(self.store_path):
+            shutil.rmtree(self.store_path)
+        os.makedirs(self.store_path)
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        pq.write_to_dataset(table, root_path=self.store_path, partition_cols=PARTITION_COLS)
+
+        manifest = {
+            'source': os.path.abspath(self.source),
+            'sha256': sha256,
+            'layout_version': LAYOUT_VERSION,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'n_rows': len(data),
+            'columns': list(data.columns)
+        }
+        self._write_manifest(manifest)
+        return manifest
+
+    def refresh(self):
+        if not self.is_fresh():
+            self.build()
+        return self._read_manifest()
+
+    def _dataset(self):
+        partitioning = ds.partitioning(
+            pa.schema([('region_id', pa.string()), ('month', pa.string())]),
+            flavor='hive'
+        )
+        return ds.dataset(self.store_path, format='parquet', partitioning=partitioning)
+
+    def regions(self):
+        self.refresh()
+        names = os.listdir(self.store_path)
+        return sorted(n.split('=', 1)[1] for n in names if n.startswith('region_id='))
+
+    def months(self):
+        self.refresh()
+        months = set()
+        for region in os.listdir(self.store_path):
+            if region.startswith('region_id='):
+                months.update(n.split('=', 1)[1] for n in os.listdir(os.path.join(self.store_path, region)) if n.startswith('month='))
+        return sorted(months)
+
+    def _filter(self, regions, months):
+        # Partition pruning on region and month
+        expr = None
+        for col, values in (('region_id', regions), ('month', months)):
+            if values is None:
+                continue
+            cond = ds.field(col).isin([str(v) for v in values])
+            expr = cond if expr is None else expr & cond
+        return expr
+
+    def iter_batches(self, columns=None, regions=None, months=None, batch_size=65536):
+        # Fragment by fragment so rows keep their stored order
+        self.refresh()
+        dataset = self._dataset()
+        expr = self._filter(regions, months)
+        for fragment in dataset.get_fragments(filter=expr):
+            for batch in fragment.to_batches(schema=dataset.schema, columns=columns, filter=expr, batch_size=batch_size):
+                if batch.num_rows:
+                    yield batch.to_pandas()
+
+    def load(self, columns=None, regions=None, months=None):
+        self.refresh()
+        dataset = self._dataset()
+        table = dataset.to_table(columns=columns, filter=self._filter(regions, months))
+        data = table.to_pandas()
+        if 'month' in data.columns and (columns is None or 'month' not in columns):
+            data.drop(columns='month', inplace=True)
+        return data
@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import threading
+import functools
+import tracemalloc
+import pandas as pd
+import psutil
+from collections import deque
+from contextlib import contextmanager
+
+# Worker processes (regions run in process pools) pick the settings up from the environment
+METRICS_ENV = 'FAVO_METRICS'
+PROFILE_ENV = 'FAVO_PROFILE'
+TRACE_MEMORY_ENV = 'FAVO_TRACE_MEMORY'
+PROFILES_PATH = 'data/out/profiles/'
+# Records kept in memory for summary(); older ones are dropped (the JSON lines file keeps everything)
+MAX_RECORDS = 10000
+
+
+def _max_rss_mb():
+    try:
+        import resource
+        # Peak resident set of the process so far: bytes on macOS, kB on Linux and the BSDs
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss / 2**20 if sys.platform == 'darwin' else max_rss / 2**10
+    except ImportError:
+        return getattr(psutil.Process().memory_info(), 'peak_wset', 0) / 2**20
+
+
+def _first_frame(args, kwargs):
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, pd.DataFrame):
+            return value
+    return None
+
+
+def _rows(output):
+    if isinstance(output, (pd.DataFrame, pd.Series)):
+        return len(output)
+    if isinstance(output, dict) and all(isinstance(v, (pd.DataFrame, pd.Series)) for v in output.values()):
+        return sum(len(v) for v in output.values())
+    return None
+
+
+class Instrument():
+    def __init__(self, path=None, profile=None, profile_path=PROFILES_PATH, trace_memory=False, max_records=MAX_RECORDS):
+        # path: JSON lines file, one record per stage; None keeps the last `max_records` records in memory only
+        self.path = path
+        self.profile = set(profile.split(',')) if isinstance(profile, str) else set(profile or [])
+        self.profile_path = profile_path
+        self.trace_memory = trace_memory
+        self.records = deque(maxlen=max_records)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._process = psutil.Process()
+
+    @property
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name, **tags):
+        # Nested stages inherit the enclosing tags (region_id, ...); set record['rows'] inside the block
+        parent = self._stack[-1] if self._stack else None
+        tags = {**(parent['tags'] if parent else {}), **{k: str(v) for k, v in tags.items()}}
+        record = {'stage': name, 'parent': parent['stage'] if parent else None, 'tags': tags, 'rows': None}
+
+        # tracemalloc peaks cannot be reset on older Pythons, so only the outermost traced stage owns them
+        traced = self.trace_memory and not tracemalloc.is_tracing()
+        if traced:
+            tracemalloc.start()
+        profiler = None
+        if name in self.profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        self._stack.append(record)
+        started_at = pd.Timestamp.now().isoformat()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self._stack.pop()
+            if profiler is not None:
+                profiler.disable()
+                record['profile'] = self._dump_profile(profiler, name, tags)
+            if traced:
+                record['traced_peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+            rss = self._process.memory_info().rss / 2**20
+            record.update({
+                'started_at': started_at,
+                'wall': wall,
+                'cpu': cpu,
+                'rss_mb': rss,
+                'max_rss_mb': max(rss, _max_rss_mb()),
+                'pid': os.getpid()
+            })
+            self.emit(record)
+
+    def _dump_profile(self, profiler, name, tags):
+        os.makedirs(self.profile_path, exist_ok=True)
+        suffix = ''.join(f'_{v}' for v in tags.values())
+        path = os.path.join(self.profile_path, f'{name}{suffix}_{os.getpid()}.prof')
+        # Inspect with: python -m pstats <path>
+        profiler.dump_stats(path)
+        return path
+
+    def emit(self, record):
+        with self._lock:
+            self.records.append(record)
+            if self.path is not None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                # Short appends from several processes do not interleave
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(record, default=str) + '\n')
+
+    def summary(self):
+        if not self.records:
+            return pd.DataFrame()
+        records = pd.json_normalize(list(self.records))
+        return records.drop(columns=['started_at', 'pid'], errors='ignore')
+
+
+_active = None
+
+
+def configure(path=None, profile=None, profile_path=PROFILES_PATH, trace_memory=False):
+    # Process-wide instrument, also exported to worker processes through the environment
+    global _active
+    _active = Instrument(path, profile, profile_path, trace_memory)
+    for env, value in [(METRICS_ENV, path), (PROFILE_ENV, ','.join(sorted(_active.profile))), (TRACE_MEMORY_ENV, '1' if trace_memory else '')]:
+        if value:
+            os.environ[env] = value
+        else:
+            os.environ.pop(env, None)
+    return _active
+
+
+def get_instrument():
+    global _active
+    if _active is None:
+        _active = Instrument(
+            path=os.environ.get(METRICS_ENV) or None,
+            profile=os.environ.get(PROFILE_ENV) or None,
+            trace_memory=bool(os.environ.get(TRACE_MEMORY_ENV))
+        )
+    return _active
+
+
+def stage(name, **tags):
+    return get_instrument().stage(name, **tags)
+
+
+def instrumented(name=None):
+    # Decorator: one record per call, rows of the first frame passed in and of the frame returned
+    def decorator(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name) as record:
+                data = _first_frame(args, kwargs)
+                record['rows_in'] = len(data) if data is not None else None
+                output = func(*args, **kwargs)
+                record['rows'] = _rows(output)
+            return output
+        return wrapper
+    return decorator
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from itertools import chain
+
+
+class ItemsetEncoder():
+    def __init__(self):
+        self.items = pd.Index([])
+
+    def _flat_codes(self, itemsets, fit=False):
+        itemsets = list(itemsets)
+        sizes = np.fromiter(map(len, itemsets), dtype=np.int64, count=len(itemsets))
+        flat = np.fromiter(chain.from_iterable(itemsets), dtype=object, count=sizes.sum())
+        if fit:
+            # Vocabulary and codes from the same single pass over the frozensets
+            codes, items = pd.factorize(flat, sort=True)
+            self.items = pd.Index(items)
+        else:
+            codes = self.items.get_indexer(flat)
+            if (codes < 0).any():
+                raise KeyError('Itemsets contain items unknown to the encoder')
+        return np.repeat(np.arange(len(itemsets)), sizes), codes, sizes
+
+    def encode_codes(self, itemsets, fit=False):
+        # n x max_len int32 item codes, sorted within the row and padded with -1; compact for short itemsets
+        rows, codes, sizes = self._flat_codes(itemsets, fit)
+        width = int(sizes.max()) if len(sizes) else 0
+        starts = np.cumsum(sizes) - sizes
+        matrix = np.full((len(sizes), width), -1, dtype=np.int32)
+        matrix[rows, np.arange(len(codes)) - np.repeat(starts, sizes)] = codes
+        return np.sort(matrix, axis=1)
+
+
+def lengths(codes):
+    # Non-padding entries per row
+    return (codes >= 0).sum(axis=1)
+
+
+def itemset_ids(codes):
+    # Same id for equal itemsets, combining the code columns one by one
+    ids = np.zeros(len(codes), dtype=np.int64)
+    for col in range(codes.shape[1]):
+        word_ids = pd.factorize(codes[:, col])[0]
+        ids = pd.factorize(ids * (word_ids.max() + 1 if len(word_ids) else 1) + word_ids)[0]
+    return ids
+
+
+def rank_within(group_ids):
+    # 1-based position of each row within its group, in current row order
+    order = np.argsort(group_ids, kind='stable')
+    sorted_ids = group_ids[order]
+    starts = np.r_[0, np.flatnonzero(sorted_ids[1:] != sorted_ids[:-1]) + 1]
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(sorted_ids)]))
+    rank = np.empty(len(group_ids), dtype=np.int64)
+    rank[order] = np.arange(len(group_ids)) - group_start + 1
+    return rank
+
+
+def top_n_per_group(group_ids, sort_keys, n):
+    # Row order sorted by sort_keys (descending, stable), keeping the first n rows of every group
+    order = np.lexsort([-np.asarray(key, dtype=float) for key in reversed(sort_keys)]) if sort_keys else np.arange(len(group_ids))
+    rank = rank_within(np.asarray(group_ids)[order])
+    return order[rank <= n], rank[rank <= n]
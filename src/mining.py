@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from mlxtend.frequent_patterns import (
+    apriori,
+    fpgrowth,
+    fpmax,
+    association_rules
+)
+
+from src.baskets import BasketBuilder
+from src.instrument import stage
+from src.itemsets import ItemsetEncoder, itemset_ids, lengths, top_n_per_group
+
+MINERS = {
+    'apriori': apriori,
+    'fpgrowth': fpgrowth,
+    'fpmax': fpmax
+}
+
+
+class RuleMiner():
+    def __init__(self, algorithm='apriori', min_support=0.01, metric='lift', min_threshold=1, top_n=3, max_len=None):
+        if algorithm not in MINERS:
+            raise ValueError(f'Unknown algorithm {algorithm}, expected one of {sorted(MINERS)}')
+        self.algorithm = algorithm
+        self.min_support = min_support
+        self.metric = metric
+        self.min_threshold = min_threshold
+        self.top_n = top_n
+        self.max_len = max_len
+
+    def frequent_itemsets(self, basket):
+        return MINERS[self.algorithm](basket, min_support=self.min_support, use_colnames=True, max_len=self.max_len)
+
+    def _itemset_support(self, basket, itemsets):
+        # Share of orders containing every item of each itemset
+        X = basket.sparse.to_coo().tocsc() if hasattr(basket, 'sparse') else basket.values.astype(bool)
+        position = {item: i for i, item in enumerate(basket.columns)}
+        supports = {}
+        for itemset in set(itemsets):
+            cols = [position[item] for item in itemset]
+            hits = np.asarray((X[:, cols] != 0).sum(axis=1)).ravel() == len(cols)
+            supports[itemset] = hits.mean()
+        return pd.Series(itemsets).map(supports).values
+
+    def rules(self, itemsets, basket):
+        if itemsets.empty:
+            return pd.DataFrame(columns=['antecedents', 'consequents', 'antecedent support', 'consequent support', 'support', 'confidence', 'lift'])
+        if self.algorithm != 'fpmax':
+            return association_rules(itemsets, metric=self.metric, min_threshold=self.min_threshold)
+
+        # Maximal itemsets lack the supports of their subsets, so the rule metrics are computed from the basket
+        _rules = association_rules(itemsets, support_only=True, metric='support', min_threshold=0)
+        _rules = _rules[['antecedents', 'consequents', 'support']].copy()
+        _rules['antecedent support'] = self._itemset_support(basket, _rules['antecedents'].tolist())
+        _rules['consequent support'] = self._itemset_support(basket, _rules['consequents'].tolist())
+        _rules['confidence'] = _rules['support'] / _rules['antecedent support']
+        _rules['lift'] = _rules['confidence'] / _rules['consequent support']
+        _rules['leverage'] = _rules['support'] - _rules['antecedent support'] * _rules['consequent support']
+        _rules = _rules[['antecedents', 'consequents', 'antecedent support', 'consequent support', 'support', 'confidence', 'lift', 'leverage']]
+        return _rules[_rules[self.metric] >= self.min_threshold].reset_index(drop=True)
+
+    def filter_top(self, rules):
+        # Antecedents as int32 code rows: lengths, grouping and per-antecedent ranks without hashing frozensets
+        antecedents = ItemsetEncoder().encode_codes(rules['antecedents'], fit=True)
+        keep, rank = top_n_per_group(itemset_ids(antecedents), [rules['antecedent support'].values, rules['lift'].values], self.top_n)
+        _rules = rules.iloc[keep].copy()
+        _rules['qty_antecedents'] = lengths(antecedents[keep])
+        _rules['rn'] = rank.astype(float)
+        return _rules
+
+    def mine(self, basket):
+        itemsets = self.frequent_itemsets(basket)
+        return self.filter_top(self.rules(itemsets, basket))
+
+
+def _mine_region(region_id, data, miner, order_col, item_col):
+    with stage('basket', region_id=region_id) as record:
+        basket = BasketBuilder(order_col=order_col, item_col=item_col).build(data)
+        record['rows_in'], record['rows'] = len(data), len(basket)
+    with stage('mine', region_id=region_id, algorithm=miner.algorithm) as record:
+        rules = miner.mine(basket)
+        record['rows'] = len(rules)
+    return region_id, rules
+
+
+def mine_regions(data, miner, region_col='region_id', order_col='order_number', item_col='sku', regions=None, n_jobs=None):
+    if regions is None:
+        regions = sorted(data[region_col].unique())
+    groups = {region_id: df for region_id, df in data[[region_col, order_col, item_col]].groupby(region_col, observed=True)}
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [
+            executor.submit(_mine_region, region_id, groups[region_id][[order_col, item_col]], miner, order_col, item_col)
+            for region_id in regions if region_id in groups
+        ]
+        for future in futures:
+            region_id, rules = future.result()
+            results[region_id] = rules
+    return results
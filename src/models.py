@@ -1,52 +1,74 @@
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
 from pandas.api.types import is_datetime64_dtype, is_numeric_dtype 
 
+from src.instrument import instrumented
+
 class RFM():
     def __init__(self, n_features=3):
         self._n_features = n_features
 
+    def _partial_vars(self, data, user_col, date_col, order_col, ticket_col):
+        dates = data[date_col]
+        if is_datetime64_dtype(dates) != True:
+            dates = pd.to_datetime(dates)
+
+        # Only the four needed columns, grouped once
+        _data = pd.DataFrame({
+            user_col: data[user_col].values,
+            date_col: dates.values,
+            order_col: data[order_col].values,
+            ticket_col: data[ticket_col].values
+        })
+        return _data.groupby(user_col, sort=True, observed=True).agg(
+            last_date=(date_col, 'max'),
+            n_orders=(order_col, 'nunique'),
+            ticket_sum=(ticket_col, 'sum'),
+            ticket_count=(ticket_col, 'count')
+        )
+
+    def _finalize_vars(self, partial, user_col):
+        recency = (partial['last_date'].max() - partial['last_date']).dt.days
+        _rfm = pd.DataFrame({
+            'frequency': partial['n_orders'],
+            'monetary': partial['ticket_sum'] / partial['ticket_count'],
+            'recency': recency
+        })
+        _rfm.index.name = user_col
+        return _rfm.reset_index()
+
+    @instrumented()
     def get_vars(self, data, user_col, date_col, order_col, ticket_col):
         try:
-            _data = data.copy()
-
-            # Get max date, frequency and monetary value table
-            _left = pd.pivot_table(
-                data=_data,
-                index=user_col,
-                aggfunc={
-                    date_col: pd.Series.max,
-                    order_col: pd.Series.nunique,
-                    ticket_col: np.mean
-                }
-            )
-
-            # Get recency variable
-            if is_datetime64_dtype(_data[date_col]) != True:
-                _data[date_col] = pd.to_datetime(_data[date_col])
-            max_user_date = _data.groupby([user_col])[date_col].max()
-            max_date = _data[date_col].max()
-            recency = (max_date - max_user_date).dt.days
-
-            # Merge datasets
-            _rfm = pd.merge(
-                left=_left[[order_col, ticket_col]],
-                right=recency,
-                left_index=True,
-                right_index=True,
-                how='left'
-            )
-            _rfm.reset_index(inplace=True)
-            col_names = [user_col, 'frequency', 'monetary', 'recency']
-            _rfm.columns = col_names
+            partial = self._partial_vars(data, user_col, date_col, order_col, ticket_col)
+            return self._finalize_vars(partial, user_col)
+        except ValueError as vx:
+            print(f'Value error: {vx}')
+        except Exception as ex:
+            print(f'Exception: {ex}')
 
-            return _rfm
+    def _merge_partial(self, partial, other):
+        # Counts and sums add and the last date takes the max, over the union of both chunks' users
+        index = partial.index.union(other.index)
+        left, right = partial.reindex(index), other.reindex(index)
+        merged = left[['n_orders', 'ticket_sum', 'ticket_count']].add(right[['n_orders', 'ticket_sum', 'ticket_count']], fill_value=0)
+        merged.insert(0, 'last_date', left['last_date'].where(right['last_date'].isna() | (left['last_date'] >= right['last_date']), right['last_date']))
+        return merged.astype({'n_orders': partial['n_orders'].dtype, 'ticket_count': partial['ticket_count'].dtype})
+
+    def get_vars_chunked(self, chunks, user_col, date_col, order_col, ticket_col):
+        # Each order must be contained in a single chunk (true for order-level extracts)
+        try:
+            partial = None
+            for chunk in chunks:
+                _partial = self._partial_vars(chunk, user_col, date_col, order_col, ticket_col)
+                partial = _partial if partial is None else self._merge_partial(partial, _partial)
+            return self._finalize_vars(partial, user_col)
         except ValueError as vx:
             print(f'Value error: {vx}')
         except Exception as ex:
             print(f'Exception: {ex}')
 
+    @instrumented()
     def get_scores(self, data, r_col, f_col, m_col, q=3):
         try:
             _rfm = data.copy()
@@ -70,4 +92,55 @@ class RFM():
             print(f'Value error: {vx}')
         except Exception as ex:
             print(f'Exception: {ex}')
-        
\ No newline at end of file
+        
+class RFMScorer():
+    def __init__(self, q=3):
+        # rfm_segment packs one decimal digit per score (312 = r3 f1 m2)
+        if not 1 <= q <= 9:
+            raise ValueError(f'q must be between 1 and 9, got {q}')
+        self.q = q
+        self.edges_ = None
+
+    def fit(self, data, r_col, f_col, m_col):
+        # Same edges as pd.qcut(..., duplicates='drop'), kept for scoring later batches
+        self.cols_ = {'r': r_col, 'f': f_col, 'm': m_col}
+        quantiles = np.linspace(0, 1, self.q + 1)
+        self.edges_ = {
+            key: np.unique(np.quantile(data[col].values.astype(float), quantiles))
+            for key, col in self.cols_.items()
+        }
+        return self
+
+    def _bins(self, key, values):
+        # Right-closed bins like qcut; values outside the fitted range fall in the end bins
+        inner = self.edges_[key][1:-1]
+        return np.searchsorted(inner, values, side='left')
+
+    def transform(self, data):
+        n_bins = {key: max(len(edges) - 1, 1) for key, edges in self.edges_.items()}
+        r = n_bins['r'] - self._bins('r', data[self.cols_['r']].values.astype(float))
+        f = self._bins('f', data[self.cols_['f']].values.astype(float)) + 1
+        m = self._bins('m', data[self.cols_['m']].values.astype(float)) + 1
+        return pd.DataFrame({
+            'r_score': r.astype(np.uint8),
+            'f_score': f.astype(np.uint8),
+            'm_score': m.astype(np.uint8),
+            'rfm_segment': (r * 100 + f * 10 + m).astype(np.uint16)
+        }, index=data.index)
+
+    def fit_transform(self, data, r_col, f_col, m_col):
+        return self.fit(data, r_col, f_col, m_col).transform(data)
+
+    def to_dict(self):
+        return {
+            'q': self.q,
+            'cols': self.cols_,
+            'edges': {key: edges.tolist() for key, edges in self.edges_.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        scorer = cls(q=d['q'])
+        scorer.cols_ = d['cols']
+        scorer.edges_ = {key: np.asarray(edges, dtype=float) for key, edges in d['edges'].items()}
+        return scorer
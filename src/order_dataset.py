@@ -0,0 +1,119 @@
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+# On-disk schema of the order level table; region_id is the partition key and lives in the directory names
+ORDER_SCHEMA = pa.schema([
+    ('created_date', pa.timestamp('ns')),
+    ('effective_date_time', pa.timestamp('ns')),
+    ('order_id', pa.string()),
+    ('store_id', pa.dictionary(pa.int32(), pa.string())),
+    ('buyer_id', pa.dictionary(pa.int32(), pa.string())),
+    ('payment_type', pa.dictionary(pa.int32(), pa.string())),
+    ('purchase_completed', pa.uint8()),
+    ('total_discount', pa.float32()),
+    ('quantity', pa.int32()),
+    ('total_discounted_price', pa.float32()),
+    ('total_full_price', pa.float32()),
+    ('avg_full_price_per_product', pa.float32()),
+    ('avg_disc_price_per_product', pa.float32()),
+    ('avg_disc_per_product', pa.float32())
+])
+PARTITION_SCHEMA = pa.schema([('region_id', pa.string())])
+ORDER_COLS = ['created_date', 'effective_date_time', 'order_id', 'region_id', 'store_id', 'buyer_id', 'payment_type', 'purchase_completed'] + \
+    ['total_discount', 'quantity', 'total_discounted_price', 'total_full_price', 'avg_full_price_per_product', 'avg_disc_price_per_product', 'avg_disc_per_product']
+DATE_COL = 'created_date'
+FORMATS = ['feather', 'parquet']
+
+
+class OrderDataset():
+    def __init__(self, path, format='feather', rows_per_group=2**16):
+        if format not in FORMATS:
+            raise ValueError(f'format must be one of {FORMATS}')
+        self.path = path
+        self.format = format
+        self.rows_per_group = rows_per_group
+
+    def _file_format(self):
+        # Feather is written uncompressed so memory-mapped reads are zero-copy
+        if self.format == 'feather':
+            file_format = ds.IpcFileFormat()
+            return file_format, file_format.make_write_options(compression=None)
+        file_format = ds.ParquetFileFormat()
+        return file_format, file_format.make_write_options(compression='snappy')
+
+    def _partitioning(self):
+        return ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+    @staticmethod
+    def typed(orders):
+        # Explicit dtypes, whatever the source (CSV round-trips lose them all)
+        _orders = pd.DataFrame(index=orders.index)
+        for field in ORDER_SCHEMA:
+            col = orders[field.name]
+            if pa.types.is_timestamp(field.type):
+                _orders[field.name] = pd.to_datetime(col).astype('datetime64[ns]')
+            elif pa.types.is_dictionary(field.type):
+                _orders[field.name] = col.astype(str).astype('category')
+            elif pa.types.is_string(field.type):
+                _orders[field.name] = col.astype(str)
+            else:
+                _orders[field.name] = col.astype(field.type.to_pandas_dtype())
+        _orders['region_id'] = orders['region_id'].astype(str)
+        return _orders
+
+    def write(self, orders):
+        _orders = self.typed(orders)
+        # Sorted by date within each region so row group statistics can skip date ranges
+        _orders = _orders.sort_values(['region_id', DATE_COL, 'effective_date_time'], kind='mergesort')
+        table = pa.Table.from_pandas(_orders, preserve_index=False)
+        table = table.cast(ORDER_SCHEMA.append(PARTITION_SCHEMA.field('region_id')))
+
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        file_format, file_options = self._file_format()
+        ds.write_dataset(
+            table, self.path, format=file_format, file_options=file_options, partitioning=self._partitioning(),
+            min_rows_per_group=self.rows_per_group, max_rows_per_group=self.rows_per_group
+        )
+        return len(_orders)
+
+    def _dataset(self, memory_map=True):
+        filesystem = fs.LocalFileSystem(use_mmap=memory_map)
+        file_format, _ = self._file_format()
+        return ds.dataset(self.path, format=file_format, partitioning=self._partitioning(), filesystem=filesystem)
+
+    def _filter(self, regions=None, start=None, end=None):
+        # region_id prunes whole partitions, dates are pushed down to row groups / record batches
+        expr = None
+        conditions = []
+        if regions is not None:
+            conditions.append(ds.field('region_id').isin([str(r) for r in regions]))
+        if start is not None:
+            conditions.append(ds.field(DATE_COL) >= pa.scalar(pd.Timestamp(start), type=pa.timestamp('ns')))
+        if end is not None:
+            conditions.append(ds.field(DATE_COL) <= pa.scalar(pd.Timestamp(end), type=pa.timestamp('ns')))
+        for cond in conditions:
+            expr = cond if expr is None else expr & cond
+        return expr
+
+    def regions(self):
+        names = os.listdir(self.path)
+        return sorted(n.split('=', 1)[1] for n in names if n.startswith('region_id='))
+
+    def read_table(self, columns=None, regions=None, start=None, end=None, memory_map=True):
+        dataset = self._dataset(memory_map=memory_map)
+        table = dataset.to_table(columns=columns, filter=self._filter(regions, start, end))
+        # Money is stored as float32 to halve the files, but sums, KPIs and RFM are computed in float64
+        schema = pa.schema([pa.field(f.name, pa.float64()) if pa.types.is_float32(f.type) else f for f in table.schema])
+        return table.cast(schema)
+
+    def read(self, columns=None, regions=None, start=None, end=None, memory_map=True):
+        table = self.read_table(columns, regions, start, end, memory_map)
+        orders = table.to_pandas()
+        if 'region_id' in orders.columns:
+            orders['region_id'] = orders['region_id'].astype('category')
+        return orders if columns is not None else orders[ORDER_COLS]
@@ -0,0 +1,91 @@
+import seaborn as sns
+import matplotlib.pyplot as plt
+from matplotlib.ticker import PercentFormatter
+
+# Report figures for two regions side by side; each function returns the figure for plt.show() or savefig
+
+
+def orders_evolution(base_ts_a, base_ts_b, regions=('2', '6')):
+    # Lineplot: Trx evolution
+    fig, ax1 = plt.subplots(1, 1, figsize=(10, 4))
+    ax2 = ax1.twinx()
+    ax1.plot(base_ts_a[['created_date', 'order_id']].set_index('created_date'), color='g')
+    ax2.plot(base_ts_b[['created_date', 'order_id']].set_index('created_date'), color='b')
+    ax1.set_xlabel('Día')
+    ax1.set_ylabel(f'Ordenes (Region {regions[0]})')
+    ax2.set_ylabel(f'Ordenes (Region {regions[1]})')
+    fig.legend([f'Region {regions[0]}', f'Region {regions[1]}'])
+    fig.suptitle('Evolución de ordenes diarias por region')
+    fig.autofmt_xdate(rotation=45)
+    return fig
+
+
+def orders_by_weekday(base_ts_a, base_ts_b, regions=('2', '6')):
+    # Barplot: Avg trx per day
+    fig, axes = plt.subplots(1, 2, figsize=(12, 4))
+    for ax, base_ts, region_id in zip(axes, [base_ts_a, base_ts_b], regions):
+        sns.barplot(
+            x='day_name',
+            y='order_id',
+            data=base_ts.groupby(['day_name'])['order_id'].mean().sort_values(ascending=False).reset_index(),
+            ax=ax
+        )
+        ax.set(xlabel='Dia de la semana', ylabel='Ordenes promedio', title=f'Region {region_id}')
+    fig.suptitle('Promedio de ordenes por dia de la semana', fontsize=15)
+    return fig
+
+
+def payment_type_counts(data_orders, regions=('2', '6')):
+    # Countplot: Qty of trx
+    fig, axes = plt.subplots(2, 1, figsize=(10, 10))
+    for ax, region_id in zip(axes, regions):
+        mask = data_orders['region_id'] == region_id
+        sns.countplot(
+            y='payment_type',
+            data=data_orders[mask],
+            order=data_orders.loc[mask, 'payment_type'].value_counts().index,
+            ax=ax
+        )
+        ax.set(xlabel='Numero de ordenes', ylabel='Tipo de pago', title=f'Region {region_id}')
+    fig.suptitle('Número de ordenes por tipo de pago y región', fontsize=20)
+    return fig
+
+
+def payment_type_revenue(payment_type_a, payment_type_b, regions=('2', '6')):
+    # Barplot: Total discounted price
+    fig, axes = plt.subplots(2, 1, figsize=(10, 10))
+    for ax, payment_type, region_id in zip(axes, [payment_type_a, payment_type_b], regions):
+        sns.barplot(
+            y='payment_type',
+            x='total_discounted_price',
+            data=payment_type,
+            ax=ax
+        )
+        ax.set(xlabel='Revenue', ylabel='Tipo de pago', title=f'Region {region_id}')
+    fig.suptitle('Revenue por tipo de pago y región', fontsize=20)
+    return fig
+
+
+def category_pareto(rnk_category, region_id, rotation=70):
+    # Pareto plot - Categories ranking
+    fig, ax = plt.subplots(1, 1, figsize=(8, 4))
+    ax.bar(
+        x=rnk_category.index,
+        height=rnk_category['quantity'],
+        color='darkcyan'
+    )
+    ax2 = ax.twinx()
+    ax2.plot(
+        rnk_category.index,
+        rnk_category['qty_cumperc'],
+        color='chocolate',
+        marker='D',
+        ms=6
+    )
+    ax2.yaxis.set_major_formatter(PercentFormatter())
+    ax2.axhline(y=60, xmin=0.05, xmax=0.95, linestyle='--', color='red')
+    ax.tick_params(axis='x', rotation=rotation, labelsize=8)
+    ax.set(xlabel='Categorias', ylabel='Unidades vendidas')
+    ax2.set(xlabel='Categorias', ylabel='Unidades vendidas (%)')
+    plt.title(f'Pareto de unidades vendidas por categoria en Región {region_id}', fontsize=15)
+    return fig
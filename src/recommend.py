@@ -0,0 +1,97 @@
+import os
+import re
+import json
+from itertools import combinations
+
+RANK_COLS = ['lift', 'confidence']
+
+
+class RuleIndex():
+    def __init__(self, top_k=5):
+        self.top_k = top_k
+        self.items = []
+        self.codes = {}
+        self.rules = {}
+        self.max_len = 0
+
+    def _encode(self, item):
+        item = str(item)
+        if item not in self.codes:
+            self.codes[item] = len(self.items)
+            self.items.append(item)
+        return self.codes[item]
+
+    def fit(self, rules):
+        # Antecedent (sorted tuple of SKU codes) -> its top consequents by lift, then confidence
+        _rules = rules.sort_values(RANK_COLS, ascending=False, kind='mergesort')
+        self.rules = {}
+        for antecedents, consequents, lift, confidence, support in zip(_rules['antecedents'], _rules['consequents'], _rules['lift'], _rules['confidence'], _rules['support']):
+            key = tuple(sorted(self._encode(item) for item in antecedents))
+            candidates = self.rules.setdefault(key, [])
+            if len(candidates) < self.top_k:
+                candidates.append((tuple(sorted(self._encode(item) for item in consequents)), float(lift), float(confidence), float(support)))
+        self.max_len = max((len(key) for key in self.rules), default=0)
+        self._antecedent_items = {code for key in self.rules for code in key}
+        return self
+
+    def recommend(self, cart, n=5):
+        # Only cart items that start some rule matter; every subset of them up to max_len is one dict lookup
+        cart_codes = {self.codes[str(item)] for item in cart if str(item) in self.codes}
+        candidates = sorted(cart_codes & self._antecedent_items)
+        best = {}
+        for size in range(1, min(self.max_len, len(candidates)) + 1):
+            for key in combinations(candidates, size):
+                for consequents, lift, confidence, support in self.rules.get(key, ()):
+                    for code in consequents:
+                        if code in cart_codes:
+                            continue
+                        if code not in best or (lift, confidence) > best[code][:2]:
+                            best[code] = (lift, confidence, support, key)
+
+        ranked = sorted(best.items(), key=lambda x: (-x[1][0], -x[1][1], x[0]))[:n]
+        return [
+            {
+                'sku': self.items[code],
+                'lift': lift,
+                'confidence': confidence,
+                'support': support,
+                'because': [self.items[c] for c in key]
+            }
+            for code, (lift, confidence, support, key) in ranked
+        ]
+
+    def to_dict(self):
+        return {
+            'top_k': self.top_k,
+            'items': self.items,
+            'rules': [[list(key), [[list(c), l, conf, s] for c, l, conf, s in candidates]] for key, candidates in self.rules.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        index = cls(d['top_k'])
+        index.items = d['items']
+        index.codes = {item: code for code, item in enumerate(index.items)}
+        index.rules = {tuple(key): [(tuple(c), l, conf, s) for c, l, conf, s in candidates] for key, candidates in d['rules']}
+        index.max_len = max((len(key) for key in index.rules), default=0)
+        index._antecedent_items = {code for key in index.rules for code in key}
+        return index
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_indexes(path, pattern=r'rule_index_R(.+)\.json$'):
+    # One index per region, as written by get_association_rules.py
+    indexes = {}
+    for f in sorted(os.listdir(path)):
+        found = re.match(pattern, f)
+        if found:
+            indexes[found.group(1)] = RuleIndex.load(os.path.join(path, f))
+    return indexes
@@ -0,0 +1,171 @@
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+from src.models import RFMScorer
+
+RAW_COLS = ['frequency', 'monetary', 'recency']
+MODELS_PATH = 'data/models/segmentation/'
+TIERS = ['1. High', '2. Mid', '3. Low']
+# Composite value: frequent and high-ticket buyers score up, long-inactive ones down
+VALUE_WEIGHTS = {
+    'frequency': 1.0,
+    'monetary': 1.0,
+    'recency': -1.0
+}
+
+
+def tier_names(k):
+    return TIERS if k == len(TIERS) else [f'{i + 1}. Tier {i + 1}' for i in range(k)]
+
+
+def rank_tiers(centroids, feature_cols=RAW_COLS, weights=VALUE_WEIGHTS):
+    # Centroids live in the scaled [0, 1] space, so the weights are comparable across features
+    w = np.array([weights.get(col, 0.0) for col in feature_cols])
+    order = np.argsort(-(np.asarray(centroids) @ w), kind='stable')
+    names = tier_names(len(order))
+    return {int(cluster): names[rank] for rank, cluster in enumerate(order)}
+
+
+def match_tiers(model, previous):
+    # Bring the previous centroids to raw units and scale them with the current scaler
+    prev_centroids = model.transform(previous.raw_centroids())
+    cost = ((model.centroids[:, None, :] - prev_centroids[None, :, :]) ** 2).sum(axis=2)
+    rows, cols = linear_sum_assignment(cost)
+    return {int(r): previous.tier_labels[int(c)] for r, c in zip(rows, cols)}
+
+
+class SegmentModel():
+    def __init__(self, region_id, scale, offset, centroids, tier_labels=None, feature_cols=RAW_COLS, version=None, metadata=None, scorer=None):
+        self.region_id = str(region_id)
+        self.scale = np.asarray(scale, dtype=float)
+        self.offset = np.asarray(offset, dtype=float)
+        self.centroids = np.asarray(centroids, dtype=float)
+        self.tier_labels = {int(k): v for k, v in (tier_labels or {}).items()}
+        self.feature_cols = list(feature_cols)
+        self.version = version
+        self.metadata = metadata or {}
+        # RFMScorer fitted on the same buyers, so later batches get the training population's R/F/M edges
+        self.scorer = scorer
+        self._centroid_norms = (self.centroids ** 2).sum(axis=1)
+        self._labels = np.array([self.tier_labels.get(i) for i in range(len(self.centroids))], dtype=object)
+
+    @classmethod
+    def from_fitted(cls, region_id, scaler, kmeans, tier_labels=None, feature_cols=RAW_COLS, metadata=None, scorer=None):
+        # MinMaxScaler transform is X * scale_ + min_
+        return cls(region_id, scaler.scale_, scaler.min_, kmeans.cluster_centers_, tier_labels, feature_cols, metadata=metadata, scorer=scorer)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=float) * self.scale + self.offset
+
+    def raw_centroids(self):
+        return (self.centroids - self.offset) / self.scale
+
+    def assign_tiers(self, previous=None):
+        if previous is not None and len(previous.centroids) == len(self.centroids) and previous.feature_cols == self.feature_cols:
+            tier_labels = match_tiers(self, previous)
+            self.metadata['tiers_from'] = f'match:v{previous.version}'
+        else:
+            tier_labels = rank_tiers(self.centroids, self.feature_cols)
+            self.metadata['tiers_from'] = 'rank'
+        self.tier_labels = tier_labels
+        self._labels = np.array([tier_labels.get(i) for i in range(len(self.centroids))], dtype=object)
+        return tier_labels
+
+    def predict(self, X):
+        # argmin ||x - c||^2 == argmin ||c||^2 - 2 x.c
+        Z = self.transform(X)
+        distances = self._centroid_norms - 2 * Z @ self.centroids.T
+        return distances.argmin(axis=1)
+
+    def score(self, buyers):
+        clusters = self.predict(buyers[self.feature_cols].values)
+        scores = pd.DataFrame({'cluster': clusters, '_cluster': self._labels[clusters]}, index=buyers.index)
+        if self.scorer is not None:
+            scores = scores.join(self.scorer.transform(buyers))
+        return scores
+
+    def to_dict(self):
+        return {
+            'region_id': self.region_id,
+            'version': self.version,
+            'feature_cols': self.feature_cols,
+            'scale': self.scale.tolist(),
+            'offset': self.offset.tolist(),
+            'centroids': self.centroids.tolist(),
+            'tier_labels': {str(k): v for k, v in self.tier_labels.items()},
+            'metadata': self.metadata,
+            'rfm_scorer': self.scorer.to_dict() if self.scorer is not None else None
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        scorer = RFMScorer.from_dict(d['rfm_scorer']) if d.get('rfm_scorer') is not None else None
+        return cls(d['region_id'], d['scale'], d['offset'], d['centroids'], d['tier_labels'], d['feature_cols'], d['version'], d['metadata'], scorer)
+
+
+class ModelRegistry():
+    def __init__(self, path=MODELS_PATH):
+        self.path = path
+        self._cache = {}
+
+    def _region_path(self, region_id):
+        return os.path.join(self.path, f'R{region_id}')
+
+    def versions(self, region_id):
+        region_path = self._region_path(region_id)
+        if not os.path.exists(region_path):
+            return []
+        found = [re.match(r'v(\d+)\.json$', f) for f in os.listdir(region_path)]
+        return sorted(int(m.group(1)) for m in found if m)
+
+    def save(self, model):
+        region_path = self._region_path(model.region_id)
+        os.makedirs(region_path, exist_ok=True)
+        versions = self.versions(model.region_id)
+        model.version = (versions[-1] + 1) if versions else 1
+        model.metadata.setdefault('created_at', pd.Timestamp.now().isoformat())
+        with open(os.path.join(region_path, f'v{model.version:04d}.json'), 'w') as f:
+            json.dump(model.to_dict(), f, indent=2)
+        return model.version
+
+    def latest(self, region_id):
+        try:
+            return self.load(region_id)
+        except FileNotFoundError:
+            return None
+
+    def load(self, region_id, version=None):
+        region_id = str(region_id)
+        if version is None:
+            versions = self.versions(region_id)
+            if not versions:
+                raise FileNotFoundError(f'No segmentation model saved for region {region_id}')
+            version = versions[-1]
+        key = (region_id, version)
+        if key not in self._cache:
+            with open(os.path.join(self._region_path(region_id), f'v{version:04d}.json'), 'r') as f:
+                self._cache[key] = SegmentModel.from_dict(json.load(f))
+        return self._cache[key]
+
+    def score(self, buyers, region_col='region_id', versions=None):
+        versions = versions or {}
+        regions = buyers[region_col].astype(str)
+        scores = []
+        for region_id, index in regions.groupby(regions).groups.items():
+            model = self.load(region_id, versions.get(region_id))
+            scores.append(model.score(buyers.loc[index]))
+        return pd.concat(scores).reindex(buyers.index)
+
+
+_registries = {}
+
+
+def score(buyers_df, region_col='region_id', path=MODELS_PATH):
+    # Registries are kept per path so repeated calls reuse the loaded models
+    if path not in _registries:
+        _registries[path] = ModelRegistry(path)
+    return _registries[path].score(buyers_df, region_col=region_col)
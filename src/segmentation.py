@@ -0,0 +1,219 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+import seaborn as sns
+import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.metrics import silhouette_samples
+from sklearn.preprocessing import MinMaxScaler
+
+from src.models import RFM, RFMScorer
+from src.selection import KSelector, _fit_k
+from src.instrument import get_instrument
+from src.cache import DiskCache, code_version, file_fingerprint, frame_fingerprint
+from src.scoring import MODELS_PATH, ModelRegistry, SegmentModel, match_tiers, rank_tiers
+
+RAW_COLS = ['frequency', 'monetary', 'recency']
+NORM_COLS = ['norm_frequency', 'norm_monetary', 'norm_recency']
+
+
+class StageTimer():
+    def __init__(self, **tags):
+        # Per-region timings for the run summary, also recorded by the process instrument
+        self.tags = tags
+        self.timings = {}
+
+    @contextmanager
+    def __call__(self, stage):
+        start = time.perf_counter()
+        try:
+            with get_instrument().stage(stage, **self.tags) as record:
+                yield record
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0) + time.perf_counter() - start
+
+
+def plot_elbow(metrics, region_id, path):
+    fig = plt.figure(figsize=(8, 5))
+    plt.plot(metrics.index, metrics['inertia'], linewidth=4, markersize=7, marker='o', color='green')
+    plt.xticks(np.arange(metrics.index.max() + 1))
+    plt.xlabel('Number of clusters')
+    plt.ylabel('WCSS')
+    plt.title(f'Elbow Method - Region {region_id}')
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+
+
+def plot_silhouette(X, labels, region_id, path, sample_size=None, random_state=0):
+    # Silhouette is O(n^2): large regions are drawn from the rows silhouette_score(sample_size=...) scores
+    if sample_size is not None and len(X) > sample_size:
+        sample = np.random.RandomState(random_state).permutation(len(X))[:sample_size]
+        X, labels = X[sample], labels[sample]
+    scores = silhouette_samples(X, labels, metric='euclidean')
+    fig, ax = plt.subplots(1, 1, figsize=(8, 5))
+    y_lower = 10
+    for cluster in np.unique(labels):
+        values = np.sort(scores[labels == cluster])
+        y_upper = y_lower + len(values)
+        ax.fill_betweenx(np.arange(y_lower, y_upper), 0, values, alpha=0.7)
+        ax.text(-0.05, y_lower + 0.5 * len(values), str(cluster))
+        y_lower = y_upper + 10
+    ax.axvline(x=scores.mean(), color='red', linestyle='--')
+    ax.set(xlabel='Silhouette coefficient', ylabel='Cluster', yticks=[], title=f'Silhouette plot - Region {region_id}')
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+
+
+def plot_boxplots(rfm_vars, region_id, path):
+    fig, axes = plt.subplots(nrows=1, ncols=3, figsize=(16, 7))
+    order = sorted(rfm_vars['_cluster'].dropna().unique())
+    sns.boxplot(x=rfm_vars['_cluster'], y=rfm_vars['recency'], order=order, ax=axes[0])
+    sns.boxplot(x=rfm_vars['_cluster'], y=rfm_vars['frequency'], order=order, ax=axes[1])
+    sns.boxplot(x=rfm_vars['_cluster'], y=rfm_vars['monetary'], order=order, ax=axes[2])
+    fig.suptitle(f'Variables por cluster en Region {region_id}')
+    axes[0].set(xlabel='Cluster', ylabel='Días desde la última compra', title='Recencia')
+    axes[1].set(xlabel='Cluster', ylabel='Número de ordenes', title='Frecuencia')
+    axes[2].set(xlabel='Cluster', ylabel='Ticket promedio', title='Valor monetario')
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+
+
+class SegmentationPipeline():
+    def __init__(self, out_path='data/out/segments/', figures_path='reports/figures/', models_path=MODELS_PATH, cache_path=None, cache_max_bytes=512 * 2**20, n_clusters=3, k_values=range(1, 11), n_jobs=None, random_state=0):
+        self.out_path = out_path
+        self.figures_path = figures_path
+        self.models_path = models_path
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        self.n_clusters = n_clusters
+        self.k_values = list(k_values)
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def _keys(self, region_id, source):
+        version = code_version(RFM, RFMScorer, KSelector, _fit_k, rank_tiers, match_tiers, SegmentModel, ModelRegistry, plot_elbow, plot_silhouette, plot_boxplots, SegmentationPipeline)
+        features_key = DiskCache.key('features', region_id, frame_fingerprint(source), version)
+        result_key = DiskCache.key('result', features_key, self.n_clusters, self.k_values, self.random_state, self.out_path, self.models_path)
+        return features_key, result_key
+
+    def _is_current(self, cached):
+        # Every run writes the same rfm_R{id}.parquet and bumps the registry, so a later run with other inputs
+        # leaves the cached summary pointing at outputs it did not write
+        if not os.path.exists(cached['output']) or file_fingerprint(cached['output']) != cached.get('output_fingerprint'):
+            return False
+        versions = ModelRegistry(self.models_path).versions(cached['region_id'])
+        return bool(versions) and versions[-1] == cached['model_version']
+
+    def segment_region(self, region_id, orders=None, rfm_vars=None):
+        timer = StageTimer(region_id=region_id)
+        cache = DiskCache(self.cache_path, self.cache_max_bytes) if self.cache_path is not None else None
+        features = None
+        if cache is not None:
+            with timer('fingerprint'):
+                features_key, result_key = self._keys(region_id, orders if rfm_vars is None else rfm_vars)
+
+            # Unchanged region whose output and model are still the ones this run wrote: nothing to do
+            cached = cache.get_json(result_key)
+            if cached is not None and self._is_current(cached):
+                cached['cached'] = True
+                cached['timings'] = timer.timings
+                return cached
+            features = cache.get_frame(features_key)
+            scaler_params = cache.get_json(features_key)
+
+        if features is not None and scaler_params is not None:
+            rfm_vars = features
+            scale, offset = np.array(scaler_params['scale']), np.array(scaler_params['offset'])
+        else:
+            if rfm_vars is None:
+                with timer('rfm'):
+                    rfm_vars = RFM().get_vars(data=orders, user_col='buyer_id', date_col='effective_date_time', order_col='order_id', ticket_col='total_discounted_price')
+            rfm_vars = rfm_vars.copy()
+
+            with timer('scaling'):
+                scaler = MinMaxScaler()
+                rfm_vars[NORM_COLS] = scaler.fit_transform(rfm_vars[RAW_COLS])
+                scale, offset = scaler.scale_, scaler.min_
+
+            if cache is not None:
+                cache.put_frame(features_key, rfm_vars)
+                cache.put_json(features_key, {'scale': scale.tolist(), 'offset': offset.tolist()})
+
+        with timer('k_selection') as record:
+            # Single-threaded here, regions already run in parallel
+            selector = KSelector(k_values=self.k_values, k=self.n_clusters, n_jobs=1, random_state=self.random_state).fit(rfm_vars[NORM_COLS])
+            record['rows'] = len(rfm_vars)
+
+        with timer('labeling'):
+            # Tiers follow the previous model's centroids, or the composite value ranking on a first fit
+            registry = ModelRegistry(self.models_path)
+            scorer = RFMScorer(q=3).fit(rfm_vars, r_col='recency', f_col='frequency', m_col='monetary')
+            model = SegmentModel(
+                region_id, scale, offset, selector.best_model_.cluster_centers_, feature_cols=RAW_COLS,
+                metadata={'n_buyers': int(len(rfm_vars)), 'k': int(selector.k_)}, scorer=scorer
+            )
+            model.assign_tiers(previous=registry.latest(region_id))
+            rfm_vars['cluster'] = selector.labels_
+            rfm_vars['_cluster'] = rfm_vars['cluster'].map(model.tier_labels)
+            rfm_vars = rfm_vars.join(scorer.transform(rfm_vars))
+
+        with timer('persist'):
+            rfm_path = os.path.join(self.out_path, f'rfm_R{region_id}.parquet')
+            rfm_vars.to_parquet(rfm_path, index=False)
+            version = registry.save(model)
+            output_fingerprint = file_fingerprint(rfm_path)
+
+        with timer('plots'):
+            plot_elbow(selector.metrics_, region_id, os.path.join(self.figures_path, f'Metodo del codo R{region_id}.png'))
+            plot_silhouette(
+                rfm_vars[NORM_COLS].values, selector.labels_, region_id, os.path.join(self.figures_path, f'Silhouette R{region_id}.png'),
+                sample_size=selector.sample_size if len(rfm_vars) > selector.large_n else None, random_state=self.random_state
+            )
+            plot_boxplots(rfm_vars, region_id, os.path.join(self.figures_path, f'Boxplot segmentacion de usuarios R{region_id}.png'))
+
+        summary = {
+            'region_id': str(region_id),
+            'n_buyers': int(len(rfm_vars)),
+            'k': int(selector.k_),
+            'metrics': selector.metrics_.reset_index().replace({np.nan: None}).to_dict(orient='records'),
+            'clusters': {str(k): int(v) for k, v in rfm_vars['_cluster'].value_counts().items()},
+            'output': rfm_path,
+            'output_fingerprint': output_fingerprint,
+            'model_version': version,
+            'tiers_from': model.metadata['tiers_from'],
+            'cached': False,
+            'timings': timer.timings
+        }
+        if cache is not None:
+            cache.put_json(result_key, summary)
+        return summary
+
+    def run(self, orders=None, rfm_tables=None, region_col='region_id', summary_path=None):
+        os.makedirs(self.out_path, exist_ok=True)
+        os.makedirs(self.figures_path, exist_ok=True)
+        started_at = pd.Timestamp.now().isoformat()
+        start = time.perf_counter()
+
+        if rfm_tables is not None:
+            jobs = [(region_id, None, rfm_vars) for region_id, rfm_vars in rfm_tables.items()]
+        else:
+            jobs = [(region_id, df, None) for region_id, df in orders.groupby(region_col, observed=True)]
+
+        with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+            futures = [executor.submit(self.segment_region, region_id, df, rfm_vars) for region_id, df, rfm_vars in jobs]
+            regions = [future.result() for future in futures]
+
+        summary = {
+            'started_at': started_at,
+            'wall_time': time.perf_counter() - start,
+            'regions': regions
+        }
+        if summary_path is not None:
+            with open(summary_path, 'w') as f:
+                json.dump(summary, f, indent=2)
+        return summary
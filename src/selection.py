@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import (
+    silhouette_score,
+    calinski_harabasz_score,
+    davies_bouldin_score
+)
+
+CRITERIA = {
+    'silhouette': 'max',
+    'calinski_harabasz': 'max',
+    'davies_bouldin': 'min'
+}
+
+
+def _fit_k(X, k, large, sample_size, batch_size, random_state):
+    if large:
+        model = MiniBatchKMeans(n_clusters=k, init='k-means++', batch_size=batch_size, n_init=3, random_state=random_state)
+    else:
+        model = KMeans(n_clusters=k, init='k-means++', n_init=10, random_state=random_state)
+    model.fit(X)
+
+    metrics = {'k': k, 'inertia': model.inertia_}
+    labels = model.labels_
+    n_labels = len(np.unique(labels))
+    if 1 < n_labels < len(X):
+        # Silhouette is O(n^2), large regions are scored on a sample
+        metrics['silhouette'] = silhouette_score(
+            X, labels, metric='euclidean',
+            sample_size=sample_size if large else None,
+            random_state=random_state
+        )
+        metrics['calinski_harabasz'] = calinski_harabasz_score(X, labels)
+        metrics['davies_bouldin'] = davies_bouldin_score(X, labels)
+    return model, metrics
+
+
+class KSelector():
+    def __init__(self, k_values=range(1, 11), criterion='silhouette', k=None, min_k=3, large_n=10000, sample_size=5000, batch_size=4096, n_jobs=-1, random_state=0):
+        if criterion not in CRITERIA:
+            raise ValueError(f'Unknown criterion {criterion}, expected one of {sorted(CRITERIA)}')
+        self.k_values = list(k_values)
+        self.criterion = criterion
+        self.k = k
+        self.min_k = min_k
+        self.large_n = large_n
+        self.sample_size = sample_size
+        self.batch_size = batch_size
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit(self, X):
+        X = np.asarray(X, dtype=float)
+        large = len(X) > self.large_n
+        k_values = [k for k in self.k_values if k <= len(X)]
+        if self.k is not None and self.k not in k_values:
+            k_values.append(self.k)
+
+        fits = Parallel(n_jobs=self.n_jobs)(
+            delayed(_fit_k)(X, k, large, self.sample_size, self.batch_size, self.random_state)
+            for k in k_values
+        )
+        self.models_ = {metrics['k']: model for model, metrics in fits}
+        self.metrics_ = pd.DataFrame([metrics for _, metrics in fits]).set_index('k').sort_index()
+
+        if self.k is not None:
+            self.k_ = self.k
+        else:
+            candidates = self.metrics_.loc[self.metrics_.index >= self.min_k, self.criterion].dropna()
+            self.k_ = int(candidates.idxmax() if CRITERIA[self.criterion] == 'max' else candidates.idxmin())
+        self.best_model_ = self.models_[self.k_]
+        self.labels_ = self.best_model_.labels_
+        return self
@@ -0,0 +1,261 @@
+import os
+import json
+import glob
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_dtype
+
+STATE_COLS = ['last_date', 'n_orders', 'ticket_sum', 'ticket_count']
+LAYOUT_VERSION = 2
+STATE_AGGS = {
+    'last_date': 'max',
+    'n_orders': 'sum',
+    'ticket_sum': 'sum',
+    'ticket_count': 'sum'
+}
+
+
+class RFMSnapshotStore():
+    def __init__(self, path, key_cols=('region_id', 'buyer_id'), date_col='effective_date_time', order_col='order_id', ticket_col='total_discounted_price', n_buckets=64):
+        self.path = path
+        self.key_cols = list(key_cols)
+        self.date_col = date_col
+        self.order_col = order_col
+        self.ticket_col = ticket_col
+        # Buyers are hashed into buckets, a batch only rewrites the buckets of its buyers
+        self.n_buckets = n_buckets
+        self._check_layout()
+        os.makedirs(os.path.join(self.path, 'deltas'), exist_ok=True)
+        os.makedirs(os.path.join(self.path, 'state'), exist_ok=True)
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.path, 'manifest.json')
+
+    def _bucket_path(self, bucket):
+        return os.path.join(self.path, 'state', f'bucket_{bucket:03d}.parquet')
+
+    def _delta_path(self, batch_id):
+        return os.path.join(self.path, 'deltas', f'{batch_id}.parquet')
+
+    def _check_layout(self):
+        # Stores written before buyer buckets (single state file, list manifest) are rebuilt on the next sync
+        manifest = self._read_manifest()
+        if manifest.get('layout_version') != LAYOUT_VERSION:
+            shutil.rmtree(self.path)
+        elif manifest['n_buckets'] != self.n_buckets:
+            self._rebucket(manifest)
+
+    def _rebucket(self, manifest):
+        # Another n_buckets: state and deltas are re-split by buyer, nothing is recomputed or lost
+        old_files = sorted(glob.glob(os.path.join(self.path, 'state', 'bucket_*.parquet')))
+        state = pd.concat([pd.read_parquet(f) for f in old_files], ignore_index=True) if old_files else None
+        for f in old_files:
+            os.remove(f)
+        if state is not None:
+            for bucket, df in state.groupby(self._buckets(state[self.key_cols]), sort=True):
+                self._write_bucket(bucket, df.set_index(self.key_cols))
+        for batch_id in manifest['batches']:
+            path = self._delta_path(batch_id)
+            if os.path.exists(path):
+                delta = pd.read_parquet(path)
+                delta['bucket'] = self._buckets(delta[self.key_cols])
+                delta.to_parquet(path + '.tmp', index=False)
+                os.replace(path + '.tmp', path)
+        manifest['n_buckets'] = self.n_buckets
+        self._write_manifest(manifest)
+
+    def _read_manifest(self):
+        if not os.path.exists(self._manifest_path):
+            return {'layout_version': LAYOUT_VERSION, 'n_buckets': self.n_buckets, 'batches': {}}
+        with open(self._manifest_path, 'r') as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        tmp_path = self._manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _empty_state(self):
+        index = pd.MultiIndex.from_arrays([[] for _ in self.key_cols], names=self.key_cols)
+        return pd.DataFrame({'last_date': pd.Series(dtype='datetime64[ns]'), 'n_orders': pd.Series(dtype='int64'), 'ticket_sum': pd.Series(dtype='float64'), 'ticket_count': pd.Series(dtype='int64')}, index=index)
+
+    def _read_bucket(self, bucket):
+        path = self._bucket_path(bucket)
+        if not os.path.exists(path):
+            return self._empty_state()
+        return pd.read_parquet(path).set_index(self.key_cols)
+
+    def _write_bucket(self, bucket, state):
+        path = self._bucket_path(bucket)
+        if state.empty:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        state.reset_index().to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+    def load_state(self):
+        files = sorted(glob.glob(os.path.join(self.path, 'state', 'bucket_*.parquet')))
+        if not files:
+            return self._empty_state()
+        return pd.concat([pd.read_parquet(f) for f in files], ignore_index=True).set_index(self.key_cols).sort_index()
+
+    def _buckets(self, keys):
+        return (pd.util.hash_pandas_object(keys, index=False).values % np.uint64(self.n_buckets)).astype(np.int64)
+
+    def _lines(self, batch):
+        dates = batch[self.date_col]
+        if is_datetime64_dtype(dates) != True:
+            dates = pd.to_datetime(dates)
+        _batch = pd.DataFrame({col: batch[col].astype(str).values for col in self.key_cols})
+        _batch['day'] = dates.dt.normalize().values
+        _batch['date'] = dates.values
+        _batch['order'] = batch[self.order_col].values
+        _batch['ticket'] = batch[self.ticket_col].values
+        return _batch
+
+    def _partials(self, lines):
+        partials = lines.groupby(self.key_cols + ['day'], sort=True).agg(
+            last_date=('date', 'max'),
+            n_orders=('order', 'nunique'),
+            ticket_sum=('ticket', 'sum'),
+            ticket_count=('ticket', 'count')
+        ).reset_index()
+        partials['bucket'] = self._buckets(partials[self.key_cols])
+        return partials
+
+    @staticmethod
+    def _fingerprint(lines):
+        # Order-independent content hash of a batch
+        hashes = pd.util.hash_pandas_object(lines, index=False).values
+        return hashlib.sha256(np.sort(hashes).tobytes()).hexdigest()
+
+    def _merge(self, left, right):
+        # Align both on the union of buyers and combine column by column
+        index = left.index.union(right.index)
+        left = left.reindex(index)
+        right = right.reindex(index)
+        merged = pd.DataFrame(index=index)
+        merged['last_date'] = left['last_date'].where(left['last_date'] >= right['last_date'], right['last_date']).fillna(left['last_date'])
+        for col in ['n_orders', 'ticket_sum', 'ticket_count']:
+            merged[col] = left[col].fillna(0) + right[col].fillna(0)
+        merged['n_orders'] = merged['n_orders'].astype('int64')
+        merged['ticket_count'] = merged['ticket_count'].astype('int64')
+        return merged
+
+    def _read_deltas(self, batch_ids, filters=None):
+        files = [self._delta_path(b) for b in batch_ids if os.path.exists(self._delta_path(b))]
+        if not files:
+            return None
+        deltas = [pd.read_parquet(f, filters=filters) for f in files]
+        return pd.concat(deltas, ignore_index=True)
+
+    def _apply(self, batches, manifest):
+        # batches: {batch_id: (partials, fingerprint)}; all of them are merged into the state in one pass per bucket
+        replaced = [b for b in batches if b in manifest['batches']]
+        rebuild = set()
+        for batch_id in replaced:
+            # A changed batch cannot be subtracted (last_date is a max): its buckets are rebuilt from the deltas
+            old = pd.read_parquet(self._delta_path(batch_id), columns=['bucket'])
+            rebuild.update(old['bucket'].unique().tolist())
+
+        new_partials = []
+        for batch_id, (partials, fingerprint) in batches.items():
+            partials.to_parquet(self._delta_path(batch_id), index=False)
+            days = partials['day']
+            manifest['batches'][batch_id] = {
+                'fingerprint': fingerprint,
+                'min_day': days.min().strftime('%Y-%m-%d') if len(days) else None,
+                'max_day': days.max().strftime('%Y-%m-%d') if len(days) else None
+            }
+            if batch_id in replaced:
+                rebuild.update(partials['bucket'].unique().tolist())
+            else:
+                new_partials.append(partials)
+
+        for bucket in sorted(rebuild):
+            deltas = self._read_deltas(manifest['batches'], filters=[('bucket', '=', bucket)])
+            state = deltas.groupby(self.key_cols, sort=True).agg(STATE_AGGS) if deltas is not None else self._empty_state()
+            self._write_bucket(bucket, state)
+
+        if new_partials:
+            partials = pd.concat(new_partials, ignore_index=True)
+            partials = partials[~partials['bucket'].isin(rebuild)]
+            for bucket, delta in partials.groupby('bucket', sort=True):
+                delta = delta.groupby(self.key_cols, sort=True).agg(STATE_AGGS)
+                self._write_bucket(bucket, self._merge(self._read_bucket(bucket), delta))
+
+        manifest['layout_version'] = LAYOUT_VERSION
+        manifest['n_buckets'] = self.n_buckets
+        self._write_manifest(manifest)
+
+    def update(self, batch, batch_id):
+        # Same batch id with the same content: nothing to do; with a different content: re-applied
+        lines = self._lines(batch)
+        fingerprint = self._fingerprint(lines)
+        manifest = self._read_manifest()
+        if manifest['batches'].get(batch_id, {}).get('fingerprint') == fingerprint:
+            return False
+        self._apply({batch_id: (self._partials(lines), fingerprint)}, manifest)
+        return True
+
+    def sync(self, data):
+        # One batch per day; new days and days whose orders changed are applied together
+        lines = self._lines(data)
+        days = lines['day'].dt.strftime('%Y-%m-%d').values
+        manifest = self._read_manifest()
+        fingerprints = {}
+        for day, day_lines in lines.groupby(days, sort=True):
+            fingerprint = self._fingerprint(day_lines)
+            if manifest['batches'].get(day, {}).get('fingerprint') != fingerprint:
+                fingerprints[day] = fingerprint
+        if not fingerprints:
+            return []
+
+        # A single grouped pass over the pending days, split back into one delta per day
+        pending = np.isin(days, list(fingerprints))
+        partials = self._partials(lines[pending])
+        partial_days = partials['day'].dt.strftime('%Y-%m-%d').values
+        batches = {day: (df.reset_index(drop=True), fingerprints[day]) for day, df in partials.groupby(partial_days, sort=True)}
+        self._apply(batches, manifest)
+        return sorted(batches)
+
+    def _state_as_of(self, as_of):
+        # Only batches starting on or before as_of are read, and only their rows up to it
+        batches = self._read_manifest()['batches']
+        as_of_day = as_of.strftime('%Y-%m-%d')
+        batch_ids = [b for b, meta in batches.items() if meta['min_day'] is not None and meta['min_day'] <= as_of_day]
+        deltas = self._read_deltas(batch_ids, filters=[('day', '<=', as_of)])
+        if deltas is None or deltas.empty:
+            return self._empty_state()
+        return deltas.groupby(self.key_cols, sort=True).agg(STATE_AGGS)
+
+    def rfm(self, as_of=None, region_col='region_id', scorers=None):
+        if as_of is None:
+            state = self.load_state()
+        else:
+            as_of = pd.Timestamp(as_of)
+            state = self._state_as_of(as_of.normalize())
+
+        _rfm = pd.DataFrame({
+            'frequency': state['n_orders'],
+            'monetary': state['ticket_sum'] / state['ticket_count']
+        }, index=state.index)
+
+        # Recency against each region's latest included order, like RFM.get_vars on the orders up to as_of
+        # (the whole as_of day is included, so the day's midnight would give negative recencies)
+        reference = state['last_date'].groupby(level=region_col).transform('max')
+        _rfm['recency'] = (reference - state['last_date']).dt.days
+        _rfm = _rfm.reset_index()
+
+        # R/F/M scores against each region's fitted edges ({region_id: RFMScorer}, e.g. from the segment models)
+        if scorers is not None:
+            regions = _rfm[region_col].astype(str)
+            scores = [scorers[region_id].transform(_rfm.loc[index]) for region_id, index in regions.groupby(regions).groups.items() if region_id in scorers]
+            if scores:
+                _rfm = _rfm.join(pd.concat(scores))
+        return _rfm
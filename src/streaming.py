@@ -0,0 +1,60 @@
+import pandas as pd
+
+from src.ingest import ORDER_KEY
+
+LINE_COLS = ['discount', 'quantity', 'total_discounted_price', 'total_full_price']
+RENAME_COLS = {
+    'order_number': 'order_id',
+    'discount': 'total_discount'
+}
+PURCHASE_MAP = {
+    'Yes': 1,
+    'No': 0
+}
+
+
+class OrderStreamer():
+    def __init__(self, store, batch_size=65536):
+        self.store = store
+        self.batch_size = batch_size
+
+    def _aggregate(self, lines):
+        # Cythonized per-order sums; floats agree with the notebook's pivot_table(np.sum) up to rounding in the last bits
+        _orders = lines.groupby(ORDER_KEY, sort=False, observed=True)[LINE_COLS].sum()
+        return _orders.reset_index()
+
+    def _finalize(self, orders):
+        _orders = orders.sort_values(ORDER_KEY, kind='mergesort').reset_index(drop=True)
+        _orders.rename(columns=RENAME_COLS, inplace=True)
+        _orders['avg_full_price_per_product'] = _orders['total_full_price'] / _orders['quantity']
+        _orders['avg_disc_price_per_product'] = _orders['total_discounted_price'] / _orders['quantity']
+        _orders['avg_disc_per_product'] = _orders['total_discount'] / _orders['quantity']
+        _orders['purchase_completed'] = _orders['purchase_completed'].map(PURCHASE_MAP)
+        return _orders
+
+    def iter_orders(self, regions=None):
+        # Orders never span months (created_date is part of the key), so each month is emitted once complete
+        for month in self.store.months():
+            parts = []
+            carry = None
+            for lines in self.store.iter_batches(columns=ORDER_KEY + LINE_COLS, regions=regions, months=[month], batch_size=self.batch_size):
+                if carry is not None:
+                    lines = pd.concat([carry, lines], ignore_index=True)
+
+                # Rows are sorted by order key, only the last order can continue in the next chunk
+                last = lines.iloc[-1]
+                is_last = (lines[ORDER_KEY] == last[ORDER_KEY]).all(axis=1).values
+                carry = lines[is_last]
+                if (~is_last).any():
+                    parts.append(self._aggregate(lines[~is_last]))
+            if carry is not None:
+                parts.append(self._aggregate(carry))
+            if parts:
+                yield self._finalize(pd.concat(parts, ignore_index=True))
+
+    def write_csv(self, path, regions=None):
+        first = True
+        for orders in self.iter_orders(regions=regions):
+            orders.to_csv(path, sep=',', index=False, mode='w' if first else 'a', header=first)
+            first = False
+            yield orders
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.ingest import CATEGORICAL_COLS
+
+PAYMENT_TYPES = {
+    'YAPE': 0.52,
+    'Tarjeta': 0.20,
+    'Transferencia Bancaria - Banco 2': 0.16,
+    'Transferencia Bancaria - Banco 3': 0.06,
+    'Transferencia Bancaria - Banco 1': 0.04,
+    'Transferencia Bancaria - Banco 4': 0.01,
+    'Efectivo contra-entrega': 0.01
+}
+# Same column order as the sales workbook
+SALES_COLS = [
+    'store_id', 'store_first_day', 'leader_status', 'buyer_id', 'sku', 'order_number', 'payment_type',
+    'purchase_completed', 'canceled', 'offer', 'full_price', 'discounted_price', 'discount', 'quantity',
+    'order_quantity', 'order_subtotal', 'coupon_discount', 'total_full_price', 'total_discounted_price',
+    'region_id', 'created_date', 'payment_confirmed_at', 'effective_date_time', 'brand', 'category', 'subcategory'
+]
+
+
+class SalesGenerator():
+    def __init__(self, n_rows, seed=0, n_regions=None, n_stores=None, n_buyers=None, n_skus=None, start='2022-06-01', n_days=30, items_per_order=4.5):
+        # Entity counts scale with the volume unless given, keeping the case data's ratios
+        self.n_rows = int(n_rows)
+        self.seed = seed
+        self.n_regions = n_regions or max(2, min(25, int(np.log10(max(n_rows, 10))) * 2 - 2))
+        self.n_stores = n_stores or max(20, n_rows // 50)
+        self.n_buyers = n_buyers or max(100, n_rows // 10)
+        self.n_skus = n_skus or int(min(200000, max(1000, 25 * np.sqrt(n_rows))))
+        self.start = pd.Timestamp(start)
+        self.n_days = n_days
+        self.items_per_order = items_per_order
+        self._catalog()
+
+    def _catalog(self):
+        rng = np.random.default_rng([self.seed, 0])
+        # SKUs -> subcategory -> category, brands with their own long tail
+        n_categories = 26
+        n_subcategories = 100
+        n_brands = max(50, self.n_skus // 3)
+        sub_category = rng.integers(0, n_categories, n_subcategories)
+        self.sku_subcategory = rng.integers(0, n_subcategories, self.n_skus)
+        self.sku_category = sub_category[self.sku_subcategory]
+        self.sku_brand = (rng.zipf(1.5, self.n_skus) - 1) % n_brands
+        self.sku_price = np.round(np.exp(rng.normal(2.2, 0.7, self.n_skus)), 1)
+        self.category_names = np.array([f'CATEGORIA {i + 1}' for i in range(n_categories)], dtype=object)
+        self.subcategory_names = np.array([f'SUBCATEGORIA {i + 1}' for i in range(n_subcategories)], dtype=object)
+        self.brand_names = np.array([f'MARCA {i + 1}' for i in range(n_brands)], dtype=object)
+
+        # Stores belong to regions, buyers to a store; a few stores and buyers make most of the orders
+        self.store_region = np.sort(rng.integers(1, self.n_regions + 1, self.n_stores))
+        self.store_first_day = self.start - pd.to_timedelta(rng.integers(30, 720, self.n_stores), unit='D')
+        self.buyer_store = (rng.zipf(1.3, self.n_buyers) - 1) % self.n_stores
+        buyer_weight = rng.pareto(1.5, self.n_buyers) + 1
+        self.buyer_p = buyer_weight / buyer_weight.sum()
+
+    def _orders(self, rng, n_orders, first_order):
+        buyers = rng.choice(self.n_buyers, n_orders, p=self.buyer_p)
+        stores = self.buyer_store[buyers]
+        day = rng.integers(0, self.n_days, n_orders)
+        created_date = self.start + pd.to_timedelta(day, unit='D')
+        effective = created_date + pd.to_timedelta(rng.integers(0, 86400 // 60, n_orders) * 60, unit='s')
+        completed = rng.random(n_orders) < 0.96
+        return pd.DataFrame({
+            'order_number': np.arange(first_order, first_order + n_orders).astype(str),
+            'buyer': buyers,
+            'store': stores,
+            'payment_type': rng.choice(list(PAYMENT_TYPES), n_orders, p=list(PAYMENT_TYPES.values())),
+            'completed': completed,
+            'created_date': created_date,
+            'effective_date_time': effective,
+            'payment_confirmed_at': effective + pd.to_timedelta(rng.integers(1, 24 * 60, n_orders) * 60, unit='s'),
+            'coupon': np.where(rng.random(n_orders) < 0.2, np.round(rng.gamma(2.0, 8.0, n_orders), 2), np.nan)
+        })
+
+    def _chunk(self, chunk_id, n_lines, first_order):
+        rng = np.random.default_rng([self.seed, 1, chunk_id])
+        # Basket sizes are geometric: most orders have one or two lines, a few dozens
+        sizes = rng.geometric(1 / self.items_per_order, int(n_lines / self.items_per_order) + 1)
+        sizes = sizes[np.cumsum(sizes) <= n_lines]
+        if sizes.sum() < n_lines:
+            sizes = np.append(sizes, n_lines - sizes.sum())
+        orders = self._orders(rng, len(sizes), first_order)
+        line_order = np.repeat(np.arange(len(sizes)), sizes)
+
+        sku = (rng.zipf(1.25, n_lines) - 1) % self.n_skus
+        quantity = np.minimum(rng.geometric(0.6, n_lines), 24)
+        full_price = self.sku_price[sku]
+        on_offer = rng.random(n_lines) < 0.38
+        discount = np.where(on_offer, np.round(full_price * rng.choice([0.05, 0.1, 0.2, 0.3], n_lines), 1), 0.0)
+        discounted_price = full_price - discount
+        total_discounted_price = discounted_price * quantity
+
+        lines = orders.iloc[line_order].reset_index(drop=True)
+        stores = lines['store'].values
+        data = pd.DataFrame({
+            'store_id': stores.astype(str),
+            'store_first_day': self.store_first_day[stores],
+            'leader_status': 'open',
+            'buyer_id': lines['buyer'].values.astype(str),
+            'sku': sku.astype(str),
+            'order_number': lines['order_number'].values,
+            'payment_type': lines['payment_type'].values,
+            'purchase_completed': np.where(lines['completed'].values, 'Yes', 'No'),
+            'canceled': np.where(lines['completed'].values, 'No', 'Yes'),
+            'offer': np.where(on_offer, 'Yes', 'No'),
+            'full_price': full_price,
+            'discounted_price': discounted_price,
+            'discount': discount,
+            'quantity': quantity,
+            'order_quantity': np.repeat(np.bincount(line_order, weights=quantity).astype(np.int64), sizes),
+            'order_subtotal': np.repeat(np.round(np.bincount(line_order, weights=total_discounted_price), 2), sizes),
+            'coupon_discount': lines['coupon'].values,
+            'total_full_price': full_price * quantity,
+            'total_discounted_price': total_discounted_price,
+            'region_id': self.store_region[stores].astype(str),
+            'created_date': lines['created_date'].values,
+            'payment_confirmed_at': lines['payment_confirmed_at'].values,
+            'effective_date_time': lines['effective_date_time'].values,
+            'brand': self.brand_names[self.sku_brand[sku]],
+            'category': self.category_names[self.sku_category[sku]],
+            'subcategory': self.subcategory_names[self.sku_subcategory[sku]]
+        })
+        return data[SALES_COLS], first_order + len(sizes)
+
+    def iter_chunks(self, chunk_size=10**6):
+        # Chunks are seeded by position, so any volume is reproducible without holding it in memory
+        first_order = 1
+        for chunk_id, start in enumerate(range(0, self.n_rows, chunk_size)):
+            data, first_order = self._chunk(chunk_id, min(chunk_size, self.n_rows - start), first_order)
+            yield data
+
+    def generate(self):
+        data = pd.concat(self.iter_chunks(), ignore_index=True)
+        for col in CATEGORICAL_COLS:
+            data[col] = data[col].astype('category')
+        return data
+
+    def write_parquet(self, path, chunk_size=10**6):
+        # Source file for SalesStore, written chunk by chunk
+        writer = None
+        try:
+            for data in self.iter_chunks(chunk_size):
+                table = pa.Table.from_pandas(data, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return path
@@ -0,0 +1,5 @@
+import sys
+import os
+
+# Tests import the project modules the same way the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cube import DailyCube
+from src.synthetic import SalesGenerator
+
+
+@pytest.fixture
+def lines():
+    return SalesGenerator(30000, seed=11, n_regions=3, n_days=40).generate()
+
+
+def raw(lines, by, freq=None):
+    keys = [lines[dim].dt.to_period(freq).dt.start_time if dim == 'created_date' and freq else lines[dim].astype(str) for dim in by]
+    return lines.groupby(keys, sort=True, observed=True).agg(
+        revenue=('total_discounted_price', 'sum'),
+        orders=('order_number', 'nunique'),
+        buyers=('buyer_id', 'nunique')
+    )
+
+
+def assert_exact(result, expected):
+    np.testing.assert_allclose(result['revenue'].values, expected['revenue'].values)
+    for col in ['orders', 'buyers']:
+        np.testing.assert_array_equal(result[col].values, expected[col].values)
+
+
+def assert_close(result, expected, tolerance=0.05):
+    np.testing.assert_allclose(result['revenue'].values, expected['revenue'].values)
+    for col in ['orders', 'buyers']:
+        errors = np.abs(result[col].values / expected[col].values - 1)
+        assert errors.mean() < tolerance / 2 and errors.max() < tolerance * 3
+
+
+def test_query_matches_raw(lines):
+    cube = DailyCube().build(lines)
+    assert_exact(cube.query(by=['region_id', 'created_date', 'category'], freq='W'), raw(lines, ['region_id', 'created_date', 'category'], 'W'))
+    assert_exact(cube.query(by=['region_id', 'store_id']), raw(lines, ['region_id', 'store_id']))
+    assert cube.query()['buyers'].iloc[0] == lines['buyer_id'].nunique()
+
+
+def test_exact_rollup_matches_base(lines):
+    cube = DailyCube().build(lines)
+    view = cube.rollup(['created_date', 'region_id', 'category'])
+    pd.testing.assert_frame_equal(view.query(by=['region_id', 'created_date'], freq='M'), cube.query(by=['region_id', 'created_date'], freq='M'))
+
+
+def test_approx_rollup_within_tolerance(lines):
+    cube = DailyCube().build(lines)
+    view = cube.rollup(['created_date', 'region_id', 'category'], approx=True)
+    assert_close(view.query(by=['region_id', 'created_date', 'category'], freq='W'), raw(lines, ['region_id', 'created_date', 'category'], 'W'))
+    coarser = view.rollup(['created_date', 'region_id'], approx=True)
+    pd.testing.assert_frame_equal(coarser.query(by=['region_id', 'created_date'], freq='M'), view.query(by=['region_id', 'created_date'], freq='M'))
+    with pytest.raises(ValueError):
+        view.rollup(['region_id'], approx=False)
+
+
+def test_save_load_round_trip(tmp_path, lines):
+    cube = DailyCube().build(lines)
+    view = cube.rollup(['created_date', 'region_id'], approx=True)
+    for name, current in [('base', cube), ('view', view)]:
+        current.save(str(tmp_path / name))
+        loaded = DailyCube.load(str(tmp_path / name))
+        assert loaded.approx == current.approx
+        pd.testing.assert_frame_equal(loaded.query(by=['region_id', 'created_date'], freq='M'), current.query(by=['region_id', 'created_date'], freq='M'))
+
+
+def test_update_replaces_restated_days(lines):
+    days = lines['created_date'].dt.normalize()
+    first = lines[days < days.max()]
+    restated = lines[days >= days.max() - pd.Timedelta(days=1)]
+    cube = DailyCube().build(first).update(restated)
+    pd.testing.assert_frame_equal(cube.query(by=['region_id']), DailyCube().build(lines).query(by=['region_id']))
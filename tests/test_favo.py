@@ -0,0 +1,52 @@
+import os
+import ast
+import sys
+import json
+import subprocess
+
+import pytest
+
+import favo
+from src.dag import code_files
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_code(entries):
+    # Statements that load what each entry loads: the module itself, or the imports inside the function
+    lines = []
+    for entry in entries:
+        path, function = entry if isinstance(entry, tuple) else (entry, None)
+        if function is None:
+            lines.append(f"import {path[:-3].replace('/', '.')}")
+            continue
+        with open(os.path.join(ROOT, path), 'r') as f:
+            tree = ast.parse(f.read())
+        node = next(node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == function)
+        lines.extend(ast.unparse(n) for n in ast.walk(node) if isinstance(n, (ast.Import, ast.ImportFrom)))
+    # Optional third-party packages (dtale for --explore) may be missing here
+    return '\n'.join(f'try:\n    {line}\nexcept ImportError:\n    pass' for line in lines)
+
+
+@pytest.mark.parametrize('stage', sorted(favo.STAGE_ENTRIES))
+def test_stage_code_covers_runtime_imports(stage):
+    entries = favo.STAGE_ENTRIES[stage]
+    code = import_code(entries) + '\nimport sys, json\nprint(json.dumps({name: getattr(module, "__file__", None) for name, module in sys.modules.items()}))'
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    repo_files = {os.path.relpath(f, ROOT).replace(os.sep, '/') for f in loaded.values() if f and os.path.abspath(f).startswith(ROOT + os.sep)}
+    repo_files = {f for f in repo_files if not f.endswith('__init__.py') and not f.startswith('tests/')}
+    entry_modules = {entry[0] if isinstance(entry, tuple) else entry for entry in entries}
+    assert repo_files - entry_modules <= set(code_files(entries, ROOT))
+
+
+def test_run_plots_needs_two_regions():
+    with pytest.raises(SystemExit):
+        favo.main(['run', '--plots', '--regions', '2', '6', '7'])
+
+
+def test_report_task_defaults_to_dataset_regions():
+    args = favo.parser().parse_args(['run'])
+    args.rules_args = []
+    task = favo.pipeline_graph(args).tasks['report']
+    assert '--regions' not in task.command
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.aggregations import RegionAggregations
+from src.heavy_hitters import MisraGries, StreamingRanking
+from src.synthetic import SalesGenerator
+
+DIM = 'brand'
+K = 10
+
+
+@pytest.fixture
+def lines():
+    return SalesGenerator(30000, seed=5, n_regions=3, n_days=30).generate()
+
+
+def chunks(lines, size=2500):
+    return [lines.iloc[start:start + size] for start in range(0, len(lines), size)]
+
+
+def true_counts(lines, region_id):
+    region = lines[lines['region_id'].astype(str) == region_id]
+    return region.groupby(region[DIM].astype(str))['quantity'].sum().astype(float)
+
+
+def true_top(counts, k):
+    order = np.lexsort((counts.index.astype(str), -counts.values))
+    return counts.iloc[order[:k]]
+
+
+def test_counts_within_error_bound(lines):
+    ranking = StreamingRanking(DIM, capacity=40)
+    for chunk in chunks(lines):
+        ranking.consume(chunk)
+    assert any(not summary.is_exact() for summary in ranking.summaries.values())
+    for region_id, summary in ranking.summaries.items():
+        truth = true_counts(lines, region_id)
+        assert summary.total == truth.sum()
+        counts = summary.counts.reindex(truth.index, fill_value=0)
+        assert (counts <= truth).all()
+        assert (truth <= counts + summary.error).all()
+
+
+def test_merge_matches_single_pass(lines):
+    parts = chunks(lines)
+    single = StreamingRanking(DIM, capacity=40)
+    left, right = StreamingRanking(DIM, capacity=40), StreamingRanking(DIM, capacity=40)
+    for i, chunk in enumerate(parts):
+        single.consume(chunk)
+        (left if i < len(parts) // 2 else right).consume(chunk)
+    merged = left.merge(right)
+    assert set(merged.summaries) == set(single.summaries)
+    for region_id, summary in merged.summaries.items():
+        truth = true_counts(lines, region_id)
+        assert summary.total == single.summaries[region_id].total
+        # Merged summaries keep the single-pass guarantee, so their top k candidates agree on the true top k
+        counts = summary.counts.reindex(truth.index, fill_value=0)
+        assert (counts <= truth).all() and (truth <= counts + summary.error).all()
+        assert set(true_top(truth, K).index) <= set(merged.candidates(region_id, K))
+
+
+def test_exact_summary_merge_is_exact():
+    a = MisraGries(10).update(pd.Series({'x': 3.0, 'y': 1.0}))
+    b = MisraGries(10).update(pd.Series({'y': 2.0, 'z': 5.0}))
+    single = MisraGries(10).update(pd.Series({'x': 3.0, 'y': 3.0, 'z': 5.0}))
+    merged = a.merge(b)
+    assert merged.is_exact()
+    pd.testing.assert_series_equal(merged.top(3), single.top(3))
+    pd.testing.assert_series_equal(MisraGries.from_dict(merged.to_dict()).top(3), merged.top(3))
+
+
+@pytest.mark.parametrize('capacity', [15, 40, 400])
+def test_candidates_contain_true_top_k(lines, capacity):
+    ranking = StreamingRanking(DIM, capacity=capacity)
+    for chunk in chunks(lines):
+        ranking.consume(chunk)
+    for region_id in ranking.summaries:
+        top = true_top(true_counts(lines, region_id), K)
+        candidates = ranking.candidates(region_id, K)
+        # None: untracked keys could reach the top k, so every key is a candidate
+        assert candidates is None or set(top.index) <= set(candidates)
+
+
+@pytest.mark.parametrize('capacity', [15, 40])
+def test_refined_pareto_matches_ranking(lines, capacity):
+    ranking = StreamingRanking(DIM, capacity=capacity)
+    for chunk in chunks(lines):
+        ranking.consume(chunk)
+    exact = ranking.refine(chunks(lines), K)
+    expected = RegionAggregations(data=lines, data_orders=None).ranking(DIM)
+    certified = 0
+    for region_id in ranking.summaries:
+        table = ranking.pareto(region_id, K, exact=exact)
+        if not table.attrs['certified']:
+            continue
+        certified += 1
+        region = RegionAggregations.region(expected, region_id).iloc[:K]
+        assert list(table.index) == list(region.index.astype(str))
+        np.testing.assert_allclose(table['quantity'].values, region['quantity'].values)
+        np.testing.assert_allclose(table['total_discounted_price'].values, region['total_discounted_price'].values, rtol=1e-6)
+        np.testing.assert_allclose(table['qty_cumperc'].values, region['qty_cumperc'].values)
+    assert certified
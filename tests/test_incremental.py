@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.baskets import BasketBuilder
+from src.incremental import IncrementalRules
+from src.mining import RuleMiner
+from src.synthetic import SalesGenerator
+
+
+@pytest.fixture
+def lines():
+    data = SalesGenerator(6000, seed=3, n_regions=2, n_skus=40, n_days=12).generate()
+    return data[['order_number', 'sku', 'region_id', 'created_date']]
+
+
+def rule_table(rules):
+    table = rules[['antecedents', 'consequents', 'support', 'confidence', 'lift']].copy()
+    table['key'] = [(tuple(sorted(a)), tuple(sorted(c))) for a, c in zip(table['antecedents'], table['consequents'])]
+    return table.set_index('key')[['support', 'confidence', 'lift']].sort_index()
+
+
+def full_mine(miner, data):
+    return miner.mine(BasketBuilder().build(data))
+
+
+def test_sync_matches_full_mine(tmp_path, lines):
+    miner = RuleMiner(algorithm='fpgrowth', min_support=0.02, max_len=3)
+    maintainer = IncrementalRules(str(tmp_path), miner)
+    days = pd.to_datetime(lines['created_date']).dt.normalize()
+    first = days < days.min() + pd.Timedelta(days=9)
+
+    assert maintainer.sync('1', lines[first]) == 'fit'
+    # The three new days are counted without re-mining
+    assert maintainer.sync('1', lines) == 'updated 3 days'
+
+    expected = rule_table(full_mine(miner, lines))
+    result = rule_table(maintainer.top_rules('1'))
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_allclose(result.values, expected.values)
+
+
+def test_parameter_change_refits(tmp_path, lines):
+    maintainer = IncrementalRules(str(tmp_path), RuleMiner(algorithm='fpgrowth', min_support=0.02, max_len=2))
+    maintainer.sync('1', lines)
+    assert maintainer.sync('1', lines) == 'updated 0 days'
+
+    maintainer.miner = RuleMiner(algorithm='fpgrowth', min_support=0.02, max_len=3)
+    assert maintainer.sync('1', lines) == 'fit'
+    expected = rule_table(full_mine(maintainer.miner, lines))
+    assert list(rule_table(maintainer.top_rules('1')).index) == list(expected.index)
+
+
+def test_changed_day_refits(tmp_path, lines):
+    miner = RuleMiner(algorithm='fpgrowth', min_support=0.02, max_len=3)
+    maintainer = IncrementalRules(str(tmp_path), miner)
+    maintainer.sync('1', lines)
+
+    # Drop one order of an already counted day
+    changed = lines[lines['order_number'] != lines['order_number'].iloc[0]]
+    assert maintainer.sync('1', changed).startswith('refit')
+    expected = rule_table(full_mine(miner, changed))
+    result = rule_table(maintainer.top_rules('1'))
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_allclose(result.values, expected.values)
@@ -0,0 +1,23 @@
+import sys
+
+import pytest
+
+from src import instrument
+from src.instrument import Instrument
+
+
+def test_records_are_bounded_without_a_path():
+    metrics = Instrument(max_records=3)
+    for i in range(5):
+        with metrics.stage('step', i=i) as record:
+            record['rows'] = i
+    assert [r['tags']['i'] for r in metrics.records] == ['2', '3', '4']
+    assert list(metrics.summary()['rows']) == [2, 3, 4]
+
+
+@pytest.mark.parametrize('platform, expected', [('linux', 2**20 / 2**10), ('darwin', 1.0)])
+def test_max_rss_units(monkeypatch, platform, expected):
+    resource = pytest.importorskip('resource')
+    monkeypatch.setattr(resource, 'getrusage', lambda who: type('Usage', (), {'ru_maxrss': 2**20})())
+    monkeypatch.setattr(sys, 'platform', platform)
+    assert instrument._max_rss_mb() == expected
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from src.mining import RuleMiner
+
+
+def legacy_filter_top(rules, top_n):
+    # Original frozenset groupby of get_association_rules
+    _rules = rules.sort_values(by=['antecedent support', 'lift'], ascending=False)
+    _rules['qty_antecedents'] = _rules['antecedents'].apply(lambda x: len(x))
+    _rules['rn'] = _rules.groupby(['antecedents'])['qty_antecedents'].rank(method='first')
+    return _rules.loc[_rules['rn'] <= top_n, :].copy()
+
+
+def test_filter_top_matches_legacy():
+    rng = np.random.default_rng(0)
+    skus = (rng.zipf(1.3, (5000, 4)) % 200).astype(str)
+    sizes = rng.integers(1, 4, 5000)
+    rules = pd.DataFrame({
+        'antecedents': [frozenset(row[:size]) for row, size in zip(skus, sizes)],
+        'consequents': [frozenset(row[-1:]) for row in skus],
+        # Few distinct values, so ties exercise the stable ordering
+        'antecedent support': np.round(rng.uniform(0.01, 0.1, 5000), 2),
+        'lift': np.round(rng.uniform(1, 5, 5000), 1)
+    })
+    pd.testing.assert_frame_equal(RuleMiner(top_n=3).filter_top(rules), legacy_filter_top(rules, 3))
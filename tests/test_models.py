@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models import RFM, RFMScorer
+from src.scoring import SegmentModel
+
+
+@pytest.fixture
+def rfm_vars():
+    rng = np.random.default_rng(1)
+    n = 500
+    return pd.DataFrame({
+        'frequency': rng.integers(1, 12, n),
+        'monetary': np.round(rng.gamma(2.0, 20.0, n), 2),
+        'recency': rng.integers(0, 60, n)
+    })
+
+
+@pytest.fixture
+def orders():
+    rng = np.random.default_rng(2)
+    n = 3000
+    return pd.DataFrame({
+        'buyer_id': rng.integers(0, 400, n).astype(str),
+        'effective_date_time': pd.Timestamp('2022-06-01') + pd.to_timedelta(rng.integers(0, 60 * 24 * 3600, n), unit='s'),
+        'order_id': np.arange(n),
+        'total_discounted_price': np.round(rng.gamma(2.0, 30.0, n), 2)
+    })
+
+
+def test_get_vars_chunked_matches_get_vars(orders):
+    cols = {'user_col': 'buyer_id', 'date_col': 'effective_date_time', 'order_col': 'order_id', 'ticket_col': 'total_discounted_price'}
+    expected = RFM().get_vars(data=orders, **cols)
+    chunks = [orders.iloc[start:start + 700] for start in range(0, len(orders), 700)]
+    result = RFM().get_vars_chunked(chunks, **cols)
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-12)
+
+
+def test_scorer_matches_get_scores(rfm_vars):
+    expected = RFM().get_scores(rfm_vars, r_col='recency', f_col='frequency', m_col='monetary', q=3)
+    scores = RFMScorer(q=3).fit_transform(rfm_vars, r_col='recency', f_col='frequency', m_col='monetary')
+    for col in ['r_score', 'f_score', 'm_score']:
+        np.testing.assert_array_equal(scores[col].values, expected[col].astype(int).values)
+    np.testing.assert_array_equal(scores['rfm_segment'].values, scores['r_score'].astype(int) * 100 + scores['f_score'].astype(int) * 10 + scores['m_score'])
+
+
+@pytest.mark.parametrize('q', [0, 10])
+def test_scorer_rejects_q_without_single_digit_scores(q):
+    with pytest.raises(ValueError):
+        RFMScorer(q=q)
+
+
+def test_scorer_persists_with_segment_model(rfm_vars):
+    scorer = RFMScorer(q=4).fit(rfm_vars, r_col='recency', f_col='frequency', m_col='monetary')
+    model = SegmentModel('2', [1.0, 1.0, 1.0], [0.0, 0.0, 0.0], [[0.0, 0.0, 0.0], [10.0, 100.0, 30.0]], {0: '2. Mid', 1: '1. High'}, scorer=scorer)
+    loaded = SegmentModel.from_dict(model.to_dict())
+    batch = rfm_vars.sample(50, random_state=0)
+    pd.testing.assert_frame_equal(loaded.score(batch)[['r_score', 'f_score', 'm_score', 'rfm_segment']], scorer.transform(batch))
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.order_dataset import ORDER_COLS, OrderDataset
+
+MONEY_COLS = ['total_discount', 'total_discounted_price', 'total_full_price', 'avg_full_price_per_product', 'avg_disc_price_per_product', 'avg_disc_per_product']
+
+
+@pytest.fixture
+def orders():
+    rng = np.random.default_rng(3)
+    n = 2000
+    created = pd.Timestamp('2022-06-01') + pd.to_timedelta(rng.integers(0, 30, n), unit='D')
+    orders = pd.DataFrame({
+        'created_date': created,
+        'effective_date_time': created + pd.to_timedelta(rng.integers(0, 86400, n), unit='s'),
+        'order_id': np.arange(n).astype(str),
+        'region_id': rng.choice(['2', '6'], n),
+        'store_id': rng.integers(0, 20, n).astype(str),
+        'buyer_id': rng.integers(0, 300, n).astype(str),
+        'payment_type': rng.choice(['CASH', 'CARD'], n),
+        'purchase_completed': rng.integers(0, 2, n),
+        'quantity': rng.integers(1, 10, n)
+    })
+    for col in MONEY_COLS:
+        orders[col] = np.round(rng.gamma(2.0, 5000.0, n), 2)
+    return orders[ORDER_COLS]
+
+
+@pytest.mark.parametrize('format', ['feather', 'parquet'])
+def test_money_is_read_as_float64(tmp_path, orders, format):
+    dataset = OrderDataset(str(tmp_path / 'orders'), format=format)
+    dataset.write(orders)
+    result = dataset.read()
+    for col in MONEY_COLS:
+        assert result[col].dtype == np.float64
+    stored = orders[MONEY_COLS].astype(np.float32).astype(np.float64)
+    expected = stored.groupby(orders['region_id']).sum()
+    pd.testing.assert_frame_equal(result.groupby(result['region_id'].astype(str))[MONEY_COLS].sum(), expected, rtol=1e-12)
+    assert dataset.read(columns=['total_discounted_price'], regions=['2'])['total_discounted_price'].dtype == np.float64
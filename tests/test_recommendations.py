@@ -0,0 +1,48 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pandas as pd
+import pytest
+
+from get_recommendations import make_handler
+from src.recommend import RuleIndex
+
+
+@pytest.fixture
+def server():
+    rules = pd.DataFrame({
+        'antecedents': [frozenset(['a']), frozenset(['a']), frozenset(['b'])],
+        'consequents': [frozenset(['b']), frozenset(['c']), frozenset(['c'])],
+        'lift': [3.0, 2.0, 1.5],
+        'confidence': [0.6, 0.5, 0.4],
+        'support': [0.1, 0.1, 0.05]
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler({'2': RuleIndex().fit(rules)}))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def get(url):
+    try:
+        with urlopen(url) as response:
+            return response.status, json.load(response)
+    except HTTPError as error:
+        return error.code, json.load(error)
+
+
+def test_recommend(server):
+    status, body = get(server + '/recommend?region=2&cart=a&n=1')
+    assert status == 200
+    assert [r['sku'] for r in body['recommendations']] == ['b']
+
+
+@pytest.mark.parametrize('n', ['x', '-1', '1.5'])
+def test_bad_n_is_rejected(server, n):
+    status, body = get(server + f'/recommend?region=2&cart=a&n={n}')
+    assert status == 400 and 'n' in body['error']
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import silhouette_score
+
+from src import segmentation
+from src.cache import DiskCache
+from src.scoring import ModelRegistry
+from src.segmentation import SegmentationPipeline
+from src.synthetic import SalesGenerator
+
+
+@pytest.fixture
+def orders():
+    data = SalesGenerator(4000, seed=5, n_regions=2, n_buyers=300, n_days=20).generate()
+    data['region_id'] = data['region_id'].astype(str)
+    return data.groupby(['region_id', 'buyer_id', 'order_number'], observed=True).agg(
+        effective_date_time=('effective_date_time', 'max'),
+        total_discounted_price=('total_discounted_price', 'sum')
+    ).reset_index().rename(columns={'order_number': 'order_id'})
+
+
+def pipeline(tmp_path):
+    return SegmentationPipeline(
+        out_path=str(tmp_path / 'segments'), figures_path=str(tmp_path / 'figures'), models_path=str(tmp_path / 'models'),
+        cache_path=str(tmp_path / 'cache'), k_values=range(1, 5)
+    )
+
+
+def test_cache_hit_requires_own_outputs(tmp_path, orders):
+    seg = pipeline(tmp_path)
+    os.makedirs(seg.out_path)
+    os.makedirs(seg.figures_path)
+    region = orders[orders['region_id'] == orders['region_id'].iloc[0]]
+    region_id = region['region_id'].iloc[0]
+    as_of = region[region['effective_date_time'] < region['effective_date_time'].quantile(0.5)]
+
+    full = seg.segment_region(region_id, region)
+    assert 'rfm_segment' in pd.read_parquet(full['output'])
+    assert ModelRegistry(seg.models_path).load(region_id).scorer is not None
+    assert seg.segment_region(region_id, region)['cached']
+
+    # Another input overwrites the region's output and registers a newer model
+    partial = seg.segment_region(region_id, as_of)
+    assert not partial['cached'] and partial['n_buyers'] < full['n_buyers']
+
+    again = seg.segment_region(region_id, region)
+    assert not again['cached']
+    assert again['n_buyers'] == full['n_buyers']
+    assert len(pd.read_parquet(again['output'])) == full['n_buyers']
+
+
+def test_evict_skips_files_removed_by_other_workers(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_bytes=0)
+    cache.put_json('a', {'x': 1})
+    listdir = os.listdir
+    monkeypatch.setattr(os, 'listdir', lambda path: listdir(path) + ['gone.json'])
+    assert cache.evict() == 0
+
+
+def test_silhouette_plot_uses_the_scoring_sample(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    X = rng.random((3000, 3))
+    labels = (X[:, 0] > 0.5).astype(int)
+    seen = {}
+    samples = segmentation.silhouette_samples
+
+    def silhouette_samples(X, labels, **kwargs):
+        seen['rows'] = len(X)
+        return samples(X, labels, **kwargs)
+
+    monkeypatch.setattr(segmentation, 'silhouette_samples', silhouette_samples)
+    segmentation.plot_silhouette(X, labels, '2', str(tmp_path / 'silhouette.png'), sample_size=500, random_state=0)
+    assert seen['rows'] == 500
+    # Same rows as the sampled silhouette_score of the k selection
+    sample = np.random.RandomState(0).permutation(len(X))[:500]
+    expected = silhouette_score(X, labels, sample_size=500, random_state=0)
+    assert np.isclose(samples(X[sample], labels[sample]).mean(), expected)
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.kpis import KPIEngine
+from src.sketches import HyperLogLog, estimate, grouped_nunique, grouped_registers, merge_registers, merge_sparse, sparse_estimate, sparse_registers
+from src.synthetic import SalesGenerator
+
+
+@pytest.mark.parametrize('n', [10, 1000, 50000, 500000])
+def test_estimator_error_within_bounds(n):
+    # Unbiased, with a spread close to 1.04 / sqrt(m)
+    p = 10
+    expected = 1.04 / np.sqrt(1 << p)
+    errors = np.array([HyperLogLog(p).add(np.arange(n) + trial * 10**9).count() / n - 1 for trial in range(20)])
+    assert abs(errors.mean()) < 3 * expected / np.sqrt(20) + 1e-3
+    assert errors.std() < 1.5 * expected
+
+
+def test_merge_equals_union():
+    a, b = np.arange(0, 60000), np.arange(40000, 100000)
+    merged = HyperLogLog().add(a) | HyperLogLog().add(b)
+    union = HyperLogLog().add(np.union1d(a, b))
+    np.testing.assert_array_equal(merged.registers, union.registers)
+    np.testing.assert_array_equal(HyperLogLog.from_bytes(merged.to_bytes()).registers, union.registers)
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))
+
+
+def test_grouped_and_sparse_registers_merge_like_dense():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 10**6, 100000)
+    groups = rng.integers(0, 40, 100000)
+    registers = grouped_registers(groups, values, 40)
+    np.testing.assert_array_equal(merge_registers(registers, np.arange(40) // 10, 4), grouped_registers(groups // 10, values, 4))
+
+    cells, index, rank = sparse_registers(groups, values)
+    np.testing.assert_array_equal(sparse_estimate(cells, index, rank, 40), estimate(registers))
+    merged = merge_sparse(cells // 10, index, rank)
+    np.testing.assert_array_equal(sparse_estimate(*merged, 4), estimate(grouped_registers(groups // 10, values, 4)))
+
+
+def test_small_inputs_use_exact_counts():
+    rng = np.random.default_rng(1)
+    data = pd.DataFrame({'g': rng.integers(0, 5, 5000), 'v': rng.integers(0, 3000, 5000)})
+    grouped = data.groupby('g')
+    pd.testing.assert_series_equal(grouped_nunique(grouped, 'v', approx=True), grouped['v'].nunique())
+    approx = grouped_nunique(grouped, 'v', approx=True, exact_max_rows=0)
+    assert (approx / grouped['v'].nunique() - 1).abs().max() < 0.05
+
+
+def test_kpi_engine_approx():
+    lines = SalesGenerator(20000, seed=2, n_regions=3, n_days=30).generate()
+    orders = lines.groupby(['region_id', 'created_date', 'order_number', 'buyer_id'], observed=True).agg(
+        purchase_completed=('purchase_completed', lambda s: (s == 'Yes').any()),
+        quantity=('quantity', 'sum'),
+        total_discounted_price=('total_discounted_price', 'sum'),
+        total_full_price=('total_full_price', 'sum'),
+        total_discount=('discount', 'sum')
+    ).reset_index().rename(columns={'order_number': 'order_id'})
+    exact = KPIEngine(orders).base('weekly')
+    pd.testing.assert_frame_equal(KPIEngine(orders, approx=True).base('weekly'), exact)
+    approx = KPIEngine(orders, approx=True, exact_max_rows=0).base('weekly')
+    for col in ['orders', 'buyers']:
+        assert (approx[col] / exact[col] - 1).abs().max() < 0.05
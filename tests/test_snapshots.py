@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models import RFM, RFMScorer
+from src.snapshots import RFMSnapshotStore
+
+
+@pytest.fixture
+def orders():
+    rng = np.random.default_rng(0)
+    n = 3000
+    dates = pd.Timestamp('2022-06-01') + pd.to_timedelta(rng.integers(0, 20 * 24 * 60, n), unit='min')
+    return pd.DataFrame({
+        'region_id': rng.choice(['2', '6'], n),
+        'buyer_id': rng.integers(0, 400, n).astype(str),
+        'effective_date_time': dates,
+        'order_id': np.arange(n),
+        'total_discounted_price': np.round(rng.gamma(2.0, 20.0, n), 2)
+    })
+
+
+def expected_rfm(orders):
+    # Per region, from scratch, as get_clusters computes it
+    tables = []
+    for region_id, df in orders.groupby('region_id'):
+        rfm = RFM().get_vars(data=df, user_col='buyer_id', date_col='effective_date_time', order_col='order_id', ticket_col='total_discounted_price')
+        rfm.insert(0, 'region_id', region_id)
+        tables.append(rfm)
+    return pd.concat(tables).sort_values(['region_id', 'buyer_id']).reset_index(drop=True)
+
+
+def assert_rfm_equal(result, orders):
+    result = result.sort_values(['region_id', 'buyer_id']).reset_index(drop=True)
+    expected = expected_rfm(orders)
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False)
+
+
+def test_sync_in_steps_matches_full_recompute(tmp_path, orders):
+    store = RFMSnapshotStore(str(tmp_path))
+    first = orders['effective_date_time'] < '2022-06-10'
+    assert len(store.sync(orders[first])) == 9
+    assert len(store.sync(orders)) == 11
+    assert store.sync(orders) == []
+    assert_rfm_equal(store.rfm(), orders)
+
+
+def test_changed_day_is_reapplied(tmp_path, orders):
+    store = RFMSnapshotStore(str(tmp_path))
+    store.sync(orders)
+    changed = orders.copy()
+    day = changed['effective_date_time'].dt.strftime('%Y-%m-%d') == '2022-06-05'
+    changed.loc[day, 'total_discounted_price'] *= 2
+    changed = changed.drop(changed.index[day][:5])
+    assert store.sync(changed) == ['2022-06-05']
+    assert_rfm_equal(store.rfm(), changed)
+
+
+def test_as_of(tmp_path, orders):
+    store = RFMSnapshotStore(str(tmp_path))
+    assert store.rfm(as_of='2022-06-10').empty
+    store.sync(orders)
+    as_of = pd.Timestamp('2022-06-10')
+    result = store.rfm(as_of=as_of)
+    assert (result['recency'] >= 0).all()
+    # The whole as_of day is included
+    assert_rfm_equal(result, orders[orders['effective_date_time'] < as_of + pd.Timedelta(days=1)])
+
+
+def test_n_buckets_change_rebuckets_without_losing_state(tmp_path, orders):
+    first = orders['effective_date_time'] < '2022-06-10'
+    RFMSnapshotStore(str(tmp_path), n_buckets=8).sync(orders[first])
+    store = RFMSnapshotStore(str(tmp_path), n_buckets=16)
+    assert_rfm_equal(store.rfm(), orders[first])
+    assert len(store.sync(orders)) == 11
+    assert_rfm_equal(store.rfm(), orders)
+    assert_rfm_equal(store.rfm(as_of='2022-06-05'), orders[orders['effective_date_time'] < '2022-06-06'])
+
+
+def test_rfm_scores_with_fitted_edges(tmp_path, orders):
+    store = RFMSnapshotStore(str(tmp_path))
+    store.sync(orders)
+    rfm = store.rfm()
+    scorers = {region_id: RFMScorer(q=3).fit(df, r_col='recency', f_col='frequency', m_col='monetary') for region_id, df in rfm.groupby('region_id')}
+    scored = store.rfm(scorers=scorers)
+    for region_id, df in scored.groupby('region_id'):
+        expected = scorers[region_id].transform(df)
+        pd.testing.assert_frame_equal(df[expected.columns], expected)
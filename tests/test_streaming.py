@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ingest import SalesStore
+from src.streaming import OrderStreamer
+from src.synthetic import SalesGenerator
+
+ORDER_INDEX = ['created_date', 'effective_date_time', 'order_number', 'region_id', 'store_id', 'buyer_id', 'payment_type', 'purchase_completed']
+
+
+@pytest.fixture
+def store(tmp_path):
+    source = SalesGenerator(20000, seed=7, n_regions=3, n_days=45).write_parquet(str(tmp_path / 'sales.parquet'))
+    store = SalesStore(source, store_path=str(tmp_path / 'store'))
+    store.build()
+    return store
+
+
+def legacy_orders(data):
+    # Order-level pivot_table of the original main.py
+    orders = pd.pivot_table(
+        data=data,
+        index=ORDER_INDEX,
+        values=['discount', 'quantity', 'total_full_price', 'total_discounted_price'],
+        aggfunc={'quantity': np.sum, 'discount': np.sum, 'total_full_price': np.sum, 'total_discounted_price': np.sum},
+        observed=True
+    )
+    return orders.reset_index().rename(columns={'order_number': 'order_id', 'discount': 'total_discount'})
+
+
+def test_streamed_orders_match_legacy_pivot(store):
+    # Small batches so orders are split across chunks
+    streamed = pd.concat(OrderStreamer(store, batch_size=997).iter_orders(), ignore_index=True)
+    expected = legacy_orders(store.load())
+    assert len(streamed) == len(expected)
+
+    key = ['created_date', 'effective_date_time', 'order_id', 'region_id', 'store_id', 'buyer_id', 'payment_type']
+    streamed = streamed.sort_values(key).reset_index(drop=True)
+    expected = expected.sort_values(key).reset_index(drop=True)
+    cols = ['quantity', 'total_discount', 'total_full_price', 'total_discounted_price']
+    # Summation order differs between pandas versions, so floats are compared with a tolerance
+    pd.testing.assert_frame_equal(streamed[cols], expected[cols], check_dtype=False, rtol=1e-12)